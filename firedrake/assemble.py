@@ -1,8 +1,12 @@
+import copy
 import numpy
 import ufl
-from collections import defaultdict
+from collections import defaultdict, namedtuple
 from itertools import chain
 
+from coffee import base as ast
+from tsfc.parameters import SCALAR_TYPE
+
 from pyop2 import op2
 from pyop2.base import collecting_loops
 from pyop2.exceptions import MapValueError, SparsityFormatError
@@ -14,15 +18,18 @@ from firedrake import matrix
 from firedrake import parameters
 from firedrake import solving
 from firedrake import utils
+from firedrake.functionspacedata import get_sparsity
 from firedrake.slate import slate
 from firedrake.slate import slac
 
 
-__all__ = ["assemble"]
+__all__ = ["assemble", "assemble_many", "assemble_functionals",
+           "assembly_plan", "AssemblyPlan"]
 
 
 def assemble(f, tensor=None, bcs=None, form_compiler_parameters=None,
-             inverse=False, mat_type=None, sub_mat_type=None, appctx={}, **kwargs):
+             inverse=False, mat_type=None, sub_mat_type=None, appctx={},
+             coefficients=None, **kwargs):
     """Evaluate f.
 
     :arg f: a :class:`~ufl.classes.Form`, :class:`~ufl.classes.Expr` or
@@ -54,6 +61,13 @@ def assemble(f, tensor=None, bcs=None, form_compiler_parameters=None,
          not supplied, defaults to ``parameters["default_sub_matrix_type"]``.
     :arg appctx: Additional information to hang on the assembled
          matrix if an implicit matrix is requested (mat_type "matfree").
+    :arg coefficients: (optional) a dict mapping coefficients of a
+         0- or 1-form ``f`` to lists of values for them.  All lists
+         must have the same length ``n``.  ``f`` is then assembled for
+         each of the ``n`` sets of coefficient values in a single
+         traversal of the mesh, and a list of ``n`` results is
+         returned.  If provided, ``tensor`` should be a list of ``n``
+         :class:`.Function` objects.
 
     If f is a :class:`~ufl.classes.Form` then this evaluates the corresponding
     integral(s) and returns a :class:`float` for 0-forms, a
@@ -91,6 +105,11 @@ def assemble(f, tensor=None, bcs=None, form_compiler_parameters=None,
     if len(kwargs) > 0:
         raise TypeError("Unknown keyword arguments '%s'" % ', '.join(kwargs.keys()))
 
+    if coefficients is not None:
+        if not isinstance(f, ufl.form.Form):
+            raise TypeError("Can only assemble multiple coefficient values of a Form, not %r" % f)
+        return _assemble_multiple(f, coefficients, tensors=tensor, bcs=bcs,
+                                  form_compiler_parameters=form_compiler_parameters)
     if isinstance(f, (ufl.form.Form, slate.TensorBase)):
         return _assemble(f, tensor=tensor, bcs=solving._extract_bcs(bcs),
                          form_compiler_parameters=form_compiler_parameters,
@@ -146,6 +165,650 @@ def create_assembly_callable(f, tensor=None, bcs=None, form_compiler_parameters=
     return thunk
 
 
+class AssemblyPlan(object):
+    """A reusable plan for assembling a form into a fixed tensor.
+
+    :arg f: a :class:`~ufl.classes.Form` or :class:`~slate.TensorBase`
+         expression.
+    :arg tensor: an existing tensor object to place the result in
+         (optional).  If not provided, a suitable tensor is allocated
+         when the plan is built.  0-forms always allocate their own
+         tensor.
+    :arg bcs: a list of boundary conditions to apply (optional).
+    :arg form_compiler_parameters: (optional) dict of parameters to pass to
+         the form compiler.
+    :arg inverse: (optional) if f is a 2-form, then assemble the inverse
+         of the local matrices.
+    :arg mat_type: (optional) type for assembled matrices, see
+         :func:`assemble`.
+    :arg sub_mat_type: (optional) type for assembled sub matrices
+         inside a "nest" matrix, see :func:`assemble`.
+
+    Building the plan compiles the form, allocates the tensor and
+    constructs the argument lists of all the parallel loops required
+    for assembly.  Calling the plan then just executes these loops,
+    so repeated assembly of the same form into the same tensor skips
+    all the Python-level setup done by :func:`assemble`.  The loops
+    read the current values of the coefficients of ``f`` every time
+    the plan is executed.
+
+    .. note::
+
+       The boundary conditions are fixed when the plan is built.
+       Boundary conditions subsequently added to an assembled
+       :class:`.Matrix` (for example with ``bc.apply(A)``) are not
+       taken into account.  Build a new plan instead.
+    """
+    def __init__(self, f, tensor=None, bcs=None, form_compiler_parameters=None,
+                 inverse=False, mat_type=None, sub_mat_type=None):
+        bcs = solving._extract_bcs(bcs)
+        rank = len(f.arguments())
+        if mat_type is None:
+            mat_type = parameters.parameters["default_matrix_type"]
+        self._vec_bcs = ()
+        if rank == 2:
+            if tensor is None:
+                tensor = allocate_matrix(f, bcs=bcs,
+                                         form_compiler_parameters=form_compiler_parameters,
+                                         inverse=inverse, mat_type=mat_type,
+                                         sub_mat_type=sub_mat_type)
+            if mat_type == "matfree":
+                loops = [tensor.assemble]
+            else:
+                loops = _assemble(f, tensor=tensor, bcs=bcs,
+                                  form_compiler_parameters=form_compiler_parameters,
+                                  inverse=inverse, mat_type=mat_type,
+                                  sub_mat_type=sub_mat_type,
+                                  collect_loops=True)
+                # The plan is now responsible for assembling the
+                # matrix, drop any pending assembly callback.
+                tensor._assembly_callback = None
+            result = lambda: tensor
+        elif rank == 1:
+            if tensor is None:
+                tensor = function.Function(f.arguments()[0].function_space())
+            # Boundary conditions on vectors can't be collected into
+            # loops, so we apply them after executing the loops.
+            self._vec_bcs = bcs
+            loops = _assemble(f, tensor=tensor,
+                              form_compiler_parameters=form_compiler_parameters,
+                              collect_loops=True)
+            result = lambda: tensor
+        else:
+            if tensor is not None:
+                raise ValueError("Can't assemble 0-form into existing tensor")
+            tensor = op2.Global(1, [0.0])
+            loops = _assemble(f, tensor=tensor,
+                              form_compiler_parameters=form_compiler_parameters,
+                              collect_loops=True)
+            result = lambda: tensor.data[0]
+        self.form = f
+        self.tensor = tensor
+        self.bcs = bcs
+        self._loops = tuple(loops)
+        self._result = result
+
+    @utils.known_pyop2_safe
+    def __call__(self):
+        """Execute the plan.
+
+        Returns the assembled tensor: a :class:`float` for 0-forms, a
+        :class:`.Function` for 1-forms and a :class:`.Matrix` for
+        2-forms."""
+        for loop in self._loops:
+            loop()
+        for bc in self._vec_bcs:
+            bc.apply(self.tensor)
+        return self._result()
+
+    execute = __call__
+
+
+def assembly_plan(f, tensor=None, bcs=None, form_compiler_parameters=None,
+                  inverse=False, mat_type=None, sub_mat_type=None):
+    """Return an :class:`AssemblyPlan` for assembling f.
+
+    The arguments are as for :class:`AssemblyPlan`.  For UFL forms, the
+    plan is cached on the form, keyed on the identity of the tensor and
+    boundary conditions as well as the compiler parameters, so calling
+    this function repeatedly with the same arguments returns the same
+    plan.  For example:
+
+    .. code-block:: python
+
+       for t in timesteps:
+           ...
+           b = assembly_plan(L, tensor=b, bcs=bcs)()
+    """
+    bcs = solving._extract_bcs(bcs)
+    cache = getattr(f, "_cache", None)
+    if cache is None:
+        # Slate expressions do not carry a cache.
+        return AssemblyPlan(f, tensor=tensor, bcs=bcs,
+                            form_compiler_parameters=form_compiler_parameters,
+                            inverse=inverse, mat_type=mat_type,
+                            sub_mat_type=sub_mat_type)
+    if mat_type is None:
+        mat_type = parameters.parameters["default_matrix_type"]
+    if sub_mat_type is None:
+        sub_mat_type = parameters.parameters["default_sub_matrix_type"]
+    key = (id(tensor), tuple(id(bc) for bc in bcs),
+           str(sorted((form_compiler_parameters or {}).items())),
+           str(sorted(parameters.parameters["coffee"].items())),
+           inverse, mat_type, sub_mat_type)
+    plans = cache.setdefault("firedrake_assembly_plans", {})
+    try:
+        return plans[key]
+    except KeyError:
+        pass
+    # The plan holds references to the tensor and bcs, so their ids
+    # can't be recycled while the plan is in the cache.
+    plan = AssemblyPlan(f, tensor=tensor, bcs=bcs,
+                        form_compiler_parameters=form_compiler_parameters,
+                        inverse=inverse, mat_type=mat_type,
+                        sub_mat_type=sub_mat_type)
+    return plans.setdefault(key, plan)
+
+
+@utils.known_pyop2_safe
+def assemble_many(forms, tensors=None, bcs=None, form_compiler_parameters=None,
+                  mat_type=None, sub_mat_type=None):
+    """Assemble several forms defined on the same mesh, traversing
+    the mesh as few times as possible.
+
+    :arg forms: an iterable of forms (:class:`~ufl.classes.Form`).
+    :arg tensors: (optional) an iterable with one entry per form of
+         existing tensors to place the results in.  ``None`` entries
+         indicate that a new tensor should be created.  0-forms can
+         not be assembled into existing tensors.
+    :arg bcs: (optional) an iterable with one entry per form of the
+         boundary conditions to apply to that form.
+    :arg form_compiler_parameters: (optional) dict of parameters to pass to
+         the form compiler.
+    :arg mat_type: (optional) type for assembled matrices, see
+         :func:`assemble`.  Matrix-free assembly is not supported.
+    :arg sub_mat_type: (optional) type for assembled sub matrices
+         inside a "nest" matrix, see :func:`assemble`.
+    :returns: a list with the assembled result of each form, as
+         would be returned by :func:`assemble`.
+
+    Integrals of the same type over the same entities are evaluated
+    in a single fused parallel loop, so that the coordinates and
+    coefficients are only gathered once per entity.  For example,
+    for a Newton step:
+
+    .. code-block:: python
+
+       F, J = assemble_many([F, J], tensors=[F_, J_], bcs=[None, bcs])
+
+    Fusion is carried out for cell, exterior facet and interior facet
+    integrals on non-extruded meshes, with at most one matrix block
+    per fused loop.  All other integrals are assembled in separate
+    loops, exactly as by :func:`assemble`.
+    """
+    forms = tuple(forms)
+    nforms = len(forms)
+    tensors = tuple(tensors) if tensors is not None else (None, )*nforms
+    bcs = tuple(map(solving._extract_bcs, bcs)) if bcs is not None else ((), )*nforms
+    if len(tensors) != nforms or len(bcs) != nforms:
+        raise ValueError("Need exactly one tensor and one set of bcs per form")
+    if mat_type is None:
+        mat_type = parameters.parameters["default_matrix_type"]
+    if mat_type == "matfree":
+        raise NotImplementedError("Fused assembly of matrix-free matrices not implemented")
+
+    if form_compiler_parameters:
+        form_compiler_parameters = form_compiler_parameters.copy()
+    else:
+        form_compiler_parameters = {}
+    form_compiler_parameters["assemble_inverse"] = False
+
+    _check_fused_forms(forms)
+
+    # Allocate (or zero) the output tensors
+    outputs = []
+    for f, tensor, bcs_ in zip(forms, tensors, bcs):
+        rank = len(f.arguments())
+        if rank == 2:
+            if tensor is None:
+                tensor = allocate_matrix(f, bcs=bcs_,
+                                         form_compiler_parameters=form_compiler_parameters,
+                                         mat_type=mat_type, sub_mat_type=sub_mat_type)
+            elif isinstance(tensor, matrix.ImplicitMatrix):
+                raise ValueError("Can't fuse assembly into an implicit matrix")
+            else:
+                tensor.bcs = bcs_
+                tensor._assembly_callback = None
+                tensor._M.zero()
+        elif rank == 1:
+            if tensor is None:
+                tensor = function.Function(f.arguments()[0].function_space())
+            else:
+                tensor.dat.zero()
+        else:
+            if tensor is not None:
+                raise ValueError("Can't assemble 0-form into existing tensor")
+            tensor = op2.Global(1, [0.0])
+        outputs.append(tensor)
+
+    # Group the kernels of all forms by the entities they iterate over
+    groups = defaultdict(list)
+    for f, tensor, bcs_ in zip(forms, outputs, bcs):
+        for key, entry in _fused_entries(f, tensor, bcs_, form_compiler_parameters):
+            groups[key if key is not None else len(groups)].append(entry)
+
+    for entries in groups.values():
+        # Each fused loop can increment at most one matrix block
+        # (PyOP2 only supports one iteration space per loop), all
+        # vectors go into the first loop.  Global reductions are
+        # kept separate from loops that also iterate over the
+        # halo.
+        mats = [e for e in entries if e.rank == 2]
+        vecs = [e for e in entries if e.rank == 1]
+        scalars = [e for e in entries if e.rank == 0]
+        chunks = [mats[:1] + vecs] + [[e] for e in mats[1:]] + [scalars]
+        for chunk in chunks:
+            if not chunk:
+                continue
+            elif len(chunk) == 1:
+                e, = chunk
+                output = e.output[0] if e.rank in {0, 1} else e.output
+                _par_loop(e.kinfo.kernel, e.itspace, output, *e.args, **e.kwargs)
+            else:
+                kernel, args = _fuse_kernels(chunk)
+                _par_loop(kernel, chunk[0].itspace, *args)
+
+    results = []
+    for f, tensor, bcs_ in zip(forms, outputs, bcs):
+        rank = len(f.arguments())
+        if rank == 2:
+            _bc_diagonal_loops(tensor._M, tensor.block_shape, bcs_)
+            tensor._M.assemble()
+            results.append(tensor)
+        elif rank == 1:
+            for bc in bcs_:
+                bc.apply(tensor)
+            results.append(tensor)
+        else:
+            results.append(tensor.data[0])
+    return results
+
+
+@utils.known_pyop2_safe
+def assemble_functionals(forms, form_compiler_parameters=None):
+    """Assemble several 0-forms defined on the same mesh.
+
+    :arg forms: an iterable of 0-forms (:class:`~ufl.classes.Form`).
+    :arg form_compiler_parameters: (optional) dict of parameters to pass to
+         the form compiler.
+    :returns: a :class:`numpy.ndarray` with the value of each form.
+
+    All the forms are assembled into a single multi-component
+    :class:`pyop2.Global`.  Integrals of the same type over the same
+    entities are evaluated in one fused parallel loop, which reduces
+    the values of all its forms over the processes together, so that
+    a set of diagnostics integrated over the cells costs a single
+    traversal of the mesh and a single reduction, rather than one of
+    each per functional.
+
+    There is one reduction per fused loop (that is, for each integral
+    type and set of subdomains), not one for all the forms: PyOP2
+    reduces global arguments at the end of every parallel loop.
+    Integrals that can not be fused (see :func:`assemble_many`) are
+    assembled in separate loops, with one reduction each.
+    """
+    forms = tuple(forms)
+    if any(len(f.arguments()) != 0 for f in forms):
+        raise ValueError("Can only assemble functionals (0-forms)")
+    if form_compiler_parameters:
+        form_compiler_parameters = form_compiler_parameters.copy()
+    else:
+        form_compiler_parameters = {}
+    form_compiler_parameters["assemble_inverse"] = False
+    _check_fused_forms(forms)
+
+    comm = forms[0].ufl_domains()[0].comm
+    tensor = op2.Global(len(forms), numpy.zeros(len(forms)), comm=comm)
+    groups = defaultdict(list)
+    unfused = []
+    for offset, f in enumerate(forms):
+        for key, entry in _fused_entries(f, tensor, (), form_compiler_parameters,
+                                         offset=offset):
+            if key is None:
+                unfused.append(entry)
+            else:
+                groups[key].append(entry)
+    for entries in groups.values():
+        # Always go through a wrapper kernel, since we write into
+        # components of the result.
+        kernel, args = _fuse_kernels(entries)
+        _par_loop(kernel, entries[0].itspace, *args)
+    values = numpy.array(tensor.data_ro)
+    for e in unfused:
+        # The kernel writes the first component of its output.
+        _, offset = e.output
+        output = op2.Global(1, [0.0], comm=comm)
+        _par_loop(e.kinfo.kernel, e.itspace, output(op2.INC), *e.args, **e.kwargs)
+        values[offset] += output.data_ro[0]
+    return values
+
+
+def _par_loop(*args, **kwargs):
+    try:
+        return op2.par_loop(*args, **kwargs)
+    except MapValueError:
+        raise RuntimeError("Integral measure does not match measure of all coefficients/arguments")
+
+
+def _check_fused_forms(forms):
+    """Check that forms can be assembled together.
+
+    :arg forms: a tuple of forms (:class:`~ufl.classes.Form`).
+    :raises TypeError: if any of the forms is not a UFL form.
+    :raises NotImplementedError: if the forms are not defined on
+        the same mesh topology.
+    """
+    if len(forms) == 0:
+        raise ValueError("Need at least one form to assemble")
+    topology = forms[0].ufl_domains()[0].topology
+    for f in forms:
+        if not isinstance(f, ufl.form.Form):
+            raise TypeError("Can only fuse assembly of UFL forms, not %r" % f)
+        for m in f.ufl_domains():
+            m.init()
+            if m.topology != topology:
+                raise NotImplementedError("All forms must share a mesh topology.")
+        for o in chain(f.arguments(), f.coefficients()):
+            domain = o.ufl_domain()
+            if domain is not None and domain.topology != topology:
+                raise NotImplementedError("Assembly with multiple meshes not supported.")
+        if any((coeff.function_space() and coeff.function_space().component is not None)
+               for coeff in f.coefficients()):
+            raise NotImplementedError("Integration of subscripted VFS not yet implemented")
+
+
+FusedEntry = namedtuple("FusedEntry", ["kinfo", "rank", "itspace", "output",
+                                       "args", "kwargs"])
+"""A kernel to be called (possibly as part of a fused kernel).
+
+``output`` is the PyOP2 argument for the local tensor of 2-forms, a
+2-tuple of the iteration space and pointer arguments for 1-forms, and
+a 2-tuple of the :class:`pyop2.Global` argument and the offset into it
+for 0-forms.  ``args`` are the remaining PyOP2 arguments to the kernel.
+"""
+
+
+def _fused_entries(f, tensor, bcs, form_compiler_parameters, offset=0):
+    """Build the loop information for all kernels of a form.
+
+    :arg f: the :class:`~ufl.classes.Form`.
+    :arg tensor: the tensor to assemble into.  A :class:`.Matrix`
+        for 2-forms, a :class:`.Function` for 1-forms and a
+        :class:`pyop2.Global` for 0-forms.
+    :arg bcs: the boundary conditions to apply (only used for
+        building the maps of 2-forms).
+    :arg form_compiler_parameters: dict of parameters to pass to the
+        form compiler.
+    :arg offset: the component of the :class:`pyop2.Global` to
+        assemble 0-forms into.
+    :returns: a list of ``(key, entry)`` pairs, where entry is a
+        :class:`FusedEntry`.  Entries with the same key can be fused,
+        entries with a ``None`` key need a loop of their own.
+    """
+    rank = len(f.arguments())
+    kernels = tsfc_interface.compile_form(f, "form", parameters=form_compiler_parameters)
+    coefficients = f.coefficients()
+    domains = f.ufl_domains()
+    all_integer_subdomain_ids = defaultdict(list)
+    for k in kernels:
+        if k.kinfo.subdomain_id != "otherwise":
+            all_integer_subdomain_ids[k.kinfo.integral_type].append(k.kinfo.subdomain_id)
+    for k, v in all_integer_subdomain_ids.items():
+        all_integer_subdomain_ids[k] = tuple(sorted(v))
+
+    entries = []
+    for indices, kinfo in kernels:
+        integral_type = kinfo.integral_type
+        m = domains[kinfo.domain_number]
+        sdata = f.subdomain_data()[m].get(integral_type, None)
+        if integral_type != 'cell' and sdata is not None:
+            raise NotImplementedError("subdomain_data only supported with cell integrals.")
+        if integral_type == "cell" and kinfo.subdomain_id not in ["otherwise", "everywhere"] and \
+           sdata is not None:
+            raise ValueError("Cannot use subdomain data and subdomain_id")
+        itspace, get_map, decoration, extra_args, kwargs = \
+            _integral_loop_data(m, integral_type, kinfo.subdomain_id, sdata,
+                                all_integer_subdomain_ids)
+
+        if rank == 2:
+            i, j = indices
+            test, trial = f.arguments()
+            tsbc, trbc = _block_bcs(bcs, tensor.block_shape, i, j)
+            rmap = get_map(test.function_space()[i], tsbc, decoration)
+            cmap = get_map(trial.function_space()[j], trbc, decoration)
+            maps = (rmap[op2.i[0]] if rmap else None,
+                    cmap[op2.i[1 if rmap else 0]] if cmap else None)
+            output = tensor._M[i, j](op2.INC, maps)
+            fusable = rmap is not None and cmap is not None
+        elif rank == 1:
+            i, = indices
+            vmap = get_map(f.arguments()[0].function_space()[i])
+            # In a fused loop, vectors are incremented through
+            # pointers, so we need the un-indexed argument too.
+            output = (tensor.dat[i](op2.INC, vmap[op2.i[0]] if vmap else None),
+                      tensor.dat[i](op2.INC, vmap))
+            fusable = vmap is not None
+        else:
+            output = (tensor(op2.INC), offset)
+            fusable = True
+
+        coords = m.coordinates
+        args = [coords.dat(op2.READ, get_map(coords))]
+        if kinfo.oriented:
+            o = m.cell_orientations()
+            args.append(o.dat(op2.READ, get_map(o)))
+        for n in kinfo.coefficient_map:
+            for c_ in coefficients[n].split():
+                args.append(c_.dat(op2.READ, get_map(c_)))
+        if kinfo.needs_cell_facets:
+            extra_args.append(m.cell_to_facets(op2.READ))
+        args.extend(extra_args)
+        kwargs["pass_layer_arg"] = kinfo.pass_layer_arg
+
+        fusable = (fusable and sdata is None
+                   and integral_type in ("cell", "exterior_facet", "interior_facet")
+                   and not m.cell_set._extruded)
+        key = (integral_type, itspace, _kernel_options(kinfo.kernel)) if fusable else None
+        entries.append((key, FusedEntry(kinfo, rank, itspace, output, args, kwargs)))
+    return entries
+
+
+def _assemble_multiple(f, coefficients, tensors=None, bcs=None,
+                       form_compiler_parameters=None):
+    """Assemble a 0- or 1-form for several values of its coefficients.
+
+    :arg f: the :class:`~ufl.classes.Form` to assemble.
+    :arg coefficients: a dict mapping coefficients of ``f`` to lists
+        of values for them.
+    :arg tensors: (optional) a list of :class:`.Function` objects to
+        place the results in.
+    :arg bcs: (optional) boundary conditions to apply to each result.
+    :arg form_compiler_parameters: (optional) dict of parameters to pass to
+         the form compiler.
+    :returns: a list of the assembled results.
+
+    All the forms have the same kernels, so :func:`assemble_many`
+    evaluates them in one loop, gathering the geometry and any
+    coefficients that do not vary only once per entity.
+    """
+    if len(f.arguments()) > 1:
+        raise NotImplementedError("Assembly for multiple coefficient values only implemented for 0- and 1-forms")
+    values = dict((c, tuple(v)) for c, v in coefficients.items())
+    lengths = set(map(len, values.values()))
+    if len(lengths) != 1:
+        raise ValueError("Need the same number of values for every coefficient")
+    n, = lengths
+    for c in values:
+        if c not in f.coefficients():
+            raise ValueError("%r is not a coefficient of the form" % c)
+    forms = [ufl.replace(f, dict((c, v[k]) for c, v in values.items()))
+             for k in range(n)]
+    return assemble_many(forms, tensors=tensors, bcs=[bcs]*n,
+                         form_compiler_parameters=form_compiler_parameters)
+
+
+def _kernel_options(kernel):
+    """The options a :class:`pyop2.Kernel` is compiled with, which
+    must match for kernels to be fused.
+
+    :arg kernel: the :class:`pyop2.Kernel`.
+    :returns: a hashable description of the compiler options."""
+    return (tuple(sorted((k, repr(v)) for k, v in kernel._opts.items())),
+            kernel._cpp)
+
+
+# Fused kernels, keyed on the kernels they call and the layout of
+# their arguments, see _fuse_kernels.
+_fused_kernel_cache = {}
+
+
+def _fuse_kernels(entries):
+    """Build a single kernel calling several assembly kernels.
+
+    :arg entries: a list of :class:`FusedEntry` objects, one for each
+        kernel call.  Arguments shared between kernels are only passed
+        once.
+    :returns: a 2-tuple of the fused :class:`pyop2.Kernel` and the
+        PyOP2 arguments for it.
+
+    Matrix blocks are passed straight to the subkernels, scalars are
+    written into the requested component of the global.  Vectors are
+    assembled into a local temporary and then incremented through
+    pointers into the global data, since a loop can only carry one
+    iteration space.
+
+    The kernels must be compiled with the same options (see
+    :func:`_kernel_options`), the fused kernel is compiled with them
+    and the include directories, headers and linker arguments of all
+    the kernels.  The subkernels are included as the code COFFEE
+    already generated for them, so they are not optimised again.  The
+    fused kernel is cached, so that assembling the same forms again
+    (for example in a Newton loop) only collects the arguments.
+    """
+    kernels = [entry.kinfo.kernel for entry in entries]
+    options = set(_kernel_options(kernel) for kernel in kernels)
+    if len(options) != 1:
+        raise ValueError("Cannot fuse kernels compiled with different options")
+    # Collect the arguments, and the layout the fused kernel needs.
+    out_args = []
+    data_args = []
+    names = {}
+    layout = []
+    for kinfo, rank, _, output, args, _ in entries:
+        calls = []
+        for arg in args:
+            key = (id(arg.data), id(arg.map))
+            if key not in names:
+                names[key] = len(names)
+                data_args.append(arg)
+            calls.append(names[key])
+        if rank == 2:
+            out = len(out_args)
+            out_args.append(output)
+            extra = None
+        elif rank == 1:
+            out = len(out_args)
+            out_args.append(output[1])
+            extra = output[1].data.cdim
+        else:
+            arg, extra = output
+            key = (id(arg.data), None)
+            if key not in names:
+                names[key] = "A%d" % len(out_args)
+                out_args.append(arg)
+            out = names[key]
+        layout.append((kinfo.kernel.cache_key, rank, out, extra, tuple(calls)))
+    key = tuple(layout)
+    try:
+        kernel = _fused_kernel_cache[key]
+    except KeyError:
+        kernel = _fused_kernel_cache.setdefault(key, _fused_kernel(kernels, layout))
+    return kernel, out_args + data_args
+
+
+def _fused_kernel(kernels, layout):
+    """Generate a kernel calling several assembly kernels.
+
+    :arg kernels: the :class:`pyop2.Kernel` called by each subkernel call.
+    :arg layout: a list with a tuple ``(cache_key, rank, out, extra,
+        calls)`` for each subkernel call, as collected by
+        :func:`_fuse_kernels`.
+    :returns: the fused :class:`pyop2.Kernel`.
+    """
+    include_dirs = []
+    headers = []
+    ldargs = []
+    for kernel in kernels:
+        include_dirs.extend(d for d in kernel._include_dirs if d not in include_dirs)
+        headers.extend(h for h in kernel._headers if h not in headers)
+        ldargs.extend(a for a in (kernel._ldargs or []) if a not in ldargs)
+    subkernels = {}
+    out_decls = []
+    data_decls = {}
+    body = []
+    for k, (kernel, (_, rank, out, extra, calls)) in enumerate(zip(kernels, layout)):
+        try:
+            sub = subkernels[id(kernel)]
+        except KeyError:
+            # The same kernel may be called several times (with
+            # different data), but several forms may also produce
+            # different kernels with the same name.  COFFEE has
+            # already optimised the kernel AST in place.
+            sub = copy.deepcopy(kernel._ast)
+            sub.name = "%s_%d" % (sub.name, len(subkernels))
+            sub.pred = ["static", "inline"]
+            subkernels[id(kernel)] = sub
+        assert len(sub.args) == len(calls) + 1
+
+        for decl, n in zip(sub.args[1:], calls):
+            if n not in data_decls:
+                decl = copy.deepcopy(decl)
+                decl.sym.symbol = "w%d" % n
+                data_decls[n] = decl
+        call = ", ".join("w%d" % n for n in calls)
+
+        if rank == 2:
+            name = "A%d" % out
+            decl = copy.deepcopy(sub.args[0])
+            decl.sym.symbol = name
+            out_decls.append(decl)
+            body.append("%s(%s, %s);" % (sub.name, name, call))
+        elif rank == 1:
+            name = "A%d" % out
+            shape = sub.args[0].sym.rank
+            out_decls.append(ast.Decl("%s **" % SCALAR_TYPE, ast.Symbol(name)))
+            cdim = extra
+            size = numpy.prod(shape, dtype=int)
+            body.append("%s t%d%s = {0};" % (SCALAR_TYPE, k, "".join("[%d]" % e for e in shape)))
+            body.append("%s(t%d, %s);" % (sub.name, k, call))
+            body.append("for (int n = 0; n < %d; n++)" % (size // cdim))
+            body.append("  for (int d = 0; d < %d; d++)" % cdim)
+            body.append("    %s[n][d] += ((%s *)t%d)[n*%d + d];" % (name, SCALAR_TYPE, k, cdim))
+        else:
+            if out not in [decl.sym.symbol for decl in out_decls]:
+                out_decls.append(ast.Decl("%s *" % SCALAR_TYPE, ast.Symbol(out)))
+            body.append("%s(%s + %d, %s);" % (sub.name, out, extra, call))
+
+    name = "fused_assembly_kernel"
+    wrapper = ast.FunDecl("void", name, out_decls + [data_decls[n] for n in sorted(data_decls)],
+                          ast.Block([ast.FlatBlock("\n".join(body) + "\n")]))
+    # Pass the code rather than the AST, so that COFFEE does not
+    # optimise the subkernels a second time.
+    code = "\n".join(sub.gencode() for sub in list(subkernels.values()) + [wrapper])
+    return op2.Kernel(code, name, opts=kernels[0]._opts, include_dirs=include_dirs,
+                      headers=headers, ldargs=ldargs, cpp=kernels[0]._cpp)
+
+
 @utils.known_pyop2_safe
 def _assemble(f, tensor=None, bcs=None, form_compiler_parameters=None,
               inverse=False, mat_type=None, sub_mat_type=None,
@@ -273,27 +936,24 @@ def _assemble(f, tensor=None, bcs=None, form_compiler_parameters=None,
                 else:
                     raise ValueError('Unknown integral type "%s"' % integral_type)
 
-            # To avoid an extra check for extruded domains, the maps that are being passed in
-            # are DecoratedMaps. For the non-extruded case the DecoratedMaps don't restrict the
-            # space over which we iterate as the domains are dropped at Sparsity construction
-            # time. In the extruded case the cell domains are used to identify the regions of the
-            # mesh which require allocation in the sparsity.
             if cell_domains:
-                map_pairs.append((op2.DecoratedMap(test.cell_node_map(), cell_domains),
-                                  op2.DecoratedMap(trial.cell_node_map(), cell_domains)))
+                map_pairs.append((test.cell_node_map(), trial.cell_node_map(),
+                                  cell_domains))
             if exterior_facet_domains:
-                map_pairs.append((op2.DecoratedMap(test.exterior_facet_node_map(), exterior_facet_domains),
-                                  op2.DecoratedMap(trial.exterior_facet_node_map(), exterior_facet_domains)))
+                map_pairs.append((test.exterior_facet_node_map(),
+                                  trial.exterior_facet_node_map(),
+                                  exterior_facet_domains))
             if interior_facet_domains:
-                map_pairs.append((op2.DecoratedMap(test.interior_facet_node_map(), interior_facet_domains),
-                                  op2.DecoratedMap(trial.interior_facet_node_map(), interior_facet_domains)))
+                map_pairs.append((test.interior_facet_node_map(),
+                                  trial.interior_facet_node_map(),
+                                  interior_facet_domains))
 
-            map_pairs = tuple(map_pairs)
             # Construct OP2 Mat to assemble into
             fs_names = (test.function_space().name, trial.function_space().name)
 
             try:
-                sparsity = op2.Sparsity((test.function_space().dof_dset,
+                sparsity = get_sparsity(topology,
+                                        (test.function_space().dof_dset,
                                          trial.function_space().dof_dset),
                                         map_pairs,
                                         "%s_%s_sparsity" % fs_names,
@@ -346,6 +1006,8 @@ def _assemble(f, tensor=None, bcs=None, form_compiler_parameters=None,
         # 0-forms are always scalar
         if tensor is None:
             tensor = op2.Global(1, [0.0])
+        elif isinstance(tensor, op2.Global):
+            zero_tensor = tensor.zero
         else:
             raise ValueError("Can't assemble 0-form into existing tensor")
         result = lambda: tensor.data[0]
@@ -402,78 +1064,17 @@ def _assemble(f, tensor=None, bcs=None, form_compiler_parameters=None,
             # Extract block from tensor and test/trial spaces
             # FIXME Ugly variable renaming required because functions are not
             # lexical closures in Python and we're writing to these variables
-            if is_mat and result_matrix.block_shape > (1, 1):
-                tsbc = []
-                trbc = []
-                # Unwind ComponentFunctionSpace to check for matching BCs
-                for bc in bcs:
-                    fs = bc.function_space()
-                    if fs.component is not None:
-                        fs = fs.parent
-                    if fs.index == i:
-                        tsbc.append(bc)
-                    if fs.index == j:
-                        trbc.append(bc)
-            elif is_mat:
-                tsbc, trbc = bcs, bcs
+            if is_mat:
+                tsbc, trbc = _block_bcs(bcs, result_matrix.block_shape, i, j)
+
+            if integral_type == "cell" and subdomain_id not in ["otherwise", "everywhere"] and \
+               sdata is not None:
+                raise ValueError("Cannot use subdomain data and subdomain_id")
 
             # Now build arguments for the par_loop
-            kwargs = {}
-            # Some integrals require non-coefficient arguments at the
-            # end (facet number information).
-            extra_args = []
-            # Decoration for applying to matrix maps in extruded case
-            decoration = None
-            itspace = m.measure_set(integral_type, subdomain_id,
+            itspace, get_map, decoration, extra_args, kwargs = \
+                _integral_loop_data(m, integral_type, subdomain_id, sdata,
                                     all_integer_subdomain_ids)
-            if integral_type == "cell":
-                itspace = sdata or itspace
-
-                if subdomain_id not in ["otherwise", "everywhere"] and \
-                   sdata is not None:
-                    raise ValueError("Cannot use subdomain data and subdomain_id")
-
-                def get_map(x, bcs=None, decoration=None):
-                    return x.cell_node_map(bcs)
-
-            elif integral_type in ("exterior_facet", "exterior_facet_vert"):
-                extra_args.append(m.exterior_facets.local_facet_dat(op2.READ))
-
-                def get_map(x, bcs=None, decoration=None):
-                    return x.exterior_facet_node_map(bcs)
-
-            elif integral_type in ("exterior_facet_top", "exterior_facet_bottom"):
-                # In the case of extruded meshes with horizontal facet integrals, two
-                # parallel loops will (potentially) get created and called based on the
-                # domain id: interior horizontal, bottom or top.
-                decoration = {"exterior_facet_top": op2.ON_TOP,
-                              "exterior_facet_bottom": op2.ON_BOTTOM}[integral_type]
-                kwargs["iterate"] = decoration
-
-                def get_map(x, bcs=None, decoration=None):
-                    map_ = x.cell_node_map(bcs)
-                    if decoration is not None:
-                        return op2.DecoratedMap(map_, decoration)
-                    return map_
-
-            elif integral_type in ("interior_facet", "interior_facet_vert"):
-                extra_args.append(m.interior_facets.local_facet_dat(op2.READ))
-
-                def get_map(x, bcs=None, decoration=None):
-                    return x.interior_facet_node_map(bcs)
-
-            elif integral_type == "interior_facet_horiz":
-                decoration = op2.ON_INTERIOR_FACETS
-                kwargs["iterate"] = decoration
-
-                def get_map(x, bcs=None, decoration=None):
-                    map_ = x.cell_node_map(bcs)
-                    if decoration is not None:
-                        return op2.DecoratedMap(map_, decoration)
-                    return map_
-
-            else:
-                raise ValueError("Unknown integral type '%s'" % integral_type)
 
             # Output argument
             if is_mat:
@@ -512,39 +1113,8 @@ def _assemble(f, tensor=None, bcs=None, form_compiler_parameters=None,
         # to apply bcs to a block which is otherwise zero, and
         # therefore does not have an associated kernel.
         if bcs is not None and is_mat:
-            for bc in bcs:
-                fs = bc.function_space()
-                # Evaluate this outwith a "collecting_loops" block,
-                # since creation of the bc nodes actually can create a
-                # par_loop.
-                nodes = bc.nodes
-                if len(fs) > 1:
-                    raise RuntimeError("""Cannot apply boundary conditions to full mixed space. Did you forget to index it?""")
-                shape = result_matrix.block_shape
-                with collecting_loops(collect_loops):
-                    for i in range(shape[0]):
-                        for j in range(shape[1]):
-                            # Set diagonal entries on bc nodes to 1 if the current
-                            # block is on the matrix diagonal and its index matches the
-                            # index of the function space the bc is defined on.
-                            if i != j:
-                                continue
-                            if fs.component is None and fs.index is not None:
-                                # Mixed, index (no ComponentFunctionSpace)
-                                if fs.index == i:
-                                    loops.append(tensor[i, j].set_local_diagonal_entries(nodes))
-                            elif fs.component is not None:
-                                # ComponentFunctionSpace, check parent index
-                                if fs.parent.index is not None:
-                                    # Mixed, index doesn't match
-                                    if fs.parent.index != i:
-                                        continue
-                                # Index matches
-                                loops.append(tensor[i, j].set_local_diagonal_entries(nodes, idx=fs.component))
-                            elif fs.index is None:
-                                loops.append(tensor[i, j].set_local_diagonal_entries(nodes))
-                            else:
-                                raise RuntimeError("Unhandled BC case")
+            loops.extend(_bc_diagonal_loops(tensor, result_matrix.block_shape,
+                                            bcs, collect_loops=collect_loops))
         if bcs is not None and is_vec:
             if len(bcs) > 0 and collect_loops:
                 raise NotImplementedError("Loop collection not handled in this case")
@@ -563,3 +1133,144 @@ def _assemble(f, tensor=None, bcs=None, form_compiler_parameters=None,
         return result()
     else:
         return thunk(bcs)
+
+
+def _cell_map(x, bcs=None, decoration=None):
+    return x.cell_node_map(bcs)
+
+
+def _decorated_cell_map(x, bcs=None, decoration=None):
+    map_ = x.cell_node_map(bcs)
+    if decoration is not None:
+        return op2.DecoratedMap(map_, decoration)
+    return map_
+
+
+def _exterior_facet_map(x, bcs=None, decoration=None):
+    return x.exterior_facet_node_map(bcs)
+
+
+def _interior_facet_map(x, bcs=None, decoration=None):
+    return x.interior_facet_node_map(bcs)
+
+
+def _integral_loop_data(m, integral_type, subdomain_id, sdata,
+                        all_integer_subdomain_ids):
+    """Collect the information required to build a par_loop for an
+    integral.
+
+    :arg m: the mesh the integral is defined on.
+    :arg integral_type: the type of the integral.
+    :arg subdomain_id: the subdomain of the integral.
+    :arg sdata: any subdomain data for the integral (or ``None``).
+    :arg all_integer_subdomain_ids: information to interpret the
+        "otherwise" subdomain (see :meth:`~.MeshTopology.measure_set`).
+    :returns: a 5-tuple of the iteration set, a function returning
+        the map for a function space, the map decoration (extruded
+        only), a list of extra (non-coefficient) arguments to the
+        kernel and a dict of keyword arguments for the par_loop.
+    """
+    # Some integrals require non-coefficient arguments at the
+    # end (facet number information).
+    extra_args = []
+    kwargs = {}
+    # Decoration for applying to matrix maps in extruded case
+    decoration = None
+    itspace = m.measure_set(integral_type, subdomain_id,
+                            all_integer_subdomain_ids)
+    if integral_type == "cell":
+        itspace = sdata or itspace
+        get_map = _cell_map
+    elif integral_type in ("exterior_facet", "exterior_facet_vert"):
+        extra_args.append(m.exterior_facets.local_facet_dat(op2.READ))
+        get_map = _exterior_facet_map
+    elif integral_type in ("exterior_facet_top", "exterior_facet_bottom"):
+        # In the case of extruded meshes with horizontal facet integrals, two
+        # parallel loops will (potentially) get created and called based on the
+        # domain id: interior horizontal, bottom or top.
+        decoration = {"exterior_facet_top": op2.ON_TOP,
+                      "exterior_facet_bottom": op2.ON_BOTTOM}[integral_type]
+        kwargs["iterate"] = decoration
+        get_map = _decorated_cell_map
+    elif integral_type in ("interior_facet", "interior_facet_vert"):
+        extra_args.append(m.interior_facets.local_facet_dat(op2.READ))
+        get_map = _interior_facet_map
+    elif integral_type == "interior_facet_horiz":
+        decoration = op2.ON_INTERIOR_FACETS
+        kwargs["iterate"] = decoration
+        get_map = _decorated_cell_map
+    else:
+        raise ValueError("Unknown integral type '%s'" % integral_type)
+    return itspace, get_map, decoration, extra_args, kwargs
+
+
+def _bc_diagonal_loops(tensor, shape, bcs, collect_loops=False):
+    """Set the diagonal entries of a matrix on boundary condition nodes.
+
+    :arg tensor: the :class:`pyop2.Mat` to modify.
+    :arg shape: the block shape of the matrix.
+    :arg bcs: an iterable of boundary conditions.
+    :arg collect_loops: should the loops be collected rather than
+        executed?
+    :returns: a list of the (collected) loops.
+    """
+    loops = []
+    for bc in bcs:
+        fs = bc.function_space()
+        # Evaluate this outwith a "collecting_loops" block,
+        # since creation of the bc nodes actually can create a
+        # par_loop.
+        nodes = bc.nodes
+        if len(fs) > 1:
+            raise RuntimeError("""Cannot apply boundary conditions to full mixed space. Did you forget to index it?""")
+        with collecting_loops(collect_loops):
+            for i in range(shape[0]):
+                for j in range(shape[1]):
+                    # Set diagonal entries on bc nodes to 1 if the current
+                    # block is on the matrix diagonal and its index matches the
+                    # index of the function space the bc is defined on.
+                    if i != j:
+                        continue
+                    if fs.component is None and fs.index is not None:
+                        # Mixed, index (no ComponentFunctionSpace)
+                        if fs.index == i:
+                            loops.append(tensor[i, j].set_local_diagonal_entries(nodes))
+                    elif fs.component is not None:
+                        # ComponentFunctionSpace, check parent index
+                        if fs.parent.index is not None:
+                            # Mixed, index doesn't match
+                            if fs.parent.index != i:
+                                continue
+                        # Index matches
+                        loops.append(tensor[i, j].set_local_diagonal_entries(nodes, idx=fs.component))
+                    elif fs.index is None:
+                        loops.append(tensor[i, j].set_local_diagonal_entries(nodes))
+                    else:
+                        raise RuntimeError("Unhandled BC case")
+    return loops
+
+
+def _block_bcs(bcs, shape, i, j):
+    """Return the boundary conditions acting on the rows and columns
+    of a block of a matrix.
+
+    :arg bcs: an iterable of boundary conditions.
+    :arg shape: the block shape of the matrix.
+    :arg i: the row block index.
+    :arg j: the column block index.
+    :returns: a 2-tuple of the row and column boundary conditions.
+    """
+    if shape == (1, 1):
+        return bcs, bcs
+    tsbc = []
+    trbc = []
+    # Unwind ComponentFunctionSpace to check for matching BCs
+    for bc in bcs:
+        fs = bc.function_space()
+        if fs.component is not None:
+            fs = fs.parent
+        if fs.index == i:
+            tsbc.append(bc)
+        if fs.index == j:
+            trbc.append(bc)
+    return tsbc, trbc
@@ -1,10 +1,21 @@
 from firedrake.petsc import PETSc
+from pyop2.datatypes import IntType
 from pyop2.mpi import COMM_WORLD, dup_comm, free_comm
 from firedrake import hdf5interface as h5i
+from firedrake import dmplex
+from firedrake import utils
+from firedrake.halo import _get_mtype
+from mpi4py import MPI
+import contextlib
 import firedrake
+import hashlib
 import numpy as np
 import os
+import tempfile
+import threading
+import weakref
 import h5py
+import ufl
 
 
 __all__ = ["DumbCheckpoint", "HDF5File", "FILE_READ", "FILE_CREATE", "FILE_UPDATE"]
@@ -20,13 +31,575 @@ FILE_UPDATE = PETSc.Viewer.Mode.APPEND
 """Open a checkpoint file for updating.  Creates the file if it does not exist, providing both read and write access."""
 
 
+try:
+    _MPI_INT = MPI.__TypeDict__[np.dtype(IntType).char]
+except AttributeError:
+    _MPI_INT = MPI._typedict[np.dtype(IntType).char]
+
+
+def _chunk_sf(comm, size, indices):
+    """Build an SF from indices into a global array to the owners of
+    those entries, when the array is split evenly over the processes.
+
+    :arg comm: The communicator.
+    :arg size: The global size of the array.
+    :arg indices: The global indices of the leaves (one leaf per index).
+    :returns: A tuple of the SF and the ``(start, stop)`` range of the
+        array owned by this process (the roots of the SF).
+    """
+    starts = np.array([(size * r) // comm.size for r in range(comm.size + 1)],
+                      dtype=IntType)
+    owners = np.searchsorted(starts, indices, side="right") - 1
+    remote = np.empty((len(indices), 2), dtype=IntType)
+    remote[:, 0] = owners
+    remote[:, 1] = indices - starts[owners]
+    start, stop = starts[comm.rank], starts[comm.rank + 1]
+    sf = PETSc.SF().create(comm=comm)
+    sf.setGraph(stop - start, None, remote.reshape(-1))
+    return sf, (start, stop)
+
+
+class _Layout(object):
+    """The layout of the dofs of a function space, in terms of the
+    global point numbering of the mesh (which does not depend on the
+    number of processes the mesh is distributed over).
+
+    :arg V: The function space.
+
+    Checkpoints store the layout of every stored function, so that
+    they can be read on a different number of processes.
+    """
+    def __init__(self, V):
+        mesh = V.mesh().topology
+        self.comm = mesh.comm
+        self.numbering = mesh._global_point_numbering
+        if self.numbering is None or len(V) > 1:
+            # No layout without a global point numbering, or for
+            # mixed spaces.
+            self.name = None
+            return
+        self.cdim = V.value_size
+        self.npoints = self.comm.allreduce(self.numbering.max() + 1 if len(self.numbering) else 0,
+                                           op=MPI.MAX)
+        dofs, offsets = dmplex.section_offsets(V._shared_data.global_numbering)
+        nowned = V.node_set.size
+        # Owned nodes are numbered first.
+        owned, = np.where((dofs > 0) & (offsets < nowned))
+        self.points = self.numbering[owned]
+        self.dofs = dofs[owned]
+        self.offsets = offsets[owned]
+        self.node_start = self.comm.exscan(nowned) or 0
+        self.nnodes = self.comm.allreduce(nowned)
+        key = "%s %s %d %d" % (V.ufl_element(), mesh.name, self.npoints, self.nnodes)
+        self.name = hashlib.md5(key.encode()).hexdigest()
+
+    def writable(self, comm):
+        """Can the layout be written to a file opened on a communicator?
+
+        :arg comm: The communicator.
+
+        Only if there is a layout, and the file is shared by all
+        processes of the mesh."""
+        return self.name is not None and \
+            MPI.Comm.Compare(comm, self.comm) in {MPI.IDENT, MPI.CONGRUENT}
+
+    @utils.cached_property
+    def point_offsets(self):
+        """The part of the stored layout owned by this process.
+
+        :returns: A tuple ``(start, stop, offsets)``, with the global
+            number of the first node on each point in ``[start, stop)``
+            (or -1 for points without nodes).
+
+        Collective over the communicator of the mesh."""
+        sf, (start, stop) = _chunk_sf(self.comm, self.npoints, self.points)
+        point_offsets = np.full(stop - start, -1, dtype=IntType)
+        dmplex.sf_reduce(sf, _MPI_INT, self.offsets + self.node_start, point_offsets)
+        return start, stop, point_offsets
+
+    def write(self, h5file, comm):
+        """Write the layout to a file (if it is not there yet).
+
+        :arg h5file: The :class:`h5py:File`.
+        :arg comm: The communicator the file was opened on.
+        :returns: The path to the layout, or None if there is no
+            layout, or the file is not shared by all processes of
+            the mesh.
+
+        Stores the global node number of the first node on each point
+        of the mesh, indexed by the global point number.  Collective
+        over the communicator of the mesh."""
+        if not self.writable(comm):
+            return None
+        path = "/layouts/%s" % self.name
+        if path in h5file:
+            return path
+        start, stop, point_offsets = self.point_offsets
+        dset = h5file.create_dataset(path, shape=(self.npoints, ), dtype=IntType)
+        with _collective(dset):
+            dset[start:stop] = point_offsets
+        dset.attrs["nnodes"] = self.nnodes
+        dset.attrs["cdim"] = self.cdim
+        return path
+
+    def read(self, h5file, path, read_nodes, dat):
+        """Read data written with this layout on any number of processes.
+
+        :arg h5file: The :class:`h5py:File`.
+        :arg path: The path to the layout.
+        :arg read_nodes: Callable with arguments ``(start, stop)``
+            returning the data of the stored nodes in that range,
+            with shape ``(stop - start, cdim)``.
+        :arg dat: The :class:`pyop2.Dat` to read the data into.
+        """
+        if self.name is None:
+            raise ValueError("No layout for function space, can't redistribute")
+        dset = h5file[path]
+        if dset.attrs["nnodes"] != self.nnodes or dset.attrs["cdim"] != self.cdim \
+           or dset.shape != (self.npoints, ):
+            raise ValueError("Stored layout does not match function space")
+        # The global number of the first stored node on each point
+        sf, (start, stop) = _chunk_sf(self.comm, self.npoints, self.points)
+        point_offsets = np.ascontiguousarray(dset[start:stop], dtype=IntType)
+        first = np.empty(len(self.points), dtype=IntType)
+        dmplex.sf_bcast(sf, _MPI_INT, point_offsets, first)
+        if (first < 0).any():
+            raise ValueError("Stored layout does not match function space")
+        # Stored and local node numbers of every owned node
+        within = np.arange(self.dofs.sum(), dtype=IntType) - np.repeat(np.cumsum(self.dofs) - self.dofs, self.dofs)
+        stored = np.repeat(first, self.dofs) + within
+        local = np.repeat(self.offsets, self.dofs) + within
+        sf, (start, stop) = _chunk_sf(self.comm, self.nnodes, stored)
+        data = np.ascontiguousarray(read_nodes(start, stop), dtype=dat.dtype)
+        values = np.empty((len(stored), self.cdim), dtype=dat.dtype)
+        dmplex.sf_bcast(sf, _get_mtype(dat), data, values)
+        dat.data.reshape(-1, self.cdim)[local] = values
+
+
+def _get_layout(layouts, V):
+    """Get the (cached) :class:`_Layout` of a function space.
+
+    :arg layouts: dict caching layouts.
+    :arg V: The function space.
+    """
+    try:
+        return layouts[V]
+    except KeyError:
+        return layouts.setdefault(V, _Layout(V))
+
+
+def _collective(dset):
+    """Collective access to a dataset, if h5py supports MPI."""
+    try:
+        return dset.collective
+    except AttributeError:
+        # Another MPI/non-MPI difference
+        return contextlib.ExitStack()
+
+
+class _StoredCopies(object):
+    """Where the data of stored functions is, so that functions whose
+    values have not changed since they were last stored can be linked
+    to the stored copy, rather than stored again.
+
+    :arg comm: The communicator of the checkpoint file.
+
+    Changes are detected by comparing digests of the data (see
+    :func:`.utils.dat_digest`), since PyOP2 does not count
+    modifications of a Dat.  Hashing the data is much cheaper than
+    writing it.
+    """
+    def __init__(self, comm):
+        self.comm = comm
+        self._copies = {}
+
+    def find(self, key, dat):
+        """Find an up to date stored copy of some data.
+
+        :arg key: The name the data is stored under.
+        :arg dat: The :class:`pyop2.Dat` to store.
+        :returns: A tuple ``(digest, copy)`` of the digest of the
+            data, and the ``(filename, path)`` of a stored copy of
+            it, or ``None`` if it must be stored again.
+
+        Collective over the communicator."""
+        digest = utils.dat_digest(dat)
+        ref, stored_digest, copy = self._copies.get(key, (None, None, None))
+        stale = ref is None or ref() is not dat or stored_digest != digest
+        if self.comm.allreduce(stale, op=MPI.LOR):
+            copy = None
+        return digest, copy
+
+    def add(self, key, dat, digest, copy):
+        """Record a stored copy of some data.
+
+        :arg key: The name the data is stored under.
+        :arg dat: The :class:`pyop2.Dat` stored.
+        :arg digest: The digest of its data when stored.
+        :arg copy: The ``(filename, path)`` of the stored copy."""
+        self._copies[key] = (weakref.ref(dat), digest, copy)
+
+
+def _link(h5file, path, copy):
+    """Link to a stored copy of data.
+
+    :arg h5file: The :class:`h5py:File` to create the link in.
+    :arg path: The path of the link.
+    :arg copy: The ``(filename, path)`` of the stored copy.
+
+    Copies in the same file are linked with soft links, copies in
+    other files with external links (relative to the directory of
+    the file)."""
+    filename, target = copy
+    here = os.path.abspath(h5file.filename)
+    if os.path.abspath(filename) == here:
+        if path == target:
+            return
+        link = h5py.SoftLink(target)
+    else:
+        link = h5py.ExternalLink(os.path.relpath(filename, os.path.dirname(here)), target)
+    if h5file.get(path, getlink=True) is not None:
+        del h5file[path]
+    h5file[path] = link
+
+
+def _unlink(h5file, path):
+    """Remove a link to a stored copy of data (so that new data is
+    not written through it).
+
+    :arg h5file: The :class:`h5py:File`.
+    :arg path: The path of the (possible) link."""
+    if isinstance(h5file.get(path, getlink=True), (h5py.SoftLink, h5py.ExternalLink)):
+        del h5file[path]
+
+
+def _write_per_process(h5file, comm, path, array):
+    """Write an array from every process to a dataset, concatenated
+    in rank order.
+
+    :arg h5file: The :class:`h5py:File`, opened on ``comm``.
+    :arg comm: The communicator.
+    :arg path: The path of the dataset.
+    :arg array: The array of this process.
+
+    The offsets of the arrays of each process are written to the
+    attribute ``offsets`` of the dataset.  Collective over ``comm``."""
+    array = np.asarray(array)
+    sizes = comm.allgather(array.shape[0])
+    offsets = np.concatenate(([0], np.cumsum(sizes))).astype(IntType)
+    dset = h5file.create_dataset(path, shape=(offsets[-1], ) + array.shape[1:],
+                                 dtype=array.dtype)
+    with _collective(dset):
+        dset[offsets[comm.rank]:offsets[comm.rank + 1]] = array
+    dset.attrs["offsets"] = offsets
+
+
+def _read_per_process(h5file, comm, path):
+    """Read the array of this process written with
+    :func:`_write_per_process`.
+
+    :arg h5file: The :class:`h5py:File`.
+    :arg comm: The communicator.
+    :arg path: The path of the dataset.
+    """
+    dset = h5file[path]
+    offsets = dset.attrs["offsets"]
+    return np.ascontiguousarray(dset[offsets[comm.rank]:offsets[comm.rank + 1]])
+
+
+# Labels recreated when building a plex
+_DERIVED_LABELS = {"depth", "celltype"}
+
+
+def _store_mesh(h5file, comm, mesh, path):
+    """Store a distributed mesh.
+
+    :arg h5file: The :class:`h5py:File`, opened on the communicator of
+        the mesh.
+    :arg comm: The communicator the file was opened on.
+    :arg mesh: The mesh.
+    :arg path: The group to store the mesh in.
+
+    Every process stores its part of the plex (cones and labels,
+    including the entity class labels), the point SF, the plex
+    renumbering and its coordinates, so that :func:`_load_mesh` can
+    rebuild the mesh on the same number of processes without
+    partitioning and renumbering it.
+    """
+    mesh.init()
+    topology = mesh.topology
+    if isinstance(topology, firedrake.mesh.ExtrudedMeshTopology):
+        raise NotImplementedError("Can't store extruded meshes")
+    if MPI.Comm.Compare(comm, topology.comm) not in {MPI.IDENT, MPI.CONGRUENT}:
+        raise ValueError("Mesh must be stored on its own communicator")
+    plex = topology._plex
+    group = h5file.require_group(path)
+
+    sizes, cones, orientations = dmplex.get_cones(plex)
+    _write_per_process(h5file, comm, path + "/cone_sizes", sizes)
+    _write_per_process(h5file, comm, path + "/cones", cones)
+    _write_per_process(h5file, comm, path + "/cone_orientations", orientations)
+
+    if comm.size > 1:
+        nroots, ilocal, iremote = plex.getPointSF().getGraph()
+        if ilocal is None:
+            ilocal = np.arange(len(iremote), dtype=IntType)
+        _write_per_process(h5file, comm, path + "/sf_nroots", np.array([nroots], dtype=IntType))
+        _write_per_process(h5file, comm, path + "/sf_leaves", np.asarray(ilocal, dtype=IntType))
+        _write_per_process(h5file, comm, path + "/sf_remotes",
+                           np.asarray(iremote, dtype=IntType).reshape(-1, 2))
+
+    names = [plex.getLabelName(i) for i in range(plex.getNumLabels())]
+    names = [name for name in names if name not in _DERIVED_LABELS]
+    for name in names:
+        points, values = dmplex.get_label_values(plex, name)
+        _write_per_process(h5file, comm, "%s/labels/%s/points" % (path, name), points)
+        _write_per_process(h5file, comm, "%s/labels/%s/values" % (path, name), values)
+
+    _write_per_process(h5file, comm, path + "/renumbering", topology._plex_renumbering.indices)
+    numbering = topology._global_point_numbering
+    if numbering is not None:
+        _write_per_process(h5file, comm, path + "/global_point_numbering", numbering)
+
+    coordinates = mesh.coordinates
+    element = coordinates.ufl_element()
+    _write_per_process(h5file, comm, path + "/coordinates",
+                       coordinates.dat.data_ro_with_halos)
+
+    group.attrs["nprocs"] = comm.size
+    group.attrs["name"] = topology.name
+    group.attrs["dimension"] = plex.getDimension()
+    group.attrs["reorder"] = topology._did_reordering
+    group.attrs["coordinate_family"] = element.family()
+    group.attrs["coordinate_degree"] = element.degree()
+    group.attrs["geometric_dimension"] = coordinates.ufl_shape[0]
+
+
+def _load_mesh(h5file, comm, path):
+    """Load a mesh stored with :func:`_store_mesh`.
+
+    :arg h5file: The :class:`h5py:File`.
+    :arg comm: The communicator to build the mesh on, with the same
+        size as that the mesh was stored from.
+    :arg path: The group the mesh was stored in.
+    :returns: The mesh.
+    """
+    from firedrake.function import CoordinatelessFunction
+    from firedrake.functionspace import VectorFunctionSpace
+    from firedrake.mesh import MeshTopology, MeshGeometry
+    group = h5file[path]
+    if group.attrs["nprocs"] != comm.size:
+        raise ValueError("Process mismatch: mesh stored on %d, have %d" %
+                         (group.attrs["nprocs"], comm.size))
+
+    def read(name):
+        return _read_per_process(h5file, comm, "%s/%s" % (path, name))
+
+    plex = PETSc.DMPlex().create(comm=comm)
+    plex.setDimension(int(group.attrs["dimension"]))
+    sizes = read("cone_sizes")
+    plex.setChart(0, len(sizes))
+    dmplex.set_cones(plex, sizes, read("cones"), read("cone_orientations"))
+    plex.symmetrize()
+    plex.stratify()
+
+    if "sf_nroots" in group:
+        sf = PETSc.SF().create(comm=comm)
+        sf.setGraph(int(read("sf_nroots")[0]), read("sf_leaves"), read("sf_remotes").reshape(-1))
+        plex.setPointSF(sf)
+
+    for name in group["labels"]:
+        dmplex.set_label_values(plex, name, read("labels/%s/points" % name),
+                                read("labels/%s/values" % name))
+
+    renumbering = PETSc.IS().createGeneral(read("renumbering"), comm=comm)
+    topology = MeshTopology(plex, name=group.attrs["name"],
+                            reorder=bool(group.attrs["reorder"]),
+                            distribute=False, renumbering=renumbering)
+    if "global_point_numbering" in group:
+        topology._global_point_numbering = read("global_point_numbering")
+
+    family = group.attrs["coordinate_family"]
+    degree = int(group.attrs["coordinate_degree"])
+    gdim = int(group.attrs["geometric_dimension"])
+    coordinates_data = read("coordinates")
+    cell = topology.ufl_cell().reconstruct(geometric_dimension=gdim)
+    mesh = MeshGeometry.__new__(MeshGeometry, ufl.VectorElement(family, cell, degree, dim=gdim))
+    mesh._topology = topology
+
+    def callback(self):
+        """Finish initialisation."""
+        del self._callback
+        self.topology.init()
+        V = VectorFunctionSpace(self.topology, family, degree, dim=gdim)
+        coordinates = CoordinatelessFunction(V, val=coordinates_data, name="Coordinates")
+        self.__init__(coordinates)
+
+    mesh._callback = callback
+    return mesh
+
+
+# Number of entries in each chunk of the time index of a DumbCheckpoint
+_TIMESTEP_CHUNK_SIZE = 1024
+
+
+class CheckpointHandle(object):
+    """A handle on an asynchronous checkpoint write.
+
+    Returned by :meth:`DumbCheckpoint.store` and
+    :meth:`HDF5File.write`.
+
+    :arg done: Has the write already finished?"""
+
+    def __init__(self, done=False):
+        self._event = threading.Event()
+        self._error = None
+        if done:
+            self._event.set()
+
+    def done(self):
+        """Has the write finished?"""
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """Wait for the write to finish.
+
+        :arg timeout: Optional timeout in seconds.
+        :returns: Whether the write finished.
+
+        Raises any error from the write."""
+        self._event.wait(timeout)
+        if self._error is not None:
+            raise self._error
+        return self.done()
+
+
+class _CheckpointWriter(object):
+    """Writes checkpoint data on a background thread.
+
+    Data to write is first copied into a staging buffer, so that
+    computation can continue while it is written.
+
+    :arg max_staging_bytes: Optional bound on the size of the staged
+        data.  Staging more data blocks until enough earlier writes
+        have finished.
+    :arg staging_dir: Optional directory (for example node-local
+        scratch) to stage data in, rather than memory.
+    """
+
+    def __init__(self, max_staging_bytes=None, staging_dir=None):
+        from firedrake.output import _AsyncWriter
+        # The amount of staged data bounds the queue.
+        self._writer = _AsyncWriter(max_pending=0)
+        self._max_staging_bytes = max_staging_bytes
+        self._staging_dir = staging_dir
+        self._staged = 0
+        self._condition = threading.Condition()
+        self._handles = []
+
+    def stage(self, array):
+        """Copy an array into a staging buffer.
+
+        :returns: The buffer."""
+        buf, = self.stage_many([array])
+        return buf
+
+    def stage_many(self, arrays):
+        """Copy several arrays into staging buffers, reserving space
+        for all of them at once.
+
+        The buffers must be released by a single :meth:`submit`, since
+        staging the arrays one at a time could wait for space that
+        only that write frees.
+
+        :returns: A list of the buffers."""
+        nbytes = sum(array.nbytes for array in arrays)
+        with self._condition:
+            # Data larger than the bound is staged on its own.
+            self._condition.wait_for(lambda: (self._max_staging_bytes is None
+                                              or self._staged == 0
+                                              or self._staged + nbytes <= self._max_staging_bytes))
+            self._staged += nbytes
+        return [self._copy(array) for array in arrays]
+
+    def _copy(self, array):
+        """Copy an array into a staging buffer, in memory or in the
+        staging directory."""
+        if self._staging_dir is None or array.nbytes == 0:
+            return array.copy()
+        fd, fname = tempfile.mkstemp(dir=self._staging_dir, suffix=".staged")
+        try:
+            buf = np.memmap(fname, dtype=array.dtype, mode="w+", shape=array.shape)
+        finally:
+            # The mapping outlives the file name.
+            os.close(fd)
+            os.remove(fname)
+        buf[...] = array
+        return buf
+
+    def submit(self, job, staged=()):
+        """Queue a write.
+
+        :arg job: Callable doing the write.
+        :arg staged: The staging buffers used by the write, released
+            when it has finished.
+        :returns: A :class:`CheckpointHandle`."""
+        handle = CheckpointHandle()
+        nbytes = sum(buf.nbytes for buf in staged)
+
+        def run():
+            try:
+                job()
+            except Exception as e:
+                handle._error = e
+            finally:
+                with self._condition:
+                    self._staged -= nbytes
+                    self._condition.notify_all()
+                handle._event.set()
+        self._handles.append(handle)
+        self._writer.submit(run)
+        return handle
+
+    def flush(self):
+        """Wait for all queued writes to finish, raising the first
+        error from a write."""
+        self._writer.flush()
+        handles, self._handles = self._handles, []
+        for handle in handles:
+            handle.wait()
+
+    def close(self):
+        """Finish all queued writes and stop the thread."""
+        try:
+            self.flush()
+        finally:
+            self._writer.close()
+
+
+def _make_writer(asynchronous, max_staging_bytes, staging_dir):
+    """Create a :class:`_CheckpointWriter` if asynchronous writes were
+    requested and MPI supports them."""
+    if not asynchronous:
+        return None
+    if MPI.Query_thread() < MPI.THREAD_MULTIPLE:
+        from firedrake.logging import warning
+        warning("Asynchronous checkpointing needs MPI_THREAD_MULTIPLE, writing synchronously")
+        return None
+    return _CheckpointWriter(max_staging_bytes=max_staging_bytes,
+                             staging_dir=staging_dir)
+
+
 class DumbCheckpoint(object):
 
     """A very dumb checkpoint object.
 
     This checkpoint object is capable of writing :class:`~.Function`\s
-    to disk in parallel (using HDF5) and reloading them on the same
-    number of processes and a :func:`~.Mesh` constructed identically.
+    to disk in parallel (using HDF5) and reloading them on a
+    :func:`~.Mesh` constructed identically.  Data written on a
+    different number of processes is redistributed to the partition
+    of the reading mesh, using the layout of the dofs in terms of the
+    mesh's global point numbering stored alongside the data.
 
     :arg basename: the base name of the checkpoint file.
     :arg single_file: Should the checkpoint object use only a single
@@ -37,6 +610,28 @@ class DumbCheckpoint(object):
          :data:`~.FILE_CREATE`, or :data:`~.FILE_UPDATE`)
     :arg comm: (optional) communicator the writes should be collective
          over.
+    :arg asynchronous: (optional) write data on a background thread?
+         :meth:`store` then copies the function data into a staging
+         buffer and returns a :class:`CheckpointHandle`, while
+         computation continues.  Operations reading the file, and
+         :meth:`close`, wait for pending writes.  Needs MPI
+         initialised with ``MPI_THREAD_MULTIPLE``, otherwise data is
+         written synchronously.
+    :arg max_staging_bytes: (optional) bound on the size of the staged
+         data of pending asynchronous writes (per process), storing
+         more blocks until earlier writes have finished.  Defaults to
+         no bound.
+    :arg staging_dir: (optional) directory (for example node-local
+         scratch) to stage the data of asynchronous writes in, rather
+         than memory.
+    :arg incremental: (optional) only store functions whose values
+         changed since they were last stored?  Storing an unchanged
+         function again (for example at a later timestep, or in a
+         file opened with :meth:`new_file`) then links to the stored
+         copy, with an HDF5 soft link (or an external link to an
+         earlier file).  Links are followed transparently when
+         loading.  Changes are detected by hashing the function data
+         on every store.
 
     This object can be used in a context manager (in which case it
     closes the file when the scope is exited).
@@ -51,9 +646,13 @@ class DumbCheckpoint(object):
 
     """
     def __init__(self, basename, single_file=True,
-                 mode=FILE_UPDATE, comm=None):
+                 mode=FILE_UPDATE, comm=None, asynchronous=False,
+                 max_staging_bytes=None, staging_dir=None, incremental=False):
         self.comm = dup_comm(comm or COMM_WORLD)
         self.mode = mode
+        self._copies = _StoredCopies(self.comm) if incremental else None
+        self._writer = _make_writer(asynchronous and mode != FILE_READ,
+                                    max_staging_bytes, staging_dir)
 
         self._single = single_file
         self._made_file = False
@@ -61,6 +660,8 @@ class DumbCheckpoint(object):
         self._time = None
         self._tidx = -1
         self._fidx = 0
+        self._layouts = {}
+        self._timestep_cache = None
         self.new_file()
 
     def set_timestep(self, t, idx=None):
@@ -78,12 +679,54 @@ class DumbCheckpoint(object):
         self._time = t
         if self.mode == FILE_READ:
             return
-        indices = self.read_attribute("/", "stored_time_indices", [])
-        new_indices = np.concatenate((indices, [self._tidx]))
-        self.write_attribute("/", "stored_time_indices", new_indices)
-        steps = self.read_attribute("/", "stored_time_steps", [])
-        new_steps = np.concatenate((steps, [self._time]))
-        self.write_attribute("/", "stored_time_steps", new_steps)
+        idx, t = self._tidx, self._time
+        steps, indices = self._get_timestep_cache()
+        steps.append(t)
+        indices.append(idx)
+        n = len(steps)
+        if self._timestep_datasets:
+            def write():
+                # Append in place
+                for name, value in [("stored_time_steps", t), ("stored_time_indices", idx)]:
+                    dset = self.h5file[name]
+                    dset.resize((n, ))
+                    if self.comm.rank == 0:
+                        dset[n - 1] = value
+        else:
+            # Move the time index into extendible datasets (including
+            # any entries from an older file storing it in attributes).
+            self._timestep_datasets = True
+            values = [("stored_time_steps", np.array(steps, dtype=float)),
+                      ("stored_time_indices", np.array(indices, dtype=IntType))]
+
+            def write():
+                for name, array in values:
+                    if name in self.h5file.attrs:
+                        del self.h5file.attrs[name]
+                    dset = self.h5file.create_dataset(name, shape=(n, ), maxshape=(None, ),
+                                                      chunks=(_TIMESTEP_CHUNK_SIZE, ),
+                                                      dtype=array.dtype)
+                    if self.comm.rank == 0:
+                        dset[:] = array
+        self._run(write)
+
+    def _get_timestep_cache(self):
+        """The cached time steps and indices of the current file.
+
+        :returns: A tuple of lists ``(steps, indices)``."""
+        if self._timestep_cache is None:
+            self.flush()
+            h5file = self.h5file
+            self._timestep_datasets = "stored_time_steps" in h5file
+            if self._timestep_datasets:
+                steps = h5file["stored_time_steps"][:]
+                indices = h5file["stored_time_indices"][:]
+            else:
+                # Older files store them in attributes.
+                steps = self._read_attribute("/", "stored_time_steps", [])
+                indices = self._read_attribute("/", "stored_time_indices", [])
+            self._timestep_cache = (list(steps), [int(i) for i in indices])
+        return self._timestep_cache
 
     def get_timesteps(self):
         """Return all the time steps (and time indices) in the current
@@ -92,9 +735,8 @@ class DumbCheckpoint(object):
         This is useful when reloading from a checkpoint file that
         contains multiple timesteps and one wishes to determine the
         final available timestep in the file."""
-        indices = self.read_attribute("/", "stored_time_indices", [])
-        steps = self.read_attribute("/", "stored_time_steps", [])
-        return steps, indices
+        steps, indices = self._get_timestep_cache()
+        return np.array(steps, dtype=float), np.array(indices, dtype=IntType)
 
     def new_file(self, name=None):
         """Open a new on-disk file for writing checkpoint data.
@@ -120,6 +762,7 @@ class DumbCheckpoint(object):
         not provided).
         """
         self.close()
+        self._timestep_cache = None
         if name is None:
             if self._single:
                 if self._made_file:
@@ -139,14 +782,15 @@ class DumbCheckpoint(object):
         mode = self.mode
         if mode == FILE_UPDATE and not exists:
             mode = FILE_CREATE
+        self._filename = name
         self._vwr = PETSc.ViewerHDF5().create(name, mode=mode,
                                               comm=self.comm)
         if self.mode == FILE_READ:
-            nprocs = self.read_attribute("/", "nprocs")
-            if nprocs != self.comm.size:
-                raise ValueError("Process mismatch: written on %d, have %d" %
-                                 (nprocs, self.comm.size))
+            # Data written on a different number of processes is
+            # redistributed on load.
+            self._nprocs = self.read_attribute("/", "nprocs")
         else:
+            self._nprocs = self.comm.size
             self.write_attribute("/", "nprocs", self.comm.size)
 
     @property
@@ -165,8 +809,28 @@ class DumbCheckpoint(object):
         self._h5file = h5i.get_h5py_file(self.vwr)
         return self._h5file
 
+    def _run(self, write, staged=()):
+        """Run a write, on the writer thread if writing
+        asynchronously.
+
+        :arg write: Callable doing the write.
+        :arg staged: The staging buffers used by the write.
+        :returns: A :class:`CheckpointHandle`."""
+        # Open the file here, not on the writer thread.
+        self.h5file
+        if self._writer is None:
+            write()
+            return CheckpointHandle(done=True)
+        return self._writer.submit(write, staged)
+
+    def flush(self):
+        """Wait for any pending asynchronous writes to finish."""
+        if getattr(self, "_writer", None) is not None:
+            self._writer.flush()
+
     def close(self):
         """Close the checkpoint file (flushing any pending writes)"""
+        self.flush()
         if hasattr(self, "_vwr"):
             self._vwr.destroy()
             del self._vwr
@@ -188,7 +852,7 @@ class DumbCheckpoint(object):
         specified group."""
         if self._time is not None:
             self.h5file.require_group(group)
-            self.write_attribute(group, "timestep", self._time)
+            self._write_attribute(group, "timestep", self._time)
 
     def store(self, function, name=None):
         """Store a function in the checkpoint file.
@@ -196,6 +860,8 @@ class DumbCheckpoint(object):
         :arg function: The function to store.
         :arg name: an (optional) name to store the function under.  If
              not provided, uses ``function.name()``.
+        :returns: A :class:`CheckpointHandle` on the write (which
+             has already finished, unless writing asynchronously).
 
         This function is timestep-aware and stores to the appropriate
         place if :meth:`set_timestep` has been called.
@@ -206,14 +872,66 @@ class DumbCheckpoint(object):
             raise ValueError("Can only store functions")
         name = name or function.name()
         group = self._get_data_group()
-        self._write_timestep_attr(group)
-        with function.dat.vec_ro as v:
-            self.vwr.pushGroup(group)
-            oname = v.getName()
-            v.setName(name)
-            v.view(self.vwr)
-            v.setName(oname)
-            self.vwr.popGroup()
+        path = "%s/%s" % (group, name)
+        layout = _get_layout(self._layouts, function.function_space())
+        if layout.writable(self.comm):
+            # Collective over the mesh, so not on the writer thread.
+            layout.point_offsets
+        if self._copies is not None:
+            digest, copy = self._copies.find(name, function.dat)
+            if copy is not None:
+                time = self._time
+
+                def write():
+                    if time is not None:
+                        self.h5file.require_group(group)
+                        self._write_attribute(group, "timestep", time)
+                    _link(self.h5file, path, copy)
+                    # The layout attribute of the copy is read
+                    # relative to this file.
+                    layout.write(self.h5file, self.comm)
+                return self._run(write)
+            self._copies.add(name, function.dat, digest, (self._filename, path))
+        if self._writer is None:
+            self._write_timestep_attr(group)
+            _unlink(self.h5file, path)
+            with function.dat.vec_ro as v:
+                self.vwr.pushGroup(group)
+                oname = v.getName()
+                v.setName(name)
+                v.view(self.vwr)
+                v.setName(oname)
+                self.vwr.popGroup()
+            staged = ()
+            write_data = None
+        else:
+            # Write the same dataset as the PETSc Viewer, from a
+            # staged copy of the data.
+            with function.dat.vec_ro as v:
+                bs = v.getBlockSize()
+                start, stop = (i // bs for i in v.getOwnershipRange())
+                shape = (v.getSize() // bs, bs) if bs > 1 else (v.getSize(), )
+                data = self._writer.stage(v.array_r.reshape((stop - start, ) + shape[1:]))
+            staged = (data, )
+            time = self._time
+
+            def write_data():
+                if time is not None:
+                    self.h5file.require_group(group)
+                    self._write_attribute(group, "timestep", time)
+                if path in self.h5file:
+                    del self.h5file[path]
+                dset = self.h5file.create_dataset(path, shape=shape, dtype=data.dtype)
+                with _collective(dset):
+                    dset[start:stop] = data
+
+        def write():
+            if write_data is not None:
+                write_data()
+            layout_path = layout.write(self.h5file, self.comm)
+            if layout_path is not None:
+                self._write_attribute(path, "layout", layout_path)
+        return self._run(write, staged)
 
     def load(self, function, name=None):
         """Store a function from the checkpoint file.
@@ -227,8 +945,21 @@ class DumbCheckpoint(object):
         """
         if not isinstance(function, firedrake.Function):
             raise ValueError("Can only load functions")
+        self.flush()
         name = name or function.name()
         group = self._get_data_group()
+        if self._nprocs != self.comm.size:
+            path = "%s/%s" % (group, name)
+            if not self.has_attribute(path, "layout"):
+                raise ValueError("Process mismatch: written on %d, have %d" %
+                                 (self._nprocs, self.comm.size))
+            dset = self.h5file[path]
+            cdim = function.dat.cdim
+            _get_layout(self._layouts, function.function_space()).read(
+                self.h5file, self.read_attribute(path, "layout"),
+                lambda start, stop: dset[start:stop].reshape(stop - start, cdim),
+                function.dat)
+            return
         with function.dat.vec_wo as v:
             self.vwr.pushGroup(group)
             oname = v.getName()
@@ -237,6 +968,33 @@ class DumbCheckpoint(object):
             v.setName(oname)
             self.vwr.popGroup()
 
+    def store_mesh(self, mesh, name="mesh"):
+        """Store a distributed mesh in the checkpoint file.
+
+        :arg mesh: The mesh to store.
+        :arg name: an (optional) name to store the mesh under.
+
+        The mesh can be reloaded with :meth:`load_mesh` on the same
+        number of processes, without partitioning and renumbering it
+        again.
+        """
+        if self.mode is FILE_READ:
+            raise IOError("Cannot store to checkpoint opened with mode 'FILE_READ'")
+        self.flush()
+        _store_mesh(self.h5file, self.comm, mesh, "/meshes/%s" % name)
+
+    def load_mesh(self, name="mesh"):
+        """Load a mesh stored with :meth:`store_mesh`.
+
+        :arg name: an (optional) name the mesh was stored under.
+        :returns: The mesh, distributed exactly as when stored.
+
+        Must be called on the same number of processes the mesh was
+        stored from.
+        """
+        self.flush()
+        return _load_mesh(self.h5file, self.comm, "/meshes/%s" % name)
+
     def write_attribute(self, obj, name, val):
         """Set an HDF5 attribute on a specified data object.
 
@@ -246,6 +1004,10 @@ class DumbCheckpoint(object):
 
         Raises :exc:`~.exceptions.AttributeError` if writing the attribute fails.
         """
+        self.flush()
+        self._write_attribute(obj, name, val)
+
+    def _write_attribute(self, obj, name, val):
         try:
             self.h5file[obj].attrs[name] = val
         except KeyError:
@@ -260,6 +1022,10 @@ class DumbCheckpoint(object):
              provided an :exc:`~.exceptions.AttributeError` is raised if the
              attribute does not exist.
         """
+        self.flush()
+        return self._read_attribute(obj, name, default)
+
+    def _read_attribute(self, obj, name, default=None):
         try:
             return self.h5file[obj].attrs[name]
         except KeyError:
@@ -273,6 +1039,7 @@ class DumbCheckpoint(object):
         :arg obj: The path to the data object.
         :arg name: The name of the attribute.
         """
+        self.flush()
         try:
             return (name in self.h5file[obj].attrs)
         except KeyError:
@@ -286,6 +1053,9 @@ class DumbCheckpoint(object):
 
     def __del__(self):
         self.close()
+        if getattr(self, "_writer", None) is not None:
+            self._writer.close()
+            self._writer = None
         if hasattr(self, "comm"):
             free_comm(self.comm)
             del self.comm
@@ -296,24 +1066,57 @@ class HDF5File(object):
     """An object to facilitate checkpointing.
 
     This checkpoint object is capable of writing :class:`~.Function`\s
-    to disk in parallel (using HDF5) and reloading them on the same
-    number of processes and a :func:`~.Mesh` constructed identically.
+    to disk in parallel (using HDF5) and reloading them on a
+    :func:`~.Mesh` constructed identically, on any number of
+    processes (see :class:`DumbCheckpoint`).
 
     :arg filename: filename (including suffix .h5) of checkpoint file.
     :arg file_mode: the access mode, passed directly to h5py, see
         :class:`h5py:File` for details on the meaning.
     :arg comm: communicator the writes should be collective
          over.
+    :arg asynchronous: (optional) write data on a background thread,
+         see :class:`DumbCheckpoint`.
+    :arg max_staging_bytes: (optional) bound on the size of the staged
+         data of pending asynchronous writes.
+    :arg staging_dir: (optional) directory to stage the data of
+         asynchronous writes in, rather than memory.
+    :arg compression: (optional) compression filter for the stored
+         function data, one of ``"gzip"``, ``"szip"`` or ``"lzf"``.
+         Compressed data is written with collective filtered writes,
+         which in parallel need HDF5 1.10.2 or newer.
+    :arg compression_opts: (optional) options for the compression
+         filter, passed to :meth:`h5py:Group.create_dataset`.
+    :arg chunk_size: (optional) number of entries in each chunk of
+         the stored function data.  If provided (or when compressing)
+         data is stored chunked, rather than contiguously.  Defaults
+         to 65536 when compressing.
+    :arg incremental: (optional) only store functions whose values
+         changed since they were last stored, linking to the stored
+         copy otherwise (see :class:`DumbCheckpoint`).
 
     This object can be used in a context manager (in which case it
     closes the file when the scope is exited).
 
     """
-    def __init__(self, filename, file_mode, comm=None):
+    def __init__(self, filename, file_mode, comm=None, asynchronous=False,
+                 max_staging_bytes=None, staging_dir=None, compression=None,
+                 compression_opts=None, chunk_size=None, incremental=False):
+        if compression not in {None, "gzip", "szip", "lzf"}:
+            raise ValueError("Unknown compression filter '%s'" % compression)
+        if compression is not None and chunk_size is None:
+            chunk_size = 2**16
+        self._compression = compression
+        self._compression_opts = compression_opts
+        self._chunk_size = chunk_size
         self.comm = dup_comm(comm or COMM_WORLD)
+        self._copies = _StoredCopies(self.comm) if incremental else None
+        self._writer = _make_writer(asynchronous and file_mode != 'r',
+                                    max_staging_bytes, staging_dir)
 
         self._filename = filename
         self._mode = file_mode
+        self._layouts = {}
 
         exists = os.path.exists(filename)
         if file_mode == 'r' and not exists:
@@ -333,11 +1136,11 @@ class HDF5File(object):
             raise RuntimeError("h5py *must* be installed with MPI support")
 
         if file_mode == 'r':
-            nprocs = self.attributes('/')['nprocs']
-            if nprocs != self.comm.size:
-                raise ValueError("Process mismatch: written on %d, have %d" %
-                                 (nprocs, self.comm.size))
+            # Data written on a different number of processes is
+            # redistributed on read.
+            self._nprocs = self.attributes('/')['nprocs']
         else:
+            self._nprocs = self.comm.size
             self.attributes('/')['nprocs'] = self.comm.size
 
     def _set_timestamp(self, t):
@@ -347,7 +1150,7 @@ class HDF5File(object):
         """
         if self._mode == 'r':
             return
-        attrs = self.attributes("/")
+        attrs = self._h5file["/"].attrs
         timestamps = attrs.get("stored_timestamps", [])
         attrs["stored_timestamps"] = np.concatenate((timestamps, [t]))
 
@@ -360,6 +1163,9 @@ class HDF5File(object):
 
     def close(self):
         """Close the checkpoint file (flushing any pending writes)"""
+        if getattr(self, "_writer", None) is not None:
+            writer, self._writer = self._writer, None
+            writer.close()
         if hasattr(self, '_h5file'):
             self._h5file.flush()
             # Need to explicitly close the h5py File so that all
@@ -369,10 +1175,31 @@ class HDF5File(object):
             self._h5file.close()
             del self._h5file
 
+    def _wait(self):
+        """Wait for any pending asynchronous writes to finish."""
+        if self._writer is not None:
+            self._writer.flush()
+
     def flush(self):
         """Flush any pending writes."""
+        self._wait()
         self._h5file.flush()
 
+    def _create_dataset(self, path, size, dtype):
+        """Create a dataset for function data, chunked and compressed
+        as requested.
+
+        :arg path: The path of the dataset.
+        :arg size: The global size of the data.
+        :arg dtype: The type of the data."""
+        kwargs = {}
+        if self._chunk_size is not None and size > 0:
+            kwargs["chunks"] = (min(self._chunk_size, size), )
+            if self._compression is not None:
+                kwargs["compression"] = self._compression
+                kwargs["compression_opts"] = self._compression_opts
+        return self._h5file.create_dataset(path, shape=(size, ), dtype=dtype, **kwargs)
+
     def write(self, function, path, timestamp=None):
         """Store a function in the checkpoint file.
 
@@ -380,30 +1207,88 @@ class HDF5File(object):
         :arg path: the path to store the function under.
         :arg timestamp: timestamp associated with function, or None for
                         stationary data
+        :returns: A :class:`CheckpointHandle` on the write (which
+                  has already finished, unless writing asynchronously).
         """
-        if self._mode == 'r':
-            raise IOError("Cannot store to checkpoint opened with mode 'FILE_READ'")
-        if not isinstance(function, firedrake.Function):
-            raise ValueError("Can only store functions")
-
-        if timestamp is not None:
-            suffix = "/%.15e" % timestamp
-            path = path + suffix
+        return self.write_many({path: function}, timestamp=timestamp)
 
-        with function.dat.vec_ro as v:
-            dset = self._h5file.create_dataset(path, shape=(v.getSize(),), dtype=function.dat.dtype)
+    def write_many(self, functions, timestamp=None):
+        """Store several functions in the checkpoint file.
 
-            # Another MPI/non-MPI difference
-            try:
-                with dset.collective:
-                    dset[slice(*v.getOwnershipRange())] = v.array_r
-            except AttributeError:
-                dset[slice(*v.getOwnershipRange())] = v.array_r
+        :arg functions: A dict mapping the paths to store functions
+                        under to the functions.
+        :arg timestamp: timestamp associated with the functions, or
+                        None for stationary data
+        :returns: A :class:`CheckpointHandle` on the write (which
+                  has already finished, unless writing asynchronously).
 
-        if timestamp is not None:
-            attr = self.attributes(path)
-            attr["timestamp"] = timestamp
-            self._set_timestamp(timestamp)
+        All datasets are created before any data is written, and the
+        timestamp is recorded once, which is much cheaper than
+        separate :meth:`write` calls for many small functions.
+        """
+        if self._mode == 'r':
+            raise IOError("Cannot store to checkpoint opened with mode 'FILE_READ'")
+        entries = []
+        links = []
+        for key, function in functions.items():
+            if not isinstance(function, firedrake.Function):
+                raise ValueError("Can only store functions")
+            path = key
+            if timestamp is not None:
+                suffix = "/%.15e" % timestamp
+                path = path + suffix
+
+            layout = _get_layout(self._layouts, function.function_space())
+            if layout.writable(self.comm):
+                # Collective over the mesh, so not on the writer thread.
+                layout.point_offsets
+
+            if self._copies is not None:
+                digest, copy = self._copies.find(key, function.dat)
+                if copy is not None:
+                    links.append((path, layout, copy))
+                    continue
+                self._copies.add(key, function.dat, digest, (self._filename, path))
+
+            entries.append((path, function, layout))
+
+        with contextlib.ExitStack() as stack:
+            vecs = [stack.enter_context(function.dat.vec_ro) for _, function, _ in entries]
+            if self._writer is None:
+                staged = [None]*len(vecs)
+            else:
+                # Reserve the staging space for the whole batch at once.
+                staged = self._writer.stage_many([v.array_r for v in vecs])
+            entries = [entry + (v.getSize(), v.getOwnershipRange(), data)
+                       for entry, v, data in zip(entries, vecs, staged)]
+
+        def write():
+            dsets = [self._create_dataset(path, size, function.dat.dtype)
+                     for path, function, _, size, _, _ in entries]
+            for dset, (_, function, _, _, (start, stop), data) in zip(dsets, entries):
+                with _collective(dset):
+                    if data is None:
+                        with function.dat.vec_ro as v:
+                            dset[start:stop] = v.array_r
+                    else:
+                        dset[start:stop] = data
+
+            for dset, (_, _, layout, _, _, _) in zip(dsets, entries):
+                layout_path = layout.write(self._h5file, self.comm)
+                if layout_path is not None:
+                    dset.attrs["layout"] = layout_path
+                if timestamp is not None:
+                    dset.attrs["timestamp"] = timestamp
+            for path, layout, copy in links:
+                _link(self._h5file, path, copy)
+                layout.write(self._h5file, self.comm)
+            if timestamp is not None:
+                self._set_timestamp(timestamp)
+
+        if self._writer is None:
+            write()
+            return CheckpointHandle(done=True)
+        return self._writer.submit(write, [entry[-1] for entry in entries])
 
     def read(self, function, path, timestamp=None):
         """Store a function from the checkpoint file.
@@ -413,16 +1298,52 @@ class HDF5File(object):
         """
         if not isinstance(function, firedrake.Function):
             raise ValueError("Can only load functions")
+        self._wait()
         if timestamp is not None:
             suffix = "/%.15e" % timestamp
             path = path + suffix
 
+        dset = self._h5file[path]
+        if self._nprocs != self.comm.size:
+            if "layout" not in dset.attrs:
+                raise ValueError("Process mismatch: written on %d, have %d" %
+                                 (self._nprocs, self.comm.size))
+            cdim = function.dat.cdim
+            _get_layout(self._layouts, function.function_space()).read(
+                self._h5file, dset.attrs["layout"],
+                lambda start, stop: dset[start*cdim:stop*cdim].reshape(stop - start, cdim),
+                function.dat)
+            return
         with function.dat.vec_wo as v:
-            dset = self._h5file[path]
             v.array[:] = dset[slice(*v.getOwnershipRange())]
 
+    def write_mesh(self, mesh, path="/mesh"):
+        """Store a distributed mesh in the checkpoint file.
+
+        :arg mesh: The mesh to store.
+        :arg path: the path to store the mesh under.
+
+        See :meth:`DumbCheckpoint.store_mesh`.
+        """
+        if self._mode == 'r':
+            raise IOError("Cannot store to checkpoint opened with mode 'FILE_READ'")
+        self._wait()
+        _store_mesh(self._h5file, self.comm, mesh, path)
+
+    def read_mesh(self, path="/mesh"):
+        """Load a mesh stored with :meth:`write_mesh`.
+
+        :arg path: the path the mesh was stored under.
+        :returns: The mesh, distributed exactly as when stored.
+
+        See :meth:`DumbCheckpoint.load_mesh`.
+        """
+        self._wait()
+        return _load_mesh(self._h5file, self.comm, path)
+
     def attributes(self, obj):
         """:arg obj: The path to the group."""
+        self._wait()
         return self._h5file[obj].attrs
 
     def __enter__(self):
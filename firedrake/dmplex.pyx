@@ -2133,6 +2133,176 @@ def make_global_numbering(PETSc.Section lsec, PETSc.Section gsec):
     return val
 
 
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def get_cones(PETSc.DM plex):
+    """Get the cones of all points of a plex.
+
+    :arg plex: The DMPlex.
+    :returns: A tuple of arrays ``(sizes, cones, orientations)``, the
+        cone size of every point, and the concatenated cones and cone
+        orientations.
+    """
+    cdef:
+        PetscInt p, pStart, pEnd, i, size, offset
+        PetscInt *cone = NULL
+        PetscInt *orientation = NULL
+        np.ndarray[PetscInt, ndim=1, mode="c"] sizes
+        np.ndarray[PetscInt, ndim=1, mode="c"] cones
+        np.ndarray[PetscInt, ndim=1, mode="c"] orientations
+
+    pStart, pEnd = plex.getChart()
+    sizes = np.empty(pEnd - pStart, dtype=IntType)
+    for p in range(pStart, pEnd):
+        CHKERR(DMPlexGetConeSize(plex.dm, p, &sizes[p - pStart]))
+    cones = np.empty(sizes.sum(), dtype=IntType)
+    orientations = np.empty(sizes.sum(), dtype=IntType)
+    offset = 0
+    for p in range(pStart, pEnd):
+        CHKERR(DMPlexGetCone(plex.dm, p, &cone))
+        CHKERR(DMPlexGetConeOrientation(plex.dm, p, &orientation))
+        size = sizes[p - pStart]
+        for i in range(size):
+            cones[offset + i] = cone[i]
+            orientations[offset + i] = orientation[i]
+        offset += size
+    return sizes, cones, orientations
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def set_cones(PETSc.DM plex,
+              np.ndarray[PetscInt, ndim=1, mode="c"] sizes,
+              np.ndarray[PetscInt, ndim=1, mode="c"] cones,
+              np.ndarray[PetscInt, ndim=1, mode="c"] orientations):
+    """Set the cones of all points of a plex (see :func:`get_cones`).
+
+    :arg plex: The DMPlex, with its chart set.
+    :arg sizes: The cone size of every point.
+    :arg cones: The concatenated cones.
+    :arg orientations: The concatenated cone orientations.
+
+    The plex must still be symmetrized and stratified.
+    """
+    cdef:
+        PetscInt p, pStart, pEnd, offset
+
+    pStart, pEnd = plex.getChart()
+    for p in range(pStart, pEnd):
+        CHKERR(DMPlexSetConeSize(plex.dm, p, sizes[p - pStart]))
+    plex.setUp()
+    offset = 0
+    for p in range(pStart, pEnd):
+        CHKERR(DMPlexSetCone(plex.dm, p, <PetscInt *>cones.data + offset))
+        CHKERR(DMPlexSetConeOrientation(plex.dm, p, <PetscInt *>orientations.data + offset))
+        offset += sizes[p - pStart]
+
+
+def get_label_values(PETSc.DM plex, name):
+    """Get the points in a label and their values.
+
+    :arg plex: The DMPlex.
+    :arg name: The name of the label.
+    :returns: A tuple of arrays ``(points, values)``.
+    """
+    points = []
+    values = []
+    for value in plex.getLabelIdIS(name).indices:
+        stratum = plex.getStratumIS(name, value).indices
+        points.append(stratum)
+        values.append(np.full(len(stratum), value, dtype=IntType))
+    if not points:
+        return np.empty(0, dtype=IntType), np.empty(0, dtype=IntType)
+    return (np.concatenate(points).astype(IntType),
+            np.concatenate(values))
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def set_label_values(PETSc.DM plex, name,
+                     np.ndarray[PetscInt, ndim=1, mode="c"] points,
+                     np.ndarray[PetscInt, ndim=1, mode="c"] values):
+    """Create a label and set the values of points in it (see
+    :func:`get_label_values`).
+
+    :arg plex: The DMPlex.
+    :arg name: The name of the label.
+    :arg points: The points in the label.
+    :arg values: Their values.
+    """
+    cdef:
+        PetscInt i
+        DMLabel label
+        bytes bname = name.encode()
+
+    plex.createLabel(name)
+    CHKERR(DMGetLabel(plex.dm, bname, &label))
+    for i in range(points.shape[0]):
+        CHKERR(DMLabelSetValue(label, points[i], values[i]))
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def section_offsets(PETSc.Section section):
+    """Get the number of dofs and offset of every point in a section.
+
+    :arg section: The PETSc Section.
+    :returns: A tuple of arrays ``(dofs, offsets)``, indexed by
+        point (relative to the start of the chart).
+    """
+    cdef:
+        PetscInt p, pStart, pEnd
+        np.ndarray[PetscInt, ndim=1, mode="c"] dofs
+        np.ndarray[PetscInt, ndim=1, mode="c"] offsets
+
+    pStart, pEnd = section.getChart()
+    dofs = np.empty(pEnd - pStart, dtype=IntType)
+    offsets = np.empty(pEnd - pStart, dtype=IntType)
+    for p in range(pStart, pEnd):
+        CHKERR(PetscSectionGetDof(section.sec, p, &dofs[p - pStart]))
+        CHKERR(PetscSectionGetOffset(section.sec, p, &offsets[p - pStart]))
+    return dofs, offsets
+
+
+def sf_bcast(PETSc.SF sf, MPI.Datatype dtype,
+             np.ndarray rootdata, np.ndarray leafdata):
+    """Broadcast data from the roots to the leaves of an SF.
+
+    :arg sf: The PETSc SF.
+    :arg dtype: an MPI datatype describing the unit of data.
+    :arg rootdata: contiguous array of data on the roots.
+    :arg leafdata: contiguous array to receive the data on the leaves.
+    """
+    assert rootdata.flags.c_contiguous and leafdata.flags.c_contiguous
+    CHKERR(PetscSFBcastBegin(sf.sf, dtype.ob_mpi,
+                             <const void *>rootdata.data,
+                             <void *>leafdata.data))
+    CHKERR(PetscSFBcastEnd(sf.sf, dtype.ob_mpi,
+                           <const void *>rootdata.data,
+                           <void *>leafdata.data))
+
+
+def sf_reduce(PETSc.SF sf, MPI.Datatype dtype,
+              np.ndarray leafdata, np.ndarray rootdata, MPI.Op op=MPI.REPLACE):
+    """Reduce data from the leaves to the roots of an SF.
+
+    :arg sf: The PETSc SF.
+    :arg dtype: an MPI datatype describing the unit of data.
+    :arg leafdata: contiguous array of data on the leaves.
+    :arg rootdata: contiguous array to reduce the data into.
+    :arg op: The MPI reduction operation.
+    """
+    assert rootdata.flags.c_contiguous and leafdata.flags.c_contiguous
+    CHKERR(PetscSFReduceBegin(sf.sf, dtype.ob_mpi,
+                              <const void *>leafdata.data,
+                              <void *>rootdata.data,
+                              op.ob_mpi))
+    CHKERR(PetscSFReduceEnd(sf.sf, dtype.ob_mpi,
+                            <const void *>leafdata.data,
+                            <void *>rootdata.data,
+                            op.ob_mpi))
+
+
 def prune_sf(PETSc.SF sf):
     """Prune an SF of roots referencing the local rank
 
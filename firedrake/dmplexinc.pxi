@@ -25,6 +25,9 @@ cdef extern from "petscdmplex.h" nogil:
     int DMPlexGetConeOrientation(PETSc.PetscDM,PetscInt,PetscInt*[])
     int DMPlexGetSupportSize(PETSc.PetscDM,PetscInt,PetscInt*)
     int DMPlexGetSupport(PETSc.PetscDM,PetscInt,PetscInt*[])
+    int DMPlexSetConeSize(PETSc.PetscDM,PetscInt,PetscInt)
+    int DMPlexSetCone(PETSc.PetscDM,PetscInt,const PetscInt[])
+    int DMPlexSetConeOrientation(PETSc.PetscDM,PetscInt,const PetscInt[])
 
     int DMPlexGetTransitiveClosure(PETSc.PetscDM,PetscInt,PetscBool,PetscInt *,PetscInt *[])
     int DMPlexRestoreTransitiveClosure(PETSc.PetscDM,PetscInt,PetscBool,PetscInt *,PetscInt *[])
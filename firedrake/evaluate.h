@@ -47,6 +47,18 @@ extern int evaluate(struct Function *f,
 		    double *x,
 		    double *result);
 
+extern PetscInt evaluate_points(struct Function *f,
+				double *x,
+				PetscInt npoints,
+				double *result,
+				PetscInt *found);
+
+extern void evaluate_located(struct Function *f,
+			     PetscInt npoints,
+			     PetscInt *cells,
+			     double *X,
+			     double *result);
+
 #ifdef __cplusplus
 }
 #endif
@@ -1,3 +1,6 @@
+import functools
+import hashlib
+import itertools
 import numpy as np
 import sys
 import ufl
@@ -19,7 +22,7 @@ except ImportError:
     cachetools = None
 
 
-__all__ = ['Function', 'PointNotInDomainError']
+__all__ = ['Function', 'PointNotInDomainError', 'PointEvaluator']
 
 
 class _CFunction(ctypes.Structure):
@@ -468,11 +471,38 @@ class Function(ufl.Coefficient):
         try:
             return cache[tolerance]
         except KeyError:
-            result = make_c_evaluate(self, tolerance=tolerance)
-            result.argtypes = [POINTER(_CFunction), POINTER(c_double), POINTER(c_double)]
-            result.restype = c_int
+            result = make_c_evaluate(self, c_name="evaluate_points", tolerance=tolerance)
+            result.argtypes = [POINTER(_CFunction), POINTER(c_double), as_ctypes(IntType),
+                               POINTER(c_double), POINTER(as_ctypes(IntType))]
+            result.restype = as_ctypes(IntType)
             return cache.setdefault(tolerance, result)
 
+    @utils.cached_property
+    def _c_evaluate_located(self):
+        result = make_c_evaluate(self, c_name="evaluate_located")
+        result.argtypes = [POINTER(_CFunction), as_ctypes(IntType), POINTER(as_ctypes(IntType)),
+                           POINTER(c_double), POINTER(c_double)]
+        result.restype = None
+        return result
+
+    def _evaluate_points(self, points, tolerance=None):
+        """Evaluate the function at the points in the local part of
+        the mesh.
+
+        :arg points: The points, an array of shape ``(npoints, gdim)``.
+        :arg tolerance: Tolerance to use when checking for points in cell.
+        :returns: A tuple ``(values, found)`` of the values, with shape
+            ``(npoints, value_size)`` (zero where not found), and a
+            mask of the points found."""
+        values = np.zeros((len(points), int(np.prod(self.ufl_shape, dtype=int))), dtype=float)
+        found = np.zeros(len(points), dtype=IntType)
+        self._c_evaluate(tolerance=tolerance)(self._ctypes,
+                                              points.ctypes.data_as(POINTER(c_double)),
+                                              len(points),
+                                              values.ctypes.data_as(POINTER(c_double)),
+                                              found.ctypes.data_as(POINTER(as_ctypes(IntType))))
+        return values, found.astype(bool)
+
     def evaluate(self, coord, mapping, component, index_values):
         # Called by UFL when evaluating expressions at coordinates
         if component or index_values:
@@ -486,6 +516,13 @@ class Function(ufl.Coefficient):
         :arg args: Additional points.
         :kwarg dont_raise: Do not raise an error if a point is not found.
         :kwarg tolerance: Tolerance to use when checking for points in cell.
+
+        All points are evaluated with a single call to compiled code,
+        and the results combined with a single reduction.  For several
+        points, returns an array of shape ``(npoints, ) + value_shape``
+        if all were found, otherwise a list of the values, with
+        ``None`` for points not found.  For mixed functions, each
+        value is a tuple of the values of the components.
         """
         # Need to ensure data is up-to-date for reading
         self.dat._force_evaluation(read=True, write=False)
@@ -521,74 +558,228 @@ class Function(ufl.Coefficient):
         else:
             raise ValueError("Point dimension (%d) does not match geometric dimension (%d)." % (arg.shape[-1], gdim))
 
-        # Check if we have got the same points on each process
-        root_arg = self.comm.bcast(arg, root=0)
-        same_arg = arg.shape == root_arg.shape and np.allclose(arg, root_arg)
-        diff_arg = self.comm.allreduce(int(not same_arg), op=MPI.SUM)
-        if diff_arg:
-            raise ValueError("Points to evaluate are inconsistent among processes.")
-
-        def single_eval(x, buf):
-            """Helper function to evaluate at a single point."""
-            err = self._c_evaluate(tolerance=tolerance)(self._ctypes,
-                                                        x.ctypes.data_as(POINTER(c_double)),
-                                                        buf.ctypes.data_as(POINTER(c_double)))
-            if err == -1:
-                raise PointNotInDomainError(self.function_space().mesh(), x.reshape(-1))
-
         if not len(arg.shape) <= 2:
             raise ValueError("Function.at expects point or array of points.")
-        points = arg.reshape(-1, arg.shape[-1])
-        value_shape = self.ufl_shape
+        points = np.ascontiguousarray(arg.reshape(-1, arg.shape[-1]))
+
+        # Check if we have got the same points on each process, by
+        # comparing the maximum and minimum of a fingerprint of them
+        # (in chunks of 48 bits, which are exact as floats).
+        digest = hashlib.md5(points.tobytes()).digest()
+        check = np.array([len(points)] + [int.from_bytes(digest[i:i+6], "little")
+                                          for i in range(0, 12, 6)], dtype=float)
+        bounds = np.concatenate((check, -check))
+        self.comm.Allreduce(MPI.IN_PLACE, bounds, op=MPI.MAX)
+        if (bounds[:len(check)] != -bounds[len(check):]).any():
+            raise ValueError("Points to evaluate are inconsistent among processes.")
 
+        # Local evaluation of every component, as the columns (after
+        # a column of found flags) of one array.
         split = self.split()
-        mixed = len(split) != 1
-
-        # Local evaluation
-        l_result = []
-        for i, p in enumerate(points):
-            try:
-                if mixed:
-                    l_result.append((i, tuple(f.at(p) for f in split)))
-                else:
-                    p_result = np.zeros(value_shape, dtype=float)
-                    single_eval(points[i:i+1], p_result)
-                    l_result.append((i, p_result))
-            except PointNotInDomainError:
-                # Skip point
-                pass
-
-        # Collecting the results
-        def same_result(a, b):
-            if mixed:
-                for a_, b_ in zip(a, b):
-                    if not np.allclose(a_, b_):
-                        return False
-                return True
-            else:
-                return np.allclose(a, b)
-
-        all_results = self.comm.allgather(l_result)
-        g_result = [None] * len(points)
-        for results in all_results:
-            for i, result in results:
-                if g_result[i] is None:
-                    g_result[i] = result
-                elif same_result(result, g_result[i]):
-                    pass
-                else:
-                    raise RuntimeError("Point evaluation gave different results across processes.")
-
-        if not dont_raise:
-            for i in range(len(g_result)):
-                if g_result[i] is None:
-                    raise PointNotInDomainError(self.function_space().mesh(), points[i].reshape(-1))
+        shapes = [f.ufl_shape for f in split]
+        columns = [np.ones((len(points), 1), dtype=float)]
+        for f in split:
+            values, found = f._evaluate_points(points, tolerance=tolerance)
+            columns[0][~found] = 0
+            columns.append(values)
+        local = _reduce_first_found(self.comm, np.concatenate(columns, axis=1))
+        found = local[:, 0] > 0
+
+        if not dont_raise and not found.all():
+            i = np.argmin(found)
+            raise PointNotInDomainError(self.function_space().mesh(), points[i].reshape(-1))
+
+        offsets = np.cumsum([1] + [int(np.prod(shape, dtype=int)) for shape in shapes])
+        values = [local[:, start:stop].reshape((len(points), ) + shape)
+                  for start, stop, shape in zip(offsets, offsets[1:], shapes)]
+        if len(split) != 1:
+            g_result = [tuple(v[i] for v in values) if found[i] else None
+                        for i in range(len(points))]
+        elif found.all():
+            g_result, = values
+        else:
+            g_result = [v if f else None for v, f in zip(values[0], found)]
 
         if len(arg.shape) == 1:
             g_result = g_result[0]
         return g_result
 
 
+def _first_found(invec, inoutvec, datatype):
+    """Reduce rows of a found flag followed by values, keeping the
+    values of the first process with the flag set."""
+    width = datatype.Get_size() // np.dtype(float).itemsize
+    a = np.frombuffer(invec, dtype=float).reshape(-1, width)
+    b = np.frombuffer(inoutvec, dtype=float).reshape(-1, width)
+    mask = a[:, 0] > 0
+    b[mask] = a[mask]
+
+
+@functools.lru_cache()
+def _first_found_op():
+    """The (non-commutative) MPI reduction operation of
+    :func:`_first_found`."""
+    from mpi4py import MPI
+    return MPI.Op.Create(_first_found, commute=False)
+
+
+def _reduce_first_found(comm, local):
+    """Collect the values of points evaluated on every process.
+
+    :arg comm: The communicator.
+    :arg local: Array of a row for each point: a flag set if the
+        point was found on this process, followed by the values.
+    :returns: The rows of the first process finding each point."""
+    from mpi4py import MPI
+    local = np.ascontiguousarray(local, dtype=float)
+    rowtype = MPI.DOUBLE.Create_contiguous(local.shape[1]).Commit()
+    try:
+        comm.Allreduce(MPI.IN_PLACE, [local, len(local), rowtype],
+                       op=_first_found_op())
+    finally:
+        rowtype.Free()
+    return local
+
+
+class PointEvaluator(object):
+    """Evaluate functions at a fixed set of points.
+
+    :arg mesh: The mesh the functions are defined on.
+    :arg points: The points, an array of shape ``(npoints, gdim)``.
+    :kwarg tolerance: Tolerance to use when checking for points in cell.
+    :kwarg check_coordinates: Check whether the mesh coordinates have
+        changed on every :meth:`evaluate`, by hashing them?
+
+    The cells containing the points, and the reference coordinates of
+    the points in them, are only computed again if the coordinates of
+    the mesh have changed, so :meth:`evaluate` only tabulates the
+    functions at the points.  This is much faster than
+    :meth:`Function.at` for evaluating at the same points repeatedly
+    (for example at every timestep).
+
+    Detecting changes reads the coordinates (and needs a reduction)
+    on every evaluation.  If the mesh does not move, or you call
+    :meth:`.MeshGeometry.clear_spatial_index` (which invalidates the
+    evaluators on the mesh) or :meth:`invalidate` whenever you move
+    it, pass ``check_coordinates=False`` to skip this.
+    """
+    def __init__(self, mesh, points, tolerance=None, check_coordinates=True):
+        if mesh.variable_layers:
+            raise NotImplementedError("Point evaluation not implemented for variable layers")
+        tdim = mesh.ufl_cell().topological_dimension()
+        gdim = mesh.ufl_cell().geometric_dimension()
+        if tdim < gdim:
+            raise NotImplementedError("Point is almost certainly not on the manifold.")
+        points = np.array(points, dtype=float)
+        if points.ndim <= 1 and gdim == 1:
+            points = points.reshape(-1, 1)
+        if points.ndim != 2 or points.shape[1] != gdim:
+            raise ValueError("Points must be an array of shape (npoints, %d)" % gdim)
+        self.mesh = mesh
+        self.points = points
+        self.tolerance = tolerance
+        self.check_coordinates = check_coordinates
+        self._located = False
+        self._coordinates_digest = None
+        mesh._point_evaluators.add(self)
+
+    def invalidate(self):
+        """Locate the points again on the next evaluation (for example
+        because the mesh has moved)."""
+        self._located = False
+
+    def _locate(self):
+        """Locate the points in the local part of the mesh, unless
+        they have already been located.
+
+        :returns: A tuple ``(cells, X)`` of the cells containing the
+            points found, and the reference coordinates of those
+            points."""
+        coordinates = self.mesh.coordinates
+        if self.check_coordinates:
+            from mpi4py import MPI
+            digest = utils.dat_digest(coordinates.dat)
+            # Collective, since the spatial index is rebuilt collectively.
+            moved = self.mesh.comm.allreduce(digest != self._coordinates_digest, op=MPI.LOR)
+            if moved and self._located:
+                self.mesh.clear_spatial_index()
+            self._coordinates_digest = digest
+        if not self._located:
+            npoints, gdim = self.points.shape
+            cells = np.empty(npoints, dtype=IntType)
+            X = np.empty((npoints, gdim), dtype=float)
+            coordinates.dat._force_evaluation(read=True, write=False)
+            coordinates.dat.global_to_local_begin(op2.READ)
+            coordinates.dat.global_to_local_end(op2.READ)
+            self.mesh._c_locate_points(tolerance=self.tolerance)(
+                coordinates._ctypes,
+                self.points.ctypes.data_as(POINTER(c_double)),
+                npoints,
+                cells.ctypes.data_as(POINTER(as_ctypes(IntType))),
+                X.ctypes.data_as(POINTER(c_double)))
+            self._found = cells != -1
+            self._cells = np.ascontiguousarray(cells[self._found])
+            self._X = np.ascontiguousarray(X[self._found])
+            self._located = True
+        return self._cells, self._X
+
+    def evaluate(self, *functions, dont_raise=False):
+        """Evaluate functions at the points.
+
+        :arg functions: The :class:`Function`\s to evaluate.
+        :kwarg dont_raise: Do not raise an error if a point is not
+            found, the values there are NaN instead.
+        :returns: For each function, an array of shape ``(npoints, )
+            + value_shape`` (a tuple of those for each component, for
+            mixed functions).  A single function gives its values,
+            several functions a tuple of their values.
+        """
+        cells, X = self._locate()
+        npoints = len(self.points)
+        components = []
+        for function in functions:
+            if function.ufl_domain() is not self.mesh:
+                raise ValueError("Function is not defined on the mesh of the PointEvaluator")
+            function.dat._force_evaluation(read=True, write=False)
+            function.dat.global_to_local_begin(op2.READ)
+            function.dat.global_to_local_end(op2.READ)
+            components.append(function.split())
+
+        # Local evaluation of every component, as the columns (after
+        # a column of found flags) of one array.
+        columns = [self._found.reshape(-1, 1)]
+        for f in itertools.chain(*components):
+            values = np.zeros((len(cells), int(np.prod(f.ufl_shape, dtype=int))), dtype=float)
+            f._c_evaluate_located(f._ctypes, len(cells),
+                                  cells.ctypes.data_as(POINTER(as_ctypes(IntType))),
+                                  X.ctypes.data_as(POINTER(c_double)),
+                                  values.ctypes.data_as(POINTER(c_double)))
+            column = np.zeros((npoints, values.shape[1]), dtype=float)
+            column[self._found] = values
+            columns.append(column)
+        local = _reduce_first_found(self.mesh.comm, np.concatenate(columns, axis=1))
+        found = local[:, 0] > 0
+
+        if not found.all():
+            if not dont_raise:
+                i = np.argmin(found)
+                raise PointNotInDomainError(self.mesh, self.points[i])
+            local[~found, 1:] = np.nan
+
+        results = []
+        offset = 1
+        for split in components:
+            values = []
+            for f in split:
+                size = int(np.prod(f.ufl_shape, dtype=int))
+                values.append(local[:, offset:offset + size].reshape((npoints, ) + f.ufl_shape))
+                offset += size
+            results.append(values[0] if len(values) == 1 else tuple(values))
+        if len(results) == 1:
+            return results[0]
+        return tuple(results)
+
+
 class PointNotInDomainError(Exception):
     """Raised when attempting to evaluate a function outside its domain,
     and no fill value was given.
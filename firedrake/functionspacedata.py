@@ -31,7 +31,7 @@ from firedrake import extrusion_utils as eutils
 from firedrake.petsc import PETSc
 
 
-__all__ = ("get_shared_data", )
+__all__ = ("get_shared_data", "sparsity_cache_stats", "clear_sparsity_cache")
 
 
 @decorator
@@ -319,6 +319,87 @@ def get_boundary_nodes(mesh, key, V):
     return indices.astype(IntType)
 
 
+def get_sparsity(mesh, dsets, map_pairs, name, nest=None, block_sparse=None):
+    """Get a :class:`pyop2.Sparsity`, sharing it between all matrices
+    with the same sparsity pattern.
+
+    :arg mesh: The mesh topology to cache on.
+    :arg dsets: A 2-tuple of the row and column data sets
+        (:class:`pyop2.DataSet`).
+    :arg map_pairs: An iterable of ``(row_map, column_map,
+        iteration_regions)`` triples.  The iteration regions are used
+        to identify the parts of extruded meshes that need allocation
+        in the sparsity.
+    :arg name: A name for the sparsity (only used on a cache miss).
+    :arg nest: Should the sparsity be built for a nested matrix?
+    :arg block_sparse: Should the sparsity be built for a block
+        sparse matrix?
+    :returns: A :class:`pyop2.Sparsity`.
+
+    The cache can be inspected with :func:`sparsity_cache_stats`
+    and emptied with :func:`clear_sparsity_cache`.
+    """
+    assert hasattr(mesh, "_shared_data_cache")
+    # Repeated iteration regions (from several integrals of the same
+    # type) don't change the sparsity pattern.
+    map_pairs = tuple((rmap, cmap, tuple(sorted(set(regions), key=str)))
+                      for rmap, cmap, regions in map_pairs)
+    key = (tuple(dsets), map_pairs, nest, block_sparse)
+    cache = mesh._shared_data_cache["sparsity"]
+    stats = mesh._shared_data_cache["sparsity_stats"]
+    try:
+        sparsity = cache[key]
+        stats["hits"] = stats.get("hits", 0) + 1
+        return sparsity
+    except KeyError:
+        stats["misses"] = stats.get("misses", 0) + 1
+    # To avoid an extra check for extruded domains, the maps that are
+    # being passed in are DecoratedMaps.  For the non-extruded case
+    # the DecoratedMaps don't restrict the space over which we
+    # iterate as the domains are dropped at Sparsity construction
+    # time.  In the extruded case the cell domains are used to
+    # identify the regions of the mesh which require allocation in
+    # the sparsity.
+    maps = tuple((op2.DecoratedMap(rmap, regions), op2.DecoratedMap(cmap, regions))
+                 for rmap, cmap, regions in map_pairs)
+    sparsity = op2.Sparsity(tuple(dsets), maps, name,
+                            nest=nest, block_sparse=block_sparse)
+    cache[key] = sparsity
+    return sparsity
+
+
+def sparsity_cache_stats(mesh):
+    """Return statistics of the sparsity cache of a mesh.
+
+    :arg mesh: The mesh to get the statistics for.
+    :returns: A dict with the number of cache ``"hits"`` and
+        ``"misses"`` and the number of cached sparsities
+        (``"size"``).
+    """
+    mesh = mesh.topology
+    stats = mesh._shared_data_cache["sparsity_stats"]
+    return {"hits": stats.get("hits", 0),
+            "misses": stats.get("misses", 0),
+            "size": len(mesh._shared_data_cache["sparsity"])}
+
+
+def clear_sparsity_cache(mesh):
+    """Evict all sparsities cached on a mesh.
+
+    :arg mesh: The mesh to clear the cache of.
+    :returns: The number of evicted sparsities.
+
+    Matrices already built on the evicted sparsities are unaffected,
+    but new matrices will no longer share their sparsity patterns.
+    """
+    mesh = mesh.topology
+    cache = mesh._shared_data_cache["sparsity"]
+    n = len(cache)
+    cache.clear()
+    mesh._shared_data_cache["sparsity_stats"].clear()
+    return n
+
+
 def get_max_work_functions(V):
     """Get the maximum number of work functions.
 
@@ -158,3 +158,22 @@ class LinearSolver(solving_utils.ParametersMixin):
         r = self.ksp.getConvergedReason()
         if r < 0:
             raise ConvergenceError("LinearSolver failed to converge after %d iterations with reason: %s", self.ksp.getIterationNumber(), solving_utils.KSPReasons[r])
+
+    def solve_many(self, xs, bs):
+        """Solve the system for several right hand sides.
+
+        :arg xs: an iterable of solution :class:`.Function`\\s (or
+            :class:`.Vector`\\s).
+        :arg bs: an iterable of right hand sides, one per solution,
+            for example as returned by :func:`.assemble` with the
+            ``coefficients`` argument.
+
+        The operator and preconditioner are only set up once and
+        reused for all right hand sides.
+        """
+        xs = tuple(xs)
+        bs = tuple(bs)
+        if len(xs) != len(bs):
+            raise ValueError("Need as many solutions as right hand sides (have %d and %d)" % (len(xs), len(bs)))
+        for x, b in zip(xs, bs):
+            self.solve(x, b)
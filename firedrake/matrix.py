@@ -1,12 +1,28 @@
 import copy
 import abc
+import numpy
+from itertools import chain
 
 from pyop2 import op2
+from pyop2.datatypes import IntType
 from pyop2.utils import as_tuple, flatten
 from firedrake import utils
+from firedrake.parameters import parameters
 from firedrake.petsc import PETSc
 
 
+def _bc_keys(bc):
+    """The constrained rows of a boundary condition, as a list of
+    ``(component, method, subdomain)`` tuples, one for each
+    subdomain.
+
+    :arg bc: a :class:`.DirichletBC`.
+    """
+    component = bc.function_space().component
+    return [(component, bc.method, sub_domain)
+            for sub_domain in flatten(as_tuple(bc.sub_domain))]
+
+
 class MatrixBase(object, metaclass=abc.ABCMeta):
     """A representation of the linear operator associated with a
     bilinear form and bcs.  Explicitly assembled matrices and matrix-free
@@ -153,6 +169,9 @@ class Matrix(MatrixBase):
         self._assembled = False
 
         self._bcs_at_point_of_assembly = []
+        # Copy of the matrix without boundary conditions, see
+        # parameters["retain_unconstrained_matrices"].
+        self._unconstrained = None
 
     @utils.known_pyop2_safe
     def assemble(self):
@@ -176,20 +195,109 @@ class Matrix(MatrixBase):
 
             will apply boundary conditions from `bc1` in the first
             solve, but both `bc1` and `bc2` in the second solve.
+
+            If boundary conditions were only added, the rows and
+            columns of the assembled matrix corresponding to the new
+            boundary nodes are zeroed (and the diagonal set to 1)
+            without reassembling the form.  If
+            ``parameters["retain_unconstrained_matrices"]`` is set, an
+            unconstrained copy of the matrix is kept, so that removing
+            boundary conditions does not require reassembly either.
+            This is only possible for matrices on a single (not mixed)
+            function space.
         """
         if self._assembly_callback is None:
             self._assembled = True
             return
         if self._assembled:
             if self._needs_reassembly:
+                if self._update_bcs():
+                    self._bcs_at_point_of_assembly = copy.copy(self.bcs)
+                    return
                 from firedrake.assemble import _assemble
                 _assemble(self.a, tensor=self, bcs=self.bcs)
                 return self.assemble()
             return
         self._bcs_at_point_of_assembly = copy.copy(self.bcs)
-        self._assembly_callback(self.bcs)
+        if parameters["retain_unconstrained_matrices"] and self._bcs_in_place:
+            self._assembly_callback([])
+            self._M._force_evaluation()
+            if self._unconstrained is None:
+                self._unconstrained = self.petscmat.duplicate(copy=True)
+            else:
+                self.petscmat.copy(self._unconstrained,
+                                   structure=PETSc.Mat.Structure.SAME_NONZERO_PATTERN)
+            self._zero_bc_rows_columns(self.bcs)
+        else:
+            self._unconstrained = None
+            self._assembly_callback(self.bcs)
         self._assembled = True
 
+    @utils.cached_property
+    def _bcs_in_place(self):
+        """Can boundary conditions be applied to the assembled matrix?
+
+        This is the case for matrices with matching test and trial
+        spaces that are not mixed."""
+        test, trial = self.a.arguments()
+        return (self.block_shape == (1, 1)
+                and test.function_space() == trial.function_space())
+
+    def _zero_bc_rows_columns(self, bcs):
+        """Zero the rows and columns of the assembled matrix
+        corresponding to boundary condition nodes and set the diagonal
+        to 1.
+
+        :arg bcs: an iterable of :class:`.DirichletBC` objects.
+        """
+        V = self.a.arguments()[0].function_space()
+        cdim = V.value_size
+        owned = V.dof_dset.size
+        rows = []
+        for bc in bcs:
+            nodes = bc.nodes
+            # Every process zeroes the rows it owns.
+            nodes = nodes[nodes < owned]
+            component = bc.function_space().component
+            if component is None:
+                rows.append((cdim*nodes[:, numpy.newaxis] + numpy.arange(cdim, dtype=IntType)).reshape(-1))
+            else:
+                rows.append(cdim*nodes + component)
+        rows = numpy.unique(numpy.concatenate(rows)).astype(IntType) if rows else numpy.empty(0, dtype=IntType)
+        self.petscmat.zeroRowsColumnsLocal(rows, diag=1.0)
+
+    def _update_bcs(self):
+        """Update the boundary conditions of the assembled matrix
+        without reassembling the form.
+
+        :returns: True if the update succeeded, False if the matrix
+            must be reassembled.
+        """
+        if not self._bcs_in_place:
+            return False
+        V = self.a.arguments()[0].function_space()
+        for bc in self.bcs:
+            fs = bc.function_space()
+            if fs != V and (fs.component is None or fs.parent != V):
+                return False
+        old_keys = set(chain(*map(_bc_keys, self._bcs_at_point_of_assembly)))
+        new_keys = set(chain(*map(_bc_keys, self.bcs)))
+        new_bcs = [bc for bc in self.bcs if not set(_bc_keys(bc)) <= old_keys]
+        removed = len(old_keys - new_keys) > 0
+        if removed and self._unconstrained is None:
+            return False
+        self._M._force_evaluation()
+        try:
+            if removed:
+                self._unconstrained.copy(self.petscmat,
+                                         structure=PETSc.Mat.Structure.SAME_NONZERO_PATTERN)
+                self._zero_bc_rows_columns(self.bcs)
+            else:
+                self._zero_bc_rows_columns(new_bcs)
+        except PETSc.Error:
+            return False
+        return True
+
     @property
     def _assembly_callback(self):
         """Return the callback for assembling this :class:`Matrix`."""
@@ -231,16 +339,14 @@ class Matrix(MatrixBase):
     def _needs_reassembly(self):
         """Does this :class:`Matrix` need reassembly.
 
-        The :class:`Matrix` needs reassembling if the subdomains over
-        which boundary conditions were applied the last time it was
-        assembled are different from the subdomains of the current set
-        of boundary conditions.
+        The :class:`Matrix` needs reassembling if the subdomains (and
+        components) over which boundary conditions were applied the
+        last time it was assembled are different from those of the
+        current set of boundary conditions.
         """
-        old_subdomains = set(flatten(as_tuple(bc.sub_domain)
-                             for bc in self._bcs_at_point_of_assembly))
-        new_subdomains = set(flatten(as_tuple(bc.sub_domain)
-                             for bc in self.bcs))
-        return old_subdomains != new_subdomains
+        old_keys = set(chain(*map(_bc_keys, self._bcs_at_point_of_assembly)))
+        new_keys = set(chain(*map(_bc_keys, self.bcs)))
+        return old_keys != new_keys
 
     def force_evaluation(self):
         "Ensures that the matrix is fully assembled."
@@ -5,9 +5,10 @@ import sys
 import ufl
 import weakref
 from collections import OrderedDict, defaultdict
+from mpi4py import MPI
 from ufl.classes import ReferenceGrad
 
-from pyop2.datatypes import IntType
+from pyop2.datatypes import IntType, as_cstr, as_ctypes
 from pyop2 import op2
 from pyop2.mpi import COMM_WORLD, dup_comm, free_comm
 from pyop2.profiling import timed_function, timed_region
@@ -324,13 +325,18 @@ class MeshTopology(object):
     """A representation of mesh topology."""
 
     @timed_function("CreateMesh")
-    def __init__(self, plex, name, reorder, distribute):
+    def __init__(self, plex, name, reorder, distribute, renumbering=None):
         """Half-initialise a mesh topology.
 
         :arg plex: :class:`DMPlex` representing the mesh topology
         :arg name: name of the mesh
         :arg reorder: whether to reorder the mesh (bool)
         :arg distribute: whether to distribute the mesh to parallel processes
+        :arg renumbering: optional Plex renumbering (a PETSc IS), for
+            a plex that is already distributed (with halos), and
+            labelled with entity classes, as restored from a
+            checkpoint.  Partitioning, reordering and renumbering are
+            then skipped.
         """
         # Do some validation of the input mesh
         dmplex.validate_mesh(plex)
@@ -352,6 +358,11 @@ class MeshTopology(object):
         label_boundary = (self.comm.size == 1) or distribute
         dmplex.label_facets(plex, label_boundary=label_boundary)
 
+        # Star forests migrating the points of the undistributed plex
+        # to their final location, see _global_point_numbering.  None
+        # if we never saw the undistributed plex.
+        self._distribution_sfs = [] if (self.comm.size == 1 or distribute) else None
+
         # Distribute the dm to all ranks
         if self.comm.size > 1 and distribute:
             # We distribute with overlap zero, in case we're going to
@@ -368,7 +379,7 @@ class MeshTopology(object):
             except TypeError:
                 pass
             partitioner.setFromOptions()
-            plex.distribute(overlap=0)
+            self._distribution_sfs.append(plex.distribute(overlap=0))
 
         dim = plex.getDimension()
 
@@ -383,13 +394,13 @@ class MeshTopology(object):
         def callback(self):
             """Finish initialisation."""
             del self._callback
-            if self.comm.size > 1 and distribute:
+            if self.comm.size > 1 and distribute and renumbering is None:
                 dmplex.set_adjacency_callback(self._plex)
-                self._plex.distributeOverlap(1)
+                self._distribution_sfs.append(self._plex.distributeOverlap(1))
                 dmplex.clear_adjacency_callback(self._plex)
             self._grown_halos = True
 
-            if reorder:
+            if reorder and renumbering is None:
                 with timed_region("Mesh: reorder"):
                     old_to_new = self._plex.getOrdering(PETSc.Mat.OrderingType.RCM).indices
                     reordering = np.empty_like(old_to_new)
@@ -401,11 +412,15 @@ class MeshTopology(object):
 
             # Mark OP2 entities and derive the resulting Plex renumbering
             with timed_region("Mesh: numbering"):
-                dmplex.mark_entity_classes(self._plex)
+                if renumbering is None:
+                    dmplex.mark_entity_classes(self._plex)
                 self._entity_classes = dmplex.get_entity_classes(self._plex).astype(int)
-                self._plex_renumbering = dmplex.plex_renumbering(self._plex,
-                                                                 self._entity_classes,
-                                                                 reordering)
+                if renumbering is None:
+                    self._plex_renumbering = dmplex.plex_renumbering(self._plex,
+                                                                     self._entity_classes,
+                                                                     reordering)
+                else:
+                    self._plex_renumbering = renumbering
 
                 # Derive a cell numbering from the Plex renumbering
                 entity_dofs = np.zeros(dim+1, dtype=IntType)
@@ -454,6 +469,36 @@ class MeshTopology(object):
         """The UFL :class:`~ufl.classes.Cell` associated with the mesh."""
         return self._ufl_cell
 
+    @utils.cached_property
+    def _global_point_numbering(self):
+        """The number of each local plex point in the undistributed plex.
+
+        This does not depend on the number of processes the mesh is
+        distributed over, so identifies points across runs on
+        different numbers of processes (with an identically
+        constructed mesh).  None if the mesh was not distributed from
+        an undistributed plex."""
+        self.init()
+        if self._distribution_sfs is None:
+            return None
+        sfs = [sf for sf in self._distribution_sfs if sf is not None]
+        pStart, pEnd = self._plex.getChart()
+        nroots = sfs[0].getGraph()[0] if sfs else pEnd - pStart
+        offset = self.comm.exscan(nroots) or 0
+        numbering = np.arange(offset, offset + nroots, dtype=IntType)
+        try:
+            tdict = MPI.__TypeDict__
+        except AttributeError:
+            tdict = MPI._typedict
+        dtype = tdict[np.dtype(IntType).char]
+        for i, sf in enumerate(sfs):
+            # The leaves of each SF are the roots of the next.
+            nleaves = sfs[i + 1].getGraph()[0] if i + 1 < len(sfs) else pEnd - pStart
+            leaves = np.full(nleaves, -1, dtype=IntType)
+            dmplex.sf_bcast(sf, dtype, numbering, leaves)
+            numbering = leaves
+        return numbering
+
     @utils.cached_property
     def cell_closure(self):
         """2D array of ordered cell closures
@@ -793,6 +838,10 @@ class ExtrudedMeshTopology(MeshTopology):
         """
         return self._base_mesh.cell_closure
 
+    @property
+    def _global_point_numbering(self):
+        return self._base_mesh._global_point_numbering
+
     def _facets(self, kind):
         if kind not in ["interior", "exterior"]:
             raise ValueError("Unknown facet type '%s'" % kind)
@@ -982,7 +1031,8 @@ values from f.)"""
         raise AttributeError(message)
 
     def clear_spatial_index(self):
-        """Reset the :attr:`spatial_index` on this mesh geometry.
+        """Reset the :attr:`spatial_index` on this mesh geometry, and
+        invalidate the :class:`.PointEvaluator`\s on it.
 
         Use this if you move the mesh (for example by reassigning to
         the coordinate field)."""
@@ -990,6 +1040,13 @@ values from f.)"""
             del self.spatial_index
         except AttributeError:
             pass
+        for evaluator in self._point_evaluators:
+            evaluator.invalidate()
+
+    @utils.cached_property
+    def _point_evaluators(self):
+        """The :class:`.PointEvaluator`\s on this mesh."""
+        return weakref.WeakSet()
 
     @utils.cached_property
     def spatial_index(self):
@@ -1087,6 +1144,55 @@ values from f.)"""
             locator.restype = ctypes.c_int
             return cache.setdefault(tolerance, locator)
 
+    def _c_locate_points(self, tolerance=None):
+        """A compiled function locating a batch of points, returning
+        the cell containing each point (or -1 if none does) and the
+        reference coordinates of the point in that cell."""
+        from pyop2 import compilation
+        from pyop2.utils import get_petsc_dir
+        import firedrake.function as function
+        import firedrake.pointquery_utils as pq_utils
+
+        cache = self.__dict__.setdefault("_c_locate_points_cache", {})
+        try:
+            return cache[tolerance]
+        except KeyError:
+            src = pq_utils.src_locate_cell(self, tolerance=tolerance)
+            src += """
+    %(IntType)s locate_points(struct Function *f, double *x, %(IntType)s npoints, %(IntType)s *cells, double *X)
+    {
+        struct ReferenceCoords reference_coords;
+        %(IntType)s nfound = 0;
+        for (%(IntType)s p = 0; p < npoints; p++) {
+            cells[p] = locate_cell(f, x + p*%(geometric_dimension)d, %(geometric_dimension)d, &to_reference_coords, &reference_coords);
+            if (cells[p] == -1) {
+                continue;
+            }
+            for (int d = 0; d < %(geometric_dimension)d; d++) {
+                X[p*%(geometric_dimension)d + d] = reference_coords.X[d];
+            }
+            nfound++;
+        }
+        return nfound;
+    }
+    """ % dict(geometric_dimension=self.geometric_dimension(), IntType=as_cstr(IntType))
+
+            locate_points = compilation.load(src, "c", "locate_points",
+                                             cppargs=["-I%s" % os.path.dirname(__file__),
+                                                      "-I%s/include" % sys.prefix] +
+                                             ["-I%s/include" % d for d in get_petsc_dir()],
+                                             ldargs=["-L%s/lib" % sys.prefix,
+                                                     "-lspatialindex_c",
+                                                     "-Wl,-rpath,%s/lib" % sys.prefix])
+
+            locate_points.argtypes = [ctypes.POINTER(function._CFunction),
+                                      ctypes.POINTER(ctypes.c_double),
+                                      as_ctypes(IntType),
+                                      ctypes.POINTER(as_ctypes(IntType)),
+                                      ctypes.POINTER(ctypes.c_double)]
+            locate_points.restype = as_ctypes(IntType)
+            return cache.setdefault(tolerance, locate_points)
+
     def init_cell_orientations(self, expr):
         """Compute and initialise :attr:`cell_orientations` relative to a specified orientation.
 
@@ -1,10 +1,11 @@
+import numpy
 from ufl import inner, div, grad, curl, sqrt, dx
 
-from firedrake.assemble import assemble
+from firedrake.assemble import assemble, assemble_functionals
 from firedrake import function
 from firedrake.logging import warning
 
-__all__ = ['errornorm', 'norm']
+__all__ = ['errornorm', 'norm', 'norms']
 
 
 def errornorm(u, uh, norm_type="L2", degree_rise=None, mesh=None):
@@ -71,6 +72,35 @@ def norm(v, norm_type="L2", mesh=None):
 
           ||v||_{H_\mathrm{curl}}^2 = \int (v, v) + (\\nabla \wedge v, \\nabla \wedge v) \mathrm{d}x
     """
+    return sqrt(assemble(_norm_form(v, norm_type)))
+
+
+def norms(vs, norm_type="L2", mesh=None):
+    """Compute the norms of several expressions at once.
+
+    :arg vs: an iterable of ufl expressions
+         (:class:`~.ufl.classes.Expr`) to compute the norms of.
+    :arg norm_type: the type of norm to compute, see :func:`norm` for
+         options.
+    :arg mesh: an optional mesh on which to compute the norms
+         (currently ignored).
+    :returns: a :class:`numpy.ndarray` of the norms.
+
+    The squared norms are assembled together with
+    :func:`~.assemble_functionals`, which (on non-extruded meshes)
+    needs a single parallel loop over the cells and a single global
+    reduction, rather than one of each per norm.
+    """
+    squares = assemble_functionals([_norm_form(v, norm_type) for v in vs])
+    return numpy.sqrt(squares)
+
+
+def _norm_form(v, norm_type):
+    """Return the 0-form whose value is the square of the norm of v.
+
+    :arg v: a ufl expression.
+    :arg norm_type: the type of norm, see :func:`norm`.
+    """
     typ = norm_type.lower()
     if typ == 'l2':
         form = inner(v, v)*dx
@@ -82,5 +112,4 @@ def norm(v, norm_type="L2", mesh=None):
         form = inner(v, v)*dx + inner(curl(v), curl(v))*dx
     else:
         raise RuntimeError("Unknown norm type '%s'" % norm_type)
-
-    return sqrt(assemble(form))
+    return form
@@ -1,14 +1,17 @@
 
 import collections
+import functools
 import itertools
 import numpy
 import os
+import queue
+import threading
 import ufl
 import weakref
 from pyop2.mpi import COMM_WORLD, dup_comm
 from pyop2.datatypes import IntType
 
-__all__ = ("File", )
+__all__ = ("File", "XDMFFile")
 
 
 VTK_INTERVAL = 3
@@ -18,6 +21,22 @@ VTK_TETRAHEDRON = 10
 VTK_HEXAHEDRON = 12
 VTK_WEDGE = 13
 
+VTK_LAGRANGE_CURVE = 68
+VTK_LAGRANGE_TRIANGLE = 69
+VTK_LAGRANGE_QUADRILATERAL = 70
+VTK_LAGRANGE_TETRAHEDRON = 71
+VTK_LAGRANGE_HEXAHEDRON = 72
+VTK_LAGRANGE_WEDGE = 73
+
+lagrange_cells = {
+    VTK_INTERVAL: VTK_LAGRANGE_CURVE,
+    VTK_TRIANGLE: VTK_LAGRANGE_TRIANGLE,
+    VTK_QUADRILATERAL: VTK_LAGRANGE_QUADRILATERAL,
+    VTK_TETRAHEDRON: VTK_LAGRANGE_TETRAHEDRON,
+    VTK_HEXAHEDRON: VTK_LAGRANGE_HEXAHEDRON,
+    VTK_WEDGE: VTK_LAGRANGE_WEDGE
+}
+
 cells = {
     ufl.Cell("interval"): VTK_INTERVAL,
     ufl.Cell("triangle"): VTK_TRIANGLE,
@@ -67,6 +86,199 @@ def is_linear(V):
     return V.finat_element.space_dimension() == nvertex
 
 
+def vtk_lagrange_triangle_points(n):
+    """The nodes of a VTK Lagrange triangle of degree ``n``, in VTK
+    order, as integer lattice coordinates."""
+    if n == 0:
+        return [(0, 0)]
+    points = [(0, 0), (n, 0), (0, n)]
+    points += [(i, 0) for i in range(1, n)]
+    points += [(n - i, i) for i in range(1, n)]
+    points += [(0, n - i) for i in range(1, n)]
+    if n >= 3:
+        # Interior nodes are ordered as a triangle of degree n - 3
+        points += [(i + 1, j + 1) for i, j in vtk_lagrange_triangle_points(n - 3)]
+    return points
+
+
+def vtk_lagrange_quadrilateral_index(i, j, n):
+    """The VTK index of node (i, j) of a Lagrange quadrilateral of
+    degree ``n``."""
+    ibdy = i in (0, n)
+    jbdy = j in (0, n)
+    nbdy = ibdy + jbdy
+    if nbdy == 2:
+        # Vertex
+        return i and (2 if j else 1) or (3 if j else 0)
+    offset = 4
+    if nbdy == 1:
+        # Edge
+        if not ibdy:
+            return (i - 1) + (2*(n - 1) if j else 0) + offset
+        return (j - 1) + ((n - 1) if i else 3*(n - 1)) + offset
+    # Interior
+    offset += 4*(n - 1)
+    return (i - 1) + (n - 1)*(j - 1) + offset
+
+
+def vtk_lagrange_hexahedron_index(i, j, k, n):
+    """The VTK index of node (i, j, k) of a Lagrange hexahedron of
+    degree ``n``."""
+    ibdy = i in (0, n)
+    jbdy = j in (0, n)
+    kbdy = k in (0, n)
+    nbdy = ibdy + jbdy + kbdy
+    if nbdy == 3:
+        # Vertex
+        return (i and (2 if j else 1) or (3 if j else 0)) + (4 if k else 0)
+    offset = 8
+    if nbdy == 2:
+        # Edge
+        if not ibdy:
+            return (i - 1) + (2*(n - 1) if j else 0) + (4*(n - 1) if k else 0) + offset
+        if not jbdy:
+            return (j - 1) + ((n - 1) if i else 3*(n - 1)) + (4*(n - 1) if k else 0) + offset
+        offset += 8*(n - 1)
+        return (k - 1) + (n - 1)*((2 if j else 1) if i else (3 if j else 0)) + offset
+    offset += 12*(n - 1)
+    if nbdy == 1:
+        # Face
+        if ibdy:
+            return (j - 1) + (n - 1)*(k - 1) + ((n - 1)**2 if i else 0) + offset
+        offset += 2*(n - 1)**2
+        if jbdy:
+            return (i - 1) + (n - 1)*(k - 1) + ((n - 1)**2 if j else 0) + offset
+        offset += 2*(n - 1)**2
+        return (i - 1) + (n - 1)*(j - 1) + ((n - 1)**2 if k else 0) + offset
+    # Interior
+    offset += 6*(n - 1)**2
+    return (i - 1) + (n - 1)*((j - 1) + (n - 1)*(k - 1)) + offset
+
+
+def vtk_lagrange_points(cell, n):
+    """The nodes of a VTK Lagrange cell of degree ``n``, in VTK order.
+
+    :arg cell: The UFL cell.
+    :arg n: The degree.
+    :returns: A list of integer lattice coordinates of the nodes on
+        the reference cell (scaled by ``n``).
+    """
+    vtk = cells[cell]
+
+    def edges(vertices, edges):
+        return [tuple((va*(n - m) + vb*m)//n for va, vb in zip(vertices[a], vertices[b]))
+                for a, b in edges for m in range(1, n)]
+
+    if vtk == VTK_INTERVAL:
+        return [(0, ), (n, )] + [(i, ) for i in range(1, n)]
+    elif vtk == VTK_TRIANGLE:
+        return vtk_lagrange_triangle_points(n)
+    elif vtk == VTK_QUADRILATERAL:
+        points = [None]*(n + 1)**2
+        for i, j in itertools.product(range(n + 1), repeat=2):
+            points[vtk_lagrange_quadrilateral_index(i, j, n)] = (i, j)
+        return points
+    elif vtk == VTK_HEXAHEDRON:
+        points = [None]*(n + 1)**3
+        for i, j, k in itertools.product(range(n + 1), repeat=3):
+            points[vtk_lagrange_hexahedron_index(i, j, k, n)] = (i, j, k)
+        return points
+    elif vtk == VTK_TETRAHEDRON:
+        if n > 3:
+            raise ValueError("Lagrange tetrahedra of degree %d not supported" % n)
+        vertices = [(0, 0, 0), (n, 0, 0), (0, n, 0), (0, 0, n)]
+        points = vertices + edges(vertices, [(0, 1), (1, 2), (2, 0), (0, 3), (1, 3), (2, 3)])
+        if n == 3:
+            # One node at the centre of each face
+            for face in [(0, 1, 3), (1, 2, 3), (0, 2, 3), (0, 1, 2)]:
+                points.append(tuple(sum(c) // 3 for c in zip(*(vertices[v] for v in face))))
+        return points
+    elif vtk == VTK_WEDGE:
+        if n > 2:
+            raise ValueError("Lagrange wedges of degree %d not supported" % n)
+        vertices = [(0, 0, 0), (n, 0, 0), (0, n, 0), (0, 0, n), (n, 0, n), (0, n, n)]
+        points = vertices + edges(vertices, [(0, 1), (1, 2), (2, 0), (3, 4), (4, 5),
+                                             (5, 3), (0, 3), (1, 4), (2, 5)])
+        if n == 2:
+            # One node at the centre of each quadrilateral face
+            for face in [(0, 1, 4, 3), (1, 2, 5, 4), (2, 0, 3, 5)]:
+                points.append(tuple(sum(c) // 4 for c in zip(*(vertices[v] for v in face))))
+        return points
+    raise ValueError("Unhandled cell type %r" % cell)
+
+
+@functools.lru_cache()
+def vtk_lagrange_permutation(element):
+    """The permutation from the local nodes of a Lagrange element to
+    the nodes of the VTK Lagrange cell.
+
+    :arg element: A scalar UFL element.
+    :returns: An array ``perm``, such that local node ``perm[i]`` is
+        the ``i``\ th node of the VTK cell.
+    :raises ValueError: if the element can not be written as a VTK
+        Lagrange cell.
+    """
+    from tsfc.fiatinterface import create_element
+    degree = element.degree()
+    degrees = set(degree) if isinstance(degree, tuple) else {degree}
+    if len(degrees) != 1 or element.mapping() != "identity":
+        raise ValueError("Can only write isotropic Lagrange elements")
+    n, = degrees
+    if n < 1:
+        raise ValueError("Can only write Lagrange elements of degree at least 1")
+    nodes = {}
+    for i, dual in enumerate(create_element(element, vector_is_mixed=False).dual_basis()):
+        point_dict = dual.get_point_dict()
+        if len(point_dict) != 1:
+            raise ValueError("Element %s is not a Lagrange element" % element)
+        point, = point_dict
+        lattice = tuple(int(round(x*n)) for x in point)
+        if not numpy.allclose(lattice, numpy.asarray(point)*n):
+            raise ValueError("Element %s does not have equispaced nodes" % element)
+        nodes[lattice] = i
+    points = vtk_lagrange_points(element.cell(), n)
+    if len(points) != len(nodes):
+        raise ValueError("Element %s is not a Lagrange element" % element)
+    try:
+        return numpy.array([nodes[point] for point in points], dtype=IntType)
+    except KeyError:
+        raise ValueError("Element %s is not a Lagrange element" % element)
+
+
+def get_lagrange_topology(coordinates):
+    """Get the topology for VTU output with VTK Lagrange cells.
+
+    :arg coordinates: The coordinates defining the mesh, in a
+        (vector) Lagrange space.
+    :returns: A tuple of ``(connectivity, offsets, types)``
+        :class:`OFunction` objects.
+    """
+    V = coordinates.function_space()
+    mesh = V.ufl_domain().topology
+    cell = mesh.ufl_cell()
+    perm = vtk_lagrange_permutation(V.ufl_element().sub_elements()[0])
+    cell_node_map = V.cell_node_map()
+    values = cell_node_map.values[:, perm]
+    num_cells = mesh.cell_set.size
+    if mesh.cell_set._extruded:
+        if mesh.variable_layers:
+            raise ValueError("Can't write variable layer meshes with Lagrange cells")
+        # Repeat up the column
+        layers = mesh.cell_set.layers - 1
+        offset = cell_node_map.offset[perm]
+        values = (values[:, numpy.newaxis, :]
+                  + numpy.arange(layers, dtype=IntType)[numpy.newaxis, :, numpy.newaxis]*offset)
+        num_cells *= layers
+    nodes = len(perm)
+    connectivity = values.reshape(-1).astype(IntType)
+    offsets = numpy.arange(start=nodes, stop=nodes*(num_cells + 1), step=nodes,
+                           dtype=IntType)
+    cell_types = numpy.full(num_cells, lagrange_cells[cells[cell]], dtype="uint8")
+    return (OFunction(connectivity, "connectivity", None),
+            OFunction(offsets, "offsets", None),
+            OFunction(cell_types, "types", None))
+
+
 def get_topology(coordinates):
     """Get the topology for VTU output.
 
@@ -75,6 +287,8 @@ def get_topology(coordinates):
         :class:`OFunction`\s.
     """
     V = coordinates.function_space()
+    if not is_linear(V):
+        return get_lagrange_topology(coordinates)
     mesh = V.ufl_domain().topology
     cell = mesh.ufl_cell()
     values = V.cell_node_map().values
@@ -169,12 +383,75 @@ def get_byte_order(dtype):
 
 def write_array(f, ofunction):
     array = ofunction.array
-    numpy.uint32(array.nbytes).tofile(f)
+    numpy.uint64(array.nbytes).tofile(f)
     if get_byte_order(array.dtype) == "BigEndian":
         array = array.byteswap()
     array.tofile(f)
 
 
+# Size of the blocks compressed data is split into
+COMPRESSION_BLOCK_SIZE = 2**20
+
+compressors = {"zlib": "vtkZLibDataCompressor",
+               "lz4": "vtkLZ4DataCompressor"}
+
+
+def get_compress(compression):
+    """Return a function compressing a block of data.
+
+    :arg compression: The compression method, ``"zlib"`` or ``"lz4"``
+        (which needs the ``lz4`` package).
+    """
+    if compression == "zlib":
+        import zlib
+        return zlib.compress
+    elif compression == "lz4":
+        try:
+            import lz4.block
+        except ImportError:
+            raise ValueError("LZ4 compression needs the lz4 package")
+
+        def compress(data):
+            return lz4.block.compress(data, store_size=False)
+        return compress
+    else:
+        raise ValueError("Unknown compression %r, not one of %s" %
+                         (compression, ", ".join(sorted(compressors))))
+
+
+def encode_array(ofunction, compress=None, executor=None):
+    """Return the appended data for an array as bytes.
+
+    :arg ofunction: The :class:`OFunction` to encode.
+    :kwarg compress: An optional function compressing a block of
+        data, see :func:`get_compress`.
+    :kwarg executor: An optional executor to compress the blocks
+        with.
+
+    Uncompressed data is the same as written by :func:`write_array`.
+    Compressed data is split into blocks and preceded by the block
+    sizes, all headers are UInt64.
+    """
+    array = ofunction.array
+    if get_byte_order(array.dtype) == "BigEndian":
+        array = array.byteswap()
+    data = numpy.ascontiguousarray(array).tobytes()
+    if compress is None:
+        return numpy.uint64(len(data)).tobytes() + data
+    blocks = [data[i:i + COMPRESSION_BLOCK_SIZE]
+              for i in range(0, len(data), COMPRESSION_BLOCK_SIZE)]
+    if executor is None:
+        blocks = list(map(compress, blocks))
+    else:
+        blocks = list(executor.map(compress, blocks))
+    # Number of blocks, block size, size of the last block if partial,
+    # and the compressed size of each block.
+    header = numpy.array([len(blocks), COMPRESSION_BLOCK_SIZE,
+                          len(data) % COMPRESSION_BLOCK_SIZE]
+                         + [len(block) for block in blocks], dtype=numpy.uint64)
+    return header.tobytes() + b"".join(blocks)
+
+
 def write_array_descriptor(f, ofunction, offset=None, parallel=False):
     array, name, _ = ofunction
     shape = array.shape[1:]
@@ -196,7 +473,7 @@ def write_array_descriptor(f, ofunction, offset=None, parallel=False):
                  'NumberOfComponents="%s" '
                  'format="appended" '
                  'offset="%d" />\n' % (name, typ, ncmp, offset)).encode('ascii'))
-    return 4 + array.nbytes     # 4 is for the array size (uint32)
+    return 8 + array.nbytes     # 8 is for the array size (uint64)
 
 
 def get_vtu_name(basename, rank, size):
@@ -235,83 +512,190 @@ def get_array(function):
     return array
 
 
-class File(object):
-    _header = (b'<?xml version="1.0" ?>\n'
-               b'<VTKFile type="Collection" version="0.1" '
-               b'byte_order="LittleEndian">\n'
-               b'<Collection>\n')
-    _footer = (b'</Collection>\n'
-               b'</VTKFile>\n')
+class _BufferPool(object):
+    """A pool of arrays to snapshot output data into."""
 
-    def __init__(self, filename, project_output=False, comm=None, restart=0):
-        """Create an object for outputting data for visualisation.
+    def __init__(self):
+        self._free = collections.defaultdict(list)
+        self._lock = threading.Lock()
 
-        This produces output in VTU format, suitable for visualisation
-        with Paraview or other VTK-capable visualisation packages.
+    def snapshot(self, ofunction):
+        """Copy the data of an :class:`OFunction` into a buffer.
 
+        :returns: a new :class:`OFunction` holding the copy."""
+        array = ofunction.array
+        key = (array.shape, array.dtype)
+        with self._lock:
+            free = self._free[key]
+            buf = free.pop() if free else None
+        if buf is None:
+            buf = numpy.empty_like(array)
+        buf[...] = array
+        return OFunction(array=buf, name=ofunction.name, function=None)
 
-        :arg filename: The name of the output file (must end in
-            ``.pvd``).
-        :kwarg project_output: Should the output be projected to
-            linears?  Default is to use interpolation.
-        :kwarg comm: The MPI communicator to use.
-        :kwarg restart: Restart at count.
+    def release(self, *ofunctions):
+        """Return the buffers of snapshots to the pool."""
+        with self._lock:
+            for ofunction in ofunctions:
+                array = ofunction.array
+                self._free[(array.shape, array.dtype)].append(array)
 
-        .. note::
 
-           Visualisation is only possible for linear fields (either
-           continuous or discontinuous).  All other fields are first
-           either projected or interpolated to linear before storing
-           for visualisation purposes.
+class _AsyncWriter(object):
+    """Runs write jobs, in order, on a background thread.
+
+    :arg max_pending: the maximum number of jobs waiting to run, more
+        calls to :meth:`submit` block.
+    """
+
+    def __init__(self, max_pending):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                if self._error is None:
+                    job()
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _check(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def submit(self, job):
+        """Queue a job, raising any error from earlier jobs."""
+        self._check()
+        self._queue.put(job)
+
+    def flush(self):
+        """Wait for all queued jobs to finish."""
+        self._queue.join()
+        self._check()
+
+    def close(self):
+        """Finish all queued jobs and stop the thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._check()
+
+
+class _FunctionOutput(object):
+    """Preparation of :class:`~.Function` data for output, shared by
+    the output file classes.
+
+    Subclasses must set ``project``, ``high_order``, ``_fnames``,
+    ``_coordinates``, ``_output_functions`` and ``_mappers``."""
+
+    def _prepare_functions(self, functions):
+        """Check the functions to be written and prepare them for
+        output.
+
+        :returns: a tuple of the output coordinates and a tuple of the
+            output functions, as :class:`OFunction` objects.
         """
-        filename = os.path.abspath(filename)
-        basename, ext = os.path.splitext(filename)
-        if ext not in (".pvd", ):
-            raise ValueError("Only output to PVD is supported")
+        from firedrake.function import Function
+        for f in functions:
+            if not isinstance(f, Function):
+                raise ValueError("Can only output Functions, not %r" % type(f))
+        meshes = tuple(f.ufl_domain() for f in functions)
+        if not all(m == meshes[0] for m in meshes):
+            raise ValueError("All functions must be on same mesh")
 
-        comm = dup_comm(comm or COMM_WORLD)
+        mesh = meshes[0]
+        cell = mesh.topology.ufl_cell()
+        if cell not in cells:
+            raise ValueError("Unhandled cell type %r" % cell)
 
-        if comm.rank == 0 and restart == 0:
-            outdir = os.path.dirname(os.path.abspath(filename))
-            if not os.path.exists(outdir):
-                os.makedirs(outdir)
-        elif comm.rank == 0:
-            if not os.path.exists(os.path.abspath(filename)):
-                raise ValueError("Need a file to restart from.")
-        comm.barrier()
+        if self._fnames is not None:
+            if tuple(f.name() for f in functions) != self._fnames:
+                raise ValueError("Writing different set of functions")
+        else:
+            self._fnames = tuple(f.name() for f in functions)
 
-        self.comm = comm
-        self.filename = filename
-        self.basename = basename
-        self.counter = itertools.count()
-        self.timestep = itertools.count()
-        self.project = project_output
+        element = self._lagrange_element(functions)
+        if element is not None:
+            # Write the functions directly, with coordinates in the
+            # same space.
+            coordinates = self._prepare_coordinates(mesh, None, element)
+            functions = tuple(OFunction(array=get_array(f), name=f.name(), function=f)
+                              for f in functions)
+            return coordinates, functions
 
-        if self.comm.rank == 0 and restart == 0:
-            with open(self.filename, "wb") as f:
-                f.write(self._header)
-                f.write(self._footer)
-        elif self.comm.rank == 0:
-            import xml.etree.ElementTree as ET
-            tree = ET.parse(os.path.abspath(filename))
-            # Remove parts we want to discard
-            for parent in tree.iter():
-                for child in list(parent):
-                    if child.tag != "DataSet":
-                        continue
-                    if restart > 0:
-                        next(self.counter)
-                        next(self.timestep)
-                        restart -= 1
-                    else:
-                        parent.remove(child)
-            with open(self.filename, "wb") as f:
-                tree.write(f)
+        continuous = all(is_cg(f.function_space()) for f in functions) and \
+            is_cg(mesh.coordinates.function_space())
 
-        self._fnames = None
-        self._topology = None
-        self._output_functions = weakref.WeakKeyDictionary()
-        self._mappers = weakref.WeakKeyDictionary()
+        coordinates = self._prepare_coordinates(mesh, continuous)
+
+        functions = tuple(self._prepare_output(f, continuous)
+                          for f in functions)
+        return coordinates, functions
+
+    def _lagrange_element(self, functions):
+        """Can the functions be written with VTK Lagrange cells?
+
+        :returns: The common scalar element of the functions if
+            ``high_order`` output was requested, all functions are
+            in the same Lagrange space of degree higher than one, and
+            that space can be written as VTK Lagrange cells.
+            Otherwise None.
+        """
+        if not self.high_order:
+            return None
+        elements = set()
+        for f in functions:
+            element = f.ufl_element()
+            if isinstance(element, (ufl.VectorElement, ufl.TensorElement)):
+                element = element.sub_elements()[0]
+            elements.add(element)
+        if len(elements) != 1:
+            return None
+        element, = elements
+        if is_linear(functions[0].function_space()):
+            return None
+        try:
+            vtk_lagrange_permutation(element)
+        except ValueError:
+            return None
+        return element
+
+    def _prepare_coordinates(self, mesh, cg, element=None):
+        """Prepare the coordinates of a mesh for output.
+
+        :arg mesh: The mesh.
+        :arg cg: Is the output continuous?
+        :arg element: Optional scalar Lagrange element to interpolate
+            the coordinates into, for output with VTK Lagrange cells.
+
+        If the coordinates have not changed since the last call, the
+        previous output (the same :class:`OFunction`) is returned
+        without interpolating or projecting again."""
+        from firedrake import VectorFunctionSpace, Function
+        coordinates = mesh.coordinates
+        data = coordinates.dat.data_ro_with_halos
+        if self._coordinates is not None:
+            old, old_key, old_data, output = self._coordinates
+            if old is coordinates and old_key == (cg, element) and numpy.array_equal(old_data, data):
+                return output
+        if element is None:
+            output = self._prepare_output(coordinates, cg)
+        else:
+            V = VectorFunctionSpace(mesh, element, dim=coordinates.ufl_shape[0])
+            function = Function(V).interpolate(coordinates)
+            output = OFunction(array=get_array(function),
+                               name=coordinates.name(), function=function)
+        self._coordinates = (coordinates, (cg, element), data.copy(), output)
+        return output
 
     def _prepare_output(self, function, cg):
         from firedrake import FunctionSpace, VectorFunctionSpace, \
@@ -371,78 +755,244 @@ class File(object):
 
         return OFunction(array=get_array(output), name=name, function=output)
 
-    def _write_vtu(self, *functions):
-        from firedrake.function import Function
-        for f in functions:
-            if not isinstance(f, Function):
-                raise ValueError("Can only output Functions, not %r" % type(f))
-        meshes = tuple(f.ufl_domain() for f in functions)
-        if not all(m == meshes[0] for m in meshes):
-            raise ValueError("All functions must be on same mesh")
 
-        mesh = meshes[0]
-        cell = mesh.topology.ufl_cell()
-        if cell not in cells:
-            raise ValueError("Unhandled cell type %r" % cell)
+class File(_FunctionOutput):
+    _header = (b'<?xml version="1.0" ?>\n'
+               b'<VTKFile type="Collection" version="0.1" '
+               b'byte_order="LittleEndian">\n'
+               b'<Collection>\n')
+    _footer = (b'</Collection>\n'
+               b'</VTKFile>\n')
 
-        if self._fnames is not None:
-            if tuple(f.name() for f in functions) != self._fnames:
-                raise ValueError("Writing different set of functions")
+    def __init__(self, filename, project_output=False, comm=None, restart=0,
+                 asynchronous=False, max_pending=2, compression=None,
+                 compression_threads=None, high_order=False):
+        """Create an object for outputting data for visualisation.
+
+        This produces output in VTU format, suitable for visualisation
+        with Paraview or other VTK-capable visualisation packages.
+
+
+        :arg filename: The name of the output file (must end in
+            ``.pvd``).
+        :kwarg project_output: Should the output be projected to
+            linears?  Default is to use interpolation.
+        :kwarg comm: The MPI communicator to use.
+        :kwarg restart: Restart at count.
+        :kwarg asynchronous: Write the files on a background thread?
+            The output data is copied when :meth:`write` is called,
+            so the functions may be modified straight away.  Call
+            :meth:`flush` or :meth:`close` to wait for the files to
+            be written.
+        :kwarg max_pending: The number of writes that may be pending
+            in asynchronous mode before :meth:`write` blocks.
+        :kwarg compression: Compress the data in the VTU files?  One
+            of ``None`` (no compression), ``"zlib"`` or ``"lz4"``
+            (which needs the ``lz4`` package).
+        :kwarg compression_threads: The number of threads compressing
+            the data, defaults to the number of CPUs, up to 4.
+        :kwarg high_order: Write functions in a Lagrange space of
+            degree higher than one directly, using VTK's Lagrange
+            cells, rather than projecting or interpolating them to
+            linears?  This needs all functions to be in the same
+            space (up to value shape).  Supported are intervals,
+            triangles, quadrilaterals and hexahedra of any degree,
+            tetrahedra up to degree 3 and wedges up to degree 2.
+
+        .. note::
+
+           Unless ``high_order`` output is requested, visualisation is
+           only possible for linear fields (either continuous or
+           discontinuous).  All other fields are first either
+           projected or interpolated to linear before storing for
+           visualisation purposes.
+        """
+        filename = os.path.abspath(filename)
+        basename, ext = os.path.splitext(filename)
+        if ext not in (".pvd", ):
+            raise ValueError("Only output to PVD is supported")
+
+        comm = dup_comm(comm or COMM_WORLD)
+
+        if comm.rank == 0 and restart == 0:
+            outdir = os.path.dirname(os.path.abspath(filename))
+            if not os.path.exists(outdir):
+                os.makedirs(outdir)
+        elif comm.rank == 0:
+            if not os.path.exists(os.path.abspath(filename)):
+                raise ValueError("Need a file to restart from.")
+        comm.barrier()
+
+        self.comm = comm
+        self.filename = filename
+        self.basename = basename
+        self.counter = itertools.count()
+        self.timestep = itertools.count()
+        self.project = project_output
+        self.high_order = high_order
+
+        if self.comm.rank == 0 and restart == 0:
+            with open(self.filename, "wb") as f:
+                f.write(self._header)
+                f.write(self._footer)
+        elif self.comm.rank == 0:
+            import xml.etree.ElementTree as ET
+            tree = ET.parse(os.path.abspath(filename))
+            # Remove parts we want to discard
+            for parent in tree.iter():
+                for child in list(parent):
+                    if child.tag != "DataSet":
+                        continue
+                    if restart > 0:
+                        next(self.counter)
+                        next(self.timestep)
+                        restart -= 1
+                    else:
+                        parent.remove(child)
+            with open(self.filename, "wb") as f:
+                tree.write(f)
+
+        if compression is not None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._compress = get_compress(compression)
+            self._compressor = compressors[compression]
+            if compression_threads is None:
+                compression_threads = min(4, os.cpu_count() or 1)
+            self._executor = ThreadPoolExecutor(max_workers=compression_threads)
         else:
-            self._fnames = tuple(f.name() for f in functions)
+            self._compress = None
+            self._compressor = None
+            self._executor = None
 
-        continuous = all(is_cg(f.function_space()) for f in functions) and \
-            is_cg(mesh.coordinates.function_space())
+        self._fnames = None
+        self._topology = None
+        self._coordinates = None
+        # Encoded coordinates and topology, see _write_vtu
+        self._mesh_data = None
+        self._output_functions = weakref.WeakKeyDictionary()
+        self._mappers = weakref.WeakKeyDictionary()
 
-        coordinates = self._prepare_output(mesh.coordinates, continuous)
+        if asynchronous:
+            self._pool = _BufferPool()
+            self._writer = _AsyncWriter(max_pending)
+            # Make sure everything is written at exit.
+            weakref.finalize(self, self._writer.close)
+        else:
+            self._writer = None
+        self._closed = False
 
-        functions = tuple(self._prepare_output(f, continuous)
-                          for f in functions)
+    def _submit(self, job, *snapshots):
+        """Run a write job, on the writer thread in asynchronous mode.
+
+        :arg job: a callable doing the I/O.
+        :arg snapshots: :class:`OFunction` snapshots used by the job,
+            released to the buffer pool when it is done.
+        """
+        if self._writer is None:
+            job()
+            return
+
+        def run():
+            try:
+                job()
+            finally:
+                self._pool.release(*snapshots)
+        self._writer.submit(run)
+
+    def flush(self):
+        """Wait until all data passed to :meth:`write` has been
+        written (only relevant for asynchronous output)."""
+        if self._writer is not None:
+            self._writer.flush()
+
+    def close(self):
+        """Finish writing to this :class:`File`, after which it can
+        not be written to.  In asynchronous mode, this waits for all
+        pending writes and stops the writer thread."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self._closed = True
+
+    def _write_vtu(self, *functions):
+        coordinates, functions = self._prepare_functions(functions)
 
         if self._topology is None:
             self._topology = get_topology(coordinates.function)
 
+        # The coordinates and topology of a static mesh are only
+        # encoded once.
+        if self._mesh_data is None or self._mesh_data[0] is not coordinates:
+            self._mesh_data = (coordinates,
+                               [encode_array(a, self._compress, self._executor)
+                                for a in (coordinates, ) + self._topology])
+        mesh_data = self._mesh_data[1]
+
         basename = "%s_%s" % (self.basename, next(self.counter))
 
-        vtu = self._write_single_vtu(basename, coordinates, *functions)
+        snapshots = ()
+        if self._writer is not None:
+            functions = tuple(self._pool.snapshot(f) for f in functions)
+            snapshots = functions
 
-        if self.comm.size > 1:
-            vtu = self._write_single_pvtu(basename, coordinates, *functions)
+        def write():
+            self._write_single_vtu(basename, coordinates, mesh_data, *functions)
+            if self.comm.size > 1:
+                self._write_single_pvtu(basename, coordinates, *functions)
+        self._submit(write, *snapshots)
 
-        return vtu
+        if self.comm.size > 1:
+            return get_pvtu_name(basename)
+        return get_vtu_name(basename, self.comm.rank, self.comm.size)
 
     def _write_single_vtu(self, basename,
                           coordinates,
+                          mesh_data,
                           *functions):
         connectivity, offsets, types = self._topology
         num_points = coordinates.array.shape[0]
         num_cells = types.array.shape[0]
         fname = get_vtu_name(basename, self.comm.rank, self.comm.size)
+        if self._compress is not None:
+            data = [encode_array(function, self._compress, self._executor)
+                    for function in functions]
+            sizes = [len(d) for d in data]
+            compressor = (' compressor="%s"' % self._compressor).encode('ascii')
+        else:
+            data = None
+            sizes = [8 + function.array.nbytes for function in functions]
+            compressor = b''
+        sizes = [len(d) for d in mesh_data] + sizes
         with open(fname, "wb") as f:
             # Running offset for appended data
-            offset = 0
+            positions = iter(numpy.cumsum([0] + sizes[:-1]))
             f.write(b'<?xml version="1.0" ?>\n')
-            f.write(b'<VTKFile type="UnstructuredGrid" version="0.1" '
+            # Lagrange hexahedra use the node ordering of version 2.2
+            version = b"2.2" if VTK_LAGRANGE_HEXAHEDRON in types.array[:1] else b"0.1"
+            f.write(b'<VTKFile type="UnstructuredGrid" version="' + version + b'" '
                     b'byte_order="LittleEndian" '
-                    b'header_type="UInt32">\n')
+                    b'header_type="UInt64"' + compressor + b'>\n')
             f.write(b'<UnstructuredGrid>\n')
 
             f.write(('<Piece NumberOfPoints="%d" '
                      'NumberOfCells="%d">\n' % (num_points, num_cells)).encode('ascii'))
             f.write(b'<Points>\n')
             # Vertex coordinates
-            offset += write_array_descriptor(f, coordinates, offset=offset)
+            write_array_descriptor(f, coordinates, offset=next(positions))
             f.write(b'</Points>\n')
 
             f.write(b'<Cells>\n')
-            offset += write_array_descriptor(f, connectivity, offset=offset)
-            offset += write_array_descriptor(f, offsets, offset=offset)
-            offset += write_array_descriptor(f, types, offset=offset)
+            write_array_descriptor(f, connectivity, offset=next(positions))
+            write_array_descriptor(f, offsets, offset=next(positions))
+            write_array_descriptor(f, types, offset=next(positions))
             f.write(b'</Cells>\n')
 
             f.write(b'<PointData>\n')
             for function in functions:
-                offset += write_array_descriptor(f, function, offset=offset)
+                write_array_descriptor(f, function, offset=next(positions))
             f.write(b'</PointData>\n')
 
             f.write(b'</Piece>\n')
@@ -452,12 +1002,15 @@ class File(object):
             # Appended data must start with "_", separating whitespace
             # from data
             f.write(b'_')
-            write_array(f, coordinates)
-            write_array(f, connectivity)
-            write_array(f, offsets)
-            write_array(f, types)
-            for function in functions:
-                write_array(f, function)
+            # Coordinates, connectivity, offsets and types
+            for d in mesh_data:
+                f.write(d)
+            if data is None:
+                for function in functions:
+                    write_array(f, function)
+            else:
+                for d in data:
+                    f.write(d)
             f.write(b'\n</AppendedData>\n')
 
             f.write(b'</VTKFile>\n')
@@ -511,6 +1064,8 @@ class File(object):
         However, all calls to :meth:`write` must use the same set of
         functions.
         """
+        if self._closed:
+            raise ValueError("Can't write to a closed File")
         time = kwargs.get("time", None)
         vtu = self._write_vtu(*functions)
         if time is None:
@@ -519,12 +1074,206 @@ class File(object):
         # Write into collection as relative path, so we can move
         # things around.
         vtu = os.path.relpath(vtu, os.path.dirname(self.basename))
+        if self.comm.rank == 0:
+            self._submit(lambda: self._write_dataset(time, vtu))
+
+    def _write_dataset(self, time, vtu):
+        with open(self.filename, "r+b") as f:
+            # Seek backwards from end to beginning of footer
+            f.seek(-len(self._footer), 2)
+            # Write new dataset name
+            f.write(('<DataSet timestep="%s" '
+                     'file="%s" />\n' % (time, vtu)).encode('ascii'))
+            # And add footer again, so that the file is valid
+            f.write(self._footer)
+
+
+xdmf_cells = {
+    VTK_INTERVAL: "Polyline",
+    VTK_TRIANGLE: "Triangle",
+    VTK_QUADRILATERAL: "Quadrilateral",
+    VTK_TETRAHEDRON: "Tetrahedron",
+    VTK_HEXAHEDRON: "Hexahedron",
+    VTK_WEDGE: "Wedge"
+}
+
+
+class XDMFFile(_FunctionOutput):
+    _header = (b'<?xml version="1.0" ?>\n'
+               b'<Xdmf Version="3.0">\n'
+               b'<Domain>\n'
+               b'<Grid Name="TimeSeries" GridType="Collection" '
+               b'CollectionType="Temporal">\n')
+    _footer = (b'</Grid>\n'
+               b'</Domain>\n'
+               b'</Xdmf>\n')
+
+    def __init__(self, filename, project_output=False, comm=None):
+        """Create an object for outputting data for visualisation.
+
+        This produces output in XDMF format, suitable for
+        visualisation with Paraview or VisIt.  Unlike :class:`File`,
+        all processes write collectively into a single HDF5 file
+        (using MPI-IO), which is described by a small XDMF file.
+
+        :arg filename: The name of the output file (must end in
+            ``.xdmf``).  The data is stored in a file with the same
+            name, ending in ``.h5``.
+        :kwarg project_output: Should the output be projected to
+            linears?  Default is to use interpolation.
+        :kwarg comm: The MPI communicator to use.
+
+        This object can be used in a context manager (in which case
+        it closes the file when the scope is exited).
+
+        .. note::
+
+           The mesh coordinates and topology are only written once,
+           so the mesh must not move between calls to :meth:`write`.
+           As for :class:`File`, fields are either projected or
+           interpolated to linear before storing.
+        """
+        filename = os.path.abspath(filename)
+        basename, ext = os.path.splitext(filename)
+        if ext not in (".xdmf", ):
+            raise ValueError("Only output to XDMF is supported")
+
+        comm = dup_comm(comm or COMM_WORLD)
+
+        if comm.rank == 0:
+            outdir = os.path.dirname(filename)
+            if not os.path.exists(outdir):
+                os.makedirs(outdir)
+        comm.barrier()
+
+        self.comm = comm
+        self.filename = filename
+        self.h5filename = "%s.h5" % basename
+        self.counter = itertools.count()
+        self.timestep = itertools.count()
+        self.project = project_output
+        # XDMF has no arbitrary order cells
+        self.high_order = False
+
+        import h5py
+        # Try to use MPI
+        try:
+            self._h5file = h5py.File(self.h5filename, "w", driver="mpio", comm=comm)
+        except NameError:  # the error you get if h5py isn't compiled against parallel HDF5
+            raise RuntimeError("h5py *must* be installed with MPI support")
+
+        if self.comm.rank == 0:
+            with open(self.filename, "wb") as f:
+                f.write(self._header)
+                f.write(self._footer)
+
+        self._fnames = None
+        self._mesh = None
+        self._coordinates = None
+        self._output_functions = weakref.WeakKeyDictionary()
+        self._mappers = weakref.WeakKeyDictionary()
+
+    def _write_array(self, path, array):
+        """Collectively write an array into a new dataset.
+
+        :arg path: The path of the dataset.
+        :arg array: The local part of the data, the dataset is the
+            concatenation of the arrays on all processes.
+        :returns: An XDMF ``DataItem`` referencing the dataset.
+        """
+        n = array.shape[0]
+        offset = self.comm.exscan(n) or 0
+        shape = (self.comm.allreduce(n), ) + array.shape[1:]
+        dset = self._h5file.create_dataset(path, shape=shape, dtype=array.dtype)
+        # Another MPI/non-MPI difference
+        try:
+            with dset.collective:
+                dset[offset:offset + n] = array
+        except AttributeError:
+            dset[offset:offset + n] = array
+        number_type = {"i": "Int", "u": "UInt", "f": "Float"}[array.dtype.kind]
+        return ('<DataItem Dimensions="%s" NumberType="%s" Precision="%d" '
+                'Format="HDF">%s:%s</DataItem>\n' %
+                (" ".join(map(str, shape)), number_type, array.dtype.itemsize,
+                 os.path.basename(self.h5filename), path))
+
+    def _write_mesh(self, coordinates):
+        """Write the mesh coordinates and topology.
+
+        :returns: The XDMF ``Topology`` and ``Geometry`` elements
+            describing the mesh.
+        """
+        connectivity, _, types = get_topology(coordinates.function)
+        cell = coordinates.function.ufl_domain().topology.ufl_cell()
+        nodes = cell.num_vertices()
+        points = coordinates.array
+        # Every process numbers its points from zero.
+        point_offset = self.comm.exscan(points.shape[0]) or 0
+        topology = connectivity.array.reshape(-1, nodes).astype(numpy.int64) + point_offset
+        num_cells = self.comm.allreduce(types.array.shape[0])
+        return ('<Topology TopologyType="%s" NumberOfElements="%d" '
+                'NodesPerElement="%d">\n' % (xdmf_cells[cells[cell]], num_cells, nodes)
+                + self._write_array("/Mesh/topology", topology)
+                + '</Topology>\n'
+                + '<Geometry GeometryType="XYZ">\n'
+                + self._write_array("/Mesh/coordinates", points)
+                + '</Geometry>\n')
+
+    def write(self, *functions, **kwargs):
+        """Write functions to this :class:`XDMFFile`.
+
+        :arg functions: list of functions to write.
+        :kwarg time: optional timestep value.
+
+        You may save more than one function to the same file.
+        However, all calls to :meth:`write` must use the same set of
+        functions.  This is collective over the communicator of the
+        file.
+        """
+        time = kwargs.get("time", None)
+        coordinates, functions = self._prepare_functions(functions)
+        if self._mesh is None:
+            self._mesh = self._write_mesh(coordinates)
+        if time is None:
+            time = next(self.timestep)
+        count = next(self.counter)
+
+        attributes = []
+        for function in functions:
+            array = function.array
+            typ = {1: "Scalar", 2: "Vector", 3: "Tensor"}[array.ndim]
+            if array.ndim == 3:
+                array = array.reshape(array.shape[0], -1)
+            attributes.append('<Attribute Name="%s" AttributeType="%s" '
+                              'Center="Node">\n' % (function.name, typ)
+                              + self._write_array("/Function/%s/%d" % (function.name, count), array)
+                              + '</Attribute>\n')
+        self._h5file.flush()
+
         if self.comm.rank == 0:
             with open(self.filename, "r+b") as f:
                 # Seek backwards from end to beginning of footer
                 f.seek(-len(self._footer), 2)
-                # Write new dataset name
-                f.write(('<DataSet timestep="%s" '
-                         'file="%s" />\n' % (time, vtu)).encode('ascii'))
+                f.write(('<Grid Name="mesh" GridType="Uniform">\n'
+                         '<Time Value="%s" />\n' % time
+                         + self._mesh
+                         + "".join(attributes)
+                         + '</Grid>\n').encode('ascii'))
                 # And add footer again, so that the file is valid
                 f.write(self._footer)
+
+    def close(self):
+        """Close the output file (flushing any pending writes)."""
+        if hasattr(self, '_h5file'):
+            self._h5file.flush()
+            self._h5file.close()
+            del self._h5file
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        self.close()
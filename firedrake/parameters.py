@@ -75,6 +75,16 @@ parameters.add(pyop2_opts)
 
 parameters.add(Parameters("form_compiler", **default_parameters()))
 
+# Number of local processes used to compile the kernels of a form.
+# If positive, the independent blocks and integral types of a form are
+# also compiled in parallel over the ranks of its communicator.  Zero
+# compiles everything serially on every rank.
+parameters["form_compiler_processes"] = 0
+
+# Number of forms in the process-wide cache of compiled forms, zero
+# disables the cache.
+parameters["form_cache_size"] = 128
+
 parameters["reorder_meshes"] = True
 
 # One of nest, aij, baij or matfree
@@ -84,6 +94,10 @@ parameters["default_sub_matrix_type"] = "baij"
 
 parameters["type_check_safe_par_loops"] = False
 
+# Keep a copy of assembled matrices without boundary conditions, so
+# that changing the boundary conditions never requires reassembly.
+parameters["retain_unconstrained_matrices"] = False
+
 
 def disable_performance_optimisations():
     """Switches off performance optimisations in Firedrake.
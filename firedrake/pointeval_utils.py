@@ -1,4 +1,6 @@
 
+import numpy
+
 from pyop2.datatypes import IntType, as_cstr
 
 from coffee import base as ast
@@ -112,6 +114,7 @@ def compile_element(expression, coordinates, parameters=None):
         "extruded_arg": ", %s nlayers" % as_cstr(IntType) if extruded else "",
         "nlayers": ", f->n_layers" if extruded else "",
         "IntType": as_cstr(IntType),
+        "value_size": int(numpy.prod(expression.ufl_shape, dtype=int)),
     }
 
     evaluate_template_c = """static inline void wrap_evaluate(double *result, double *X, double *coords, %(IntType)s *coords_map, double *f, %(IntType)s *f_map%(extruded_arg)s, %(IntType)s cell);
@@ -131,6 +134,23 @@ int evaluate(struct Function *f, double *x, double *result)
     wrap_evaluate(result, reference_coords.X, f->coords, f->coords_map, f->f, f->f_map%(nlayers)s, cell);
     return 0;
 }
+
+%(IntType)s evaluate_points(struct Function *f, double *x, %(IntType)s npoints, double *result, %(IntType)s *found)
+{
+    %(IntType)s nfound = 0;
+    for (%(IntType)s p = 0; p < npoints; p++) {
+        found[p] = evaluate(f, x + p*%(geometric_dimension)d, result + p*%(value_size)d) == 0;
+        nfound += found[p];
+    }
+    return nfound;
+}
+
+void evaluate_located(struct Function *f, %(IntType)s npoints, %(IntType)s *cells, double *X, double *result)
+{
+    for (%(IntType)s p = 0; p < npoints; p++) {
+        wrap_evaluate(result + p*%(value_size)d, X + p*%(geometric_dimension)d, f->coords, f->coords_map, f->f, f->f_map%(nlayers)s, cells[p]);
+    }
+}
 """
 
     return (evaluate_template_c % code) + kernel_code.gencode()
@@ -17,7 +17,7 @@ this templated function library.
 from coffee import base as ast
 
 from firedrake.constant import Constant
-from firedrake.tsfc_interface import SplitKernel, KernelInfo
+from firedrake.tsfc_interface import SplitKernel, KernelInfo, compile_on_root
 from firedrake.slate.slac.kernel_builder import LocalKernelBuilder
 from firedrake import op2
 
@@ -66,10 +66,32 @@ def compile_expression(slate_expr, tsfc_parameters=None):
     if slate_expr._metakernel_cache is not None:
         return slate_expr._metakernel_cache
 
-    # Create a builder for the Slate expression
+    # Create a builder for the Slate expression.  This compiles the
+    # terminal forms, and is collective.
     builder = LocalKernelBuilder(expression=slate_expr,
                                  tsfc_parameters=tsfc_parameters)
 
+    # Generate the Slate kernel on one process only
+    comm = slate_expr.ufl_domain().comm
+    kinfo = compile_on_root(comm, _generate_kernel, builder)
+
+    # Cache the resulting kernel
+    idx = tuple([0]*slate_expr.rank)
+    kernel = (SplitKernel(idx, kinfo),)
+    slate_expr._metakernel_cache = kernel
+
+    return kernel
+
+
+def _generate_kernel(builder):
+    """Generates the kernel for the Slate expression contained in the
+    :class:`LocalKernelBuilder`.
+
+    :arg builder: The :class:`LocalKernelBuilder` containing
+                  all relevant expression information.
+
+    Return: A `KernelInfo` object for the Slate expression.
+    """
     # Keep track of declared temporaries
     declared_temps = {}
     statements = []
@@ -93,14 +115,7 @@ def compile_expression(slate_expr, tsfc_parameters=None):
         statements.extend(aux_temps)
 
     # Generate the kernel information with complete AST
-    kinfo = generate_kernel_ast(builder, statements, declared_temps)
-
-    # Cache the resulting kernel
-    idx = tuple([0]*slate_expr.rank)
-    kernel = (SplitKernel(idx, kinfo),)
-    slate_expr._metakernel_cache = kernel
-
-    return kernel
+    return generate_kernel_ast(builder, statements, declared_temps)
 
 
 def generate_kernel_ast(builder, statements, declared_temps):
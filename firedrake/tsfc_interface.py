@@ -1,17 +1,23 @@
 """Provides the interface to TSFC for compiling a form, and transforms the TSFC-
 generated code in order to make it suitable for passing to the backends."""
+import copy
+import copyreg
+import io
 import pickle
 
 from hashlib import md5
 from os import path, environ, getuid, makedirs
-import gzip
 import os
 import zlib
 import tempfile
+import threading
+import time
 import collections
 
 import ufl
 from ufl import Form
+from ufl.classes import (Argument, Coefficient, FixedIndex, GeometricQuantity,
+                         Label, MultiIndex, Zero)
 from .ufl_expr import TestFunction
 
 from tsfc import compile_form as tsfc_compile_form
@@ -38,6 +44,114 @@ KernelInfo = collections.namedtuple("KernelInfo",
                                      "pass_layer_arg"])
 
 
+def _reduce_cached(obj):
+    """Reduce a :class:`~pyop2.caching.Cached` object for pickling.
+
+    Unpickling with a binary protocol calls ``cls.__new__(cls)``,
+    which for cached objects would try to look up a key.  The
+    protocol 0 reduction reconstructs the object without calling
+    ``__new__``."""
+    return obj.__reduce_ex__(0)
+
+
+class _DispatchTable(dict):
+    """A pickle dispatch table that reduces all
+    :class:`~pyop2.caching.Cached` objects with :func:`_reduce_cached`."""
+
+    def __missing__(self, cls):
+        if issubclass(cls, Cached):
+            return _reduce_cached
+        raise KeyError(cls)
+
+    def get(self, cls, default=None):
+        try:
+            return self[cls]
+        except KeyError:
+            return default
+
+
+def _dumps(val):
+    """Pickle and compress an object for the kernel cache."""
+    f = io.BytesIO()
+    pickler = pickle.Pickler(f, pickle.HIGHEST_PROTOCOL)
+    pickler.dispatch_table = _DispatchTable(copyreg.dispatch_table)
+    pickler.dump(val)
+    return zlib.compress(f.getvalue(), 1)
+
+
+def _loads(data):
+    """Decompress and unpickle an object from the kernel cache."""
+    return pickle.loads(zlib.decompress(data))
+
+
+_cache_stats = collections.Counter()
+
+
+def cache_stats():
+    """Return statistics of the TSFC kernel cache in this process.
+
+    :returns: a dict with the number of ``memory_hits``,
+         ``disk_hits`` and ``misses``, the ``bytes_read`` from and
+         ``bytes_written`` to disk, and the number of files
+         ``evicted`` from the disk cache.
+
+    Disk reads and writes, and evictions, only happen on rank 0 of
+    each communicator.
+    """
+    stats = dict.fromkeys(["memory_hits", "disk_hits", "misses",
+                           "bytes_read", "bytes_written", "evicted"], 0)
+    stats.update(_cache_stats)
+    return stats
+
+
+def reset_cache_stats():
+    """Reset the statistics returned by :func:`cache_stats`."""
+    _cache_stats.clear()
+
+
+def prune_cache(cachedir, max_size=None, max_age=None):
+    """Evict the least recently used files from a cache directory.
+
+    :arg cachedir: the cache directory.
+    :arg max_size: the maximum total size of the cache in bytes, or
+         ``None`` for no limit.
+    :arg max_age: optional maximum time in days since a file was last
+         used.  Older files are evicted whatever the size of the
+         cache.
+    :returns: a tuple of the number of files evicted and the size of
+         the cache afterwards.
+
+    Files still being written (with a ``.tmp`` suffix) are left alone.
+    """
+    entries = []
+    for dirpath, _, filenames in os.walk(cachedir):
+        for filename in filenames:
+            if filename.endswith(".tmp"):
+                continue
+            filepath = path.join(dirpath, filename)
+            try:
+                st = os.stat(filepath)
+            except OSError:
+                # Removed by someone else
+                continue
+            entries.append((st.st_atime, st.st_size, filepath))
+    size = sum(entry[1] for entry in entries)
+    oldest = None if max_age is None else time.time() - max_age*86400
+    evicted = 0
+    for atime, nbytes, filepath in sorted(entries):
+        too_old = oldest is not None and atime < oldest
+        too_big = max_size is not None and size > max_size
+        if not (too_old or too_big):
+            break
+        try:
+            os.remove(filepath)
+        except OSError:
+            pass
+        size -= nbytes
+        evicted += 1
+    return evicted, size
+
+
 class TSFCKernel(Cached):
 
     _cache = {}
@@ -46,31 +160,77 @@ class TSFCKernel(Cached):
                             path.join(tempfile.gettempdir(),
                                       'firedrake-tsfc-kernel-cache-uid%d' % getuid()))
 
+    # Maximum size of the disk cache in bytes, zero means unbounded.
+    # When the cache grows above this, the least recently used files
+    # are evicted until it is back below 90% of the maximum size.
+    _cache_max_size = int(float(environ.get('FIREDRAKE_TSFC_KERNEL_CACHE_SIZE', 0)))
+
+    # Estimated size of the disk cache, to avoid scanning the cache
+    # directory on every write.
+    _cache_size = None
+
+    @classmethod
+    def _cache_path(cls, key):
+        """The file storing the object with a given key.
+
+        Files are sharded into subdirectories by the first two
+        characters of the key."""
+        return path.join(cls._cachedir, key[:2], key[2:])
+
     @classmethod
     def _cache_lookup(cls, key):
         key, comm = key
-        return cls._cache.get(key) or cls._read_from_disk(key, comm)
+        val = cls._cache.get(key)
+        if val is None:
+            return cls._read_from_disk(key, comm)
+        _cache_stats["memory_hits"] += 1
+        return val
+
+    @classmethod
+    def _cache_contains(cls, key):
+        """Is an object in the cache?
+
+        Unlike :meth:`_cache_lookup`, this does not load the object,
+        or count towards the :func:`cache_stats`.  This is collective
+        over the communicator in the key."""
+        key, comm = key
+        if key in cls._cache:
+            return True
+        if comm.rank == 0:
+            found = os.path.exists(cls._cache_path(key))
+        else:
+            found = None
+        return comm.bcast(found, root=0)
 
     @classmethod
     def _read_from_disk(cls, key, comm):
         if comm.rank == 0:
-            cache = cls._cachedir
-            filepath = os.path.join(cache, key)
+            filepath = cls._cache_path(key)
             val = None
             if os.path.exists(filepath):
                 try:
-                    with gzip.open(filepath, 'rb') as f:
+                    with open(filepath, 'rb') as f:
                         val = f.read()
-                except zlib.error:
-                    pass
+                    # Record the access for LRU eviction, atime is not
+                    # reliably updated by all filesystems.
+                    os.utime(filepath)
+                    _cache_stats["bytes_read"] += len(val)
+                except OSError:
+                    val = None
 
             comm.bcast(val, root=0)
         else:
             val = comm.bcast(None, root=0)
 
+        if val is not None:
+            try:
+                val = _loads(val)
+            except zlib.error:
+                val = None
         if val is None:
+            _cache_stats["misses"] += 1
             raise KeyError("Object with key %s not found" % key)
-        val = pickle.loads(val)
+        _cache_stats["disk_hits"] += 1
         cls._cache[key] = val
         return val
 
@@ -80,57 +240,249 @@ class TSFCKernel(Cached):
         _ensure_cachedir(comm=comm)
         if comm.rank == 0:
             val._key = key
-            filepath = os.path.join(cls._cachedir, key)
-            tempfile = os.path.join(cls._cachedir, "%s_p%d.tmp" % (key, os.getpid()))
+            filepath = cls._cache_path(key)
+            makedirs(path.dirname(filepath), exist_ok=True)
+            tempfile = "%s_p%d.tmp" % (filepath, os.getpid())
+            data = _dumps(val)
             # No need for a barrier after this, since non root
             # processes will never race on this file.
-            with gzip.open(tempfile, 'wb') as f:
-                pickle.dump(val, f, 0)
+            with open(tempfile, 'wb') as f:
+                f.write(data)
             os.rename(tempfile, filepath)
+            _cache_stats["bytes_written"] += len(data)
+            cls._evict(len(data))
         comm.barrier()
 
     @classmethod
-    def _cache_key(cls, form, name, parameters, number_map):
-        # FIXME Making the COFFEE parameters part of the cache key causes
-        # unnecessary repeated calls to TSFC when actually only the kernel code
-        # needs to be regenerated
+    def _evict(cls, nbytes):
+        """Account for ``nbytes`` written to the disk cache, and evict
+        old files if the cache is over its maximum size."""
+        max_size = TSFCKernel._cache_max_size
+        if not max_size:
+            return
+        if TSFCKernel._cache_size is None:
+            _, TSFCKernel._cache_size = prune_cache(cls._cachedir, float("inf"))
+        else:
+            TSFCKernel._cache_size += nbytes
+        if TSFCKernel._cache_size > max_size:
+            evicted, TSFCKernel._cache_size = prune_cache(cls._cachedir, 0.9*max_size)
+            _cache_stats["evicted"] += evicted
+
+    @classmethod
+    def _cache_key(cls, form, name, parameters, number_map, kernels=None):
+        # The COFFEE parameters are part of the key, but the TSFC
+        # output is cached separately (see TSFCOutput), so changing
+        # them only regenerates the kernel code.
         return md5((form.signature() + name
                     + str(sorted(default_parameters["coffee"].items()))
                     + str(sorted(parameters.items()))
                     + str(number_map)).encode()).hexdigest(), form.ufl_domains()[0].comm
 
-    def __init__(self, form, name, parameters, number_map):
+    def __init__(self, form, name, parameters, number_map, kernels=None):
         """A wrapper object for one or more TSFC kernels compiled from a given :class:`~ufl.classes.Form`.
 
         :arg form: the :class:`~ufl.classes.Form` from which to compile the kernels.
         :arg name: a prefix to be applied to the compiled kernel names. This is primarily useful for debugging.
         :arg parameters: a dict of parameters to pass to the form compiler.
         :arg number_map: a map from local coefficient numbers to global ones (useful for split forms).
+        :arg kernels: optional tuple of :class:`KernelInfo` objects
+             already compiled from ``form`` (for example by another
+             process), in which case TSFC is not called.
         """
         if self._initialized:
             return
 
-        tree = tsfc_compile_form(form, prefix=name, parameters=parameters)
-        kernels = []
-        for kernel in tree:
-            # Set optimization options
-            opts = default_parameters["coffee"]
-            ast = kernel.ast
-            ast = ast if not parameters.get("assemble_inverse", False) else _inverse(ast)
-            # Unwind coefficient numbering
-            numbers = tuple(number_map[c] for c in kernel.coefficient_numbers)
-            kernels.append(KernelInfo(kernel=Kernel(ast, ast.name, opts=opts),
-                                      integral_type=kernel.integral_type,
-                                      oriented=kernel.oriented,
-                                      subdomain_id=kernel.subdomain_id,
-                                      domain_number=kernel.domain_number,
-                                      coefficient_map=numbers,
-                                      needs_cell_facets=False,
-                                      pass_layer_arg=False))
+        if kernels is None:
+            kernels = _compile_kernels(form, name, parameters, number_map,
+                                       tree=TSFCOutput(form, name, parameters).kernels)
         self.kernels = tuple(kernels)
         self._initialized = True
 
 
+TSFCOutputKernel = collections.namedtuple("TSFCOutputKernel",
+                                          ["ast",
+                                           "integral_type",
+                                           "oriented",
+                                           "subdomain_id",
+                                           "domain_number",
+                                           "coefficient_numbers"])
+
+
+class TSFCOutput(TSFCKernel):
+
+    _cache = {}
+
+    @classmethod
+    def _cache_key(cls, form, name, parameters, kernels=None):
+        return md5(("tsfc" + form.signature() + name
+                    + str(sorted(parameters.items()))).encode()).hexdigest(), form.ufl_domains()[0].comm
+
+    def __init__(self, form, name, parameters, kernels=None):
+        """The output of TSFC for a given :class:`~ufl.classes.Form`,
+        before any COFFEE optimisation.
+
+        :arg form: the :class:`~ufl.classes.Form` to compile.
+        :arg name: a prefix to be applied to the compiled kernel names.
+        :arg parameters: a dict of parameters to pass to the form compiler.
+        :arg kernels: optional tuple of :class:`TSFCOutputKernel`
+             objects already produced from ``form`` (for example by
+             another process), in which case TSFC is not called.
+
+        This is the first level of the kernel cache, it shares the
+        disk cache of :class:`TSFCKernel`.  Its key does not depend on
+        the COFFEE parameters.
+        """
+        if self._initialized:
+            return
+
+        if kernels is None:
+            # Only one process pays for the compilation.
+            comm = form.ufl_domains()[0].comm
+            kernels = compile_on_root(comm, _tsfc_output, form, name, parameters)
+        self.kernels = tuple(kernels)
+        self._initialized = True
+
+
+def _tsfc_output(form, name, parameters):
+    """Run TSFC on a form.
+
+    :returns: a tuple of :class:`TSFCOutputKernel` objects.
+    """
+    return tuple(TSFCOutputKernel(ast=kernel.ast,
+                                  integral_type=kernel.integral_type,
+                                  oriented=kernel.oriented,
+                                  subdomain_id=kernel.subdomain_id,
+                                  domain_number=kernel.domain_number,
+                                  coefficient_numbers=kernel.coefficient_numbers)
+                 for kernel in tsfc_compile_form(form, prefix=name, parameters=parameters))
+
+
+def _compile_kernels(form, name, parameters, number_map, tree=None):
+    """Compile a form with TSFC.
+
+    :arg form: the :class:`~ufl.classes.Form` to compile.
+    :arg name: a prefix for the generated kernel names.
+    :arg parameters: a dict of parameters to pass to the form compiler.
+    :arg number_map: a map from local coefficient numbers to global ones.
+    :arg tree: optional tuple of :class:`TSFCOutputKernel` objects,
+         the output of TSFC for ``form``.  If not provided, TSFC is
+         called.
+    :returns: a tuple of :class:`KernelInfo` objects.
+
+    This does no caching and no communication, so it is safe to call
+    from a worker process.
+    """
+    if tree is None:
+        tree = _tsfc_output(form, name, parameters)
+    kernels = []
+    for kernel in tree:
+        # Set optimization options
+        opts = default_parameters["coffee"]
+        # COFFEE modifies the AST, so leave the cached TSFC output alone.
+        ast = copy.deepcopy(kernel.ast)
+        ast = ast if not parameters.get("assemble_inverse", False) else _inverse(ast)
+        # Unwind coefficient numbering
+        numbers = tuple(number_map[c] for c in kernel.coefficient_numbers)
+        kernels.append(KernelInfo(kernel=Kernel(ast, ast.name, opts=opts),
+                                  integral_type=kernel.integral_type,
+                                  oriented=kernel.oriented,
+                                  subdomain_id=kernel.subdomain_id,
+                                  domain_number=kernel.domain_number,
+                                  coefficient_map=numbers,
+                                  needs_cell_facets=False,
+                                  pass_layer_arg=False))
+    return tuple(kernels)
+
+
+def compile_on_root(comm, compile, *args):
+    """Run a compilation on rank 0 of a communicator and broadcast
+    the result.
+
+    :arg comm: the communicator.
+    :arg compile: a callable producing the compiled object, which must
+         be picklable.
+    :arg args: the arguments to ``compile``.
+    :returns: the result of ``compile(*args)`` on every rank.
+
+    This is collective over ``comm``.  If the compilation fails, the
+    other ranks raise a :class:`RuntimeError`.
+    """
+    if comm.size == 1:
+        return compile(*args)
+    if comm.rank == 0:
+        try:
+            val = (True, _dumps(compile(*args)))
+        except Exception as e:
+            comm.bcast((False, "%s: %s" % (type(e).__name__, e)), root=0)
+            raise
+        comm.bcast(val, root=0)
+    else:
+        val = comm.bcast(None, root=0)
+    ok, val = val
+    if not ok:
+        raise RuntimeError("Compilation failed on rank 0 with %s" % val)
+    return _loads(val)
+
+
+# Compilation tasks of the current parallel compile, inherited by the
+# forked worker processes.
+_compile_tasks = []
+
+
+def _compile_task(form, name, parameters, number_map):
+    """Compile a form, without caching or communication.
+
+    :returns: the output of TSFC and the kernels, as a tuple of
+         :class:`TSFCOutputKernel` objects and a tuple of
+         :class:`KernelInfo` objects, pickled in the same format as
+         the disk cache uses."""
+    tree = _tsfc_output(form, name, parameters)
+    return _dumps((tree, _compile_kernels(form, name, parameters, number_map, tree=tree)))
+
+
+def _compile_worker(i):
+    """Compile task ``i`` of :data:`_compile_tasks` in a worker process."""
+    return _compile_task(*_compile_tasks[i][1:])
+
+
+def _compile_in_parallel(tasks, comm, nprocs):
+    """Compile a number of forms, sharing the work between the ranks
+    of a communicator and a pool of local processes.
+
+    :arg tasks: a list of (key, form, name, parameters, number_map)
+         tuples, identical on all ranks of ``comm``.
+    :arg comm: the communicator to share the work over.
+    :arg nprocs: the number of local processes each rank uses.
+    :returns: a list of (TSFC output, kernels) tuples, as returned
+         by :func:`_compile_task`, in the order of ``tasks``.
+
+    This is collective over ``comm``.  The pool is only used if this
+    is the only thread in the process, since forking while other
+    threads (such as asynchronous output writers) hold locks can
+    deadlock the workers.
+    """
+    global _compile_tasks
+    mine = list(range(comm.rank, len(tasks), comm.size))
+    results = {}
+    if nprocs > 1 and len(mine) > 1 and threading.active_count() == 1:
+        import multiprocessing
+        # Fork, so that the forms (which need not be picklable) are
+        # inherited by the workers.  The workers never call MPI.
+        _compile_tasks = tasks
+        try:
+            with multiprocessing.get_context("fork").Pool(min(nprocs, len(mine))) as pool:
+                results.update(zip(mine, pool.map(_compile_worker, mine)))
+        finally:
+            _compile_tasks = []
+    else:
+        for i in mine:
+            results[i] = _compile_task(*tasks[i][1:])
+    if comm.size > 1:
+        for other in comm.allgather(results):
+            results.update(other)
+    return [_loads(results[i]) for i in range(len(tasks))]
+
+
 SplitKernel = collections.namedtuple("SplitKernel", ["indices",
                                                      "kinfo"])
 
@@ -181,26 +533,173 @@ def compile_form(form, name, parameters=None, inverse=False):
            params == parameters:
             return kernels
 
+    # Structurally identical forms (for example a form rebuilt every
+    # timestep, possibly with different coefficients) hit the
+    # process-wide form cache, which skips computing the form
+    # signature, splitting the form and looking up each block.
+    key = (_form_structure(form), name, str(sorted(parameters.items())),
+           str(sorted(default_parameters["coffee"].items())))
+    kernels = _form_cache.get(key)
+    if kernels is not None:
+        _form_cache.move_to_end(key)
+        form._cache["firedrake_kernels"] = (kernels, default_parameters["coffee"].copy(),
+                                            name, parameters)
+        return kernels
+
     kernels = []
     # A map from all form coefficients to their number.
     coefficient_numbers = dict((c, n)
                                for (n, c) in enumerate(form.coefficients()))
+    nprocs = default_parameters["form_compiler_processes"]
+    blocks = []
     for idx, f in split_form(form):
         f = _real_mangle(f)
+        if nprocs > 0:
+            # Integrals of different types are independent, compile
+            # them separately.
+            integral_types = []
+            for integral in f.integrals():
+                if integral.integral_type() not in integral_types:
+                    integral_types.append(integral.integral_type())
+            blocks.extend((idx, Form([integral for integral in f.integrals()
+                                      if integral.integral_type() == integral_type]))
+                          for integral_type in integral_types)
+        else:
+            blocks.append((idx, f))
+    tasks = []
+    for idx, f in blocks:
         # Map local coefficient numbers (as seen inside the
         # compiler) to the global coefficient numbers
         number_map = dict((n, coefficient_numbers[c])
                           for (n, c) in enumerate(f.coefficients()))
-        kinfos = TSFCKernel(f, name + "".join(map(str, idx)), parameters,
-                            number_map).kernels
+        tasks.append((idx, f, name + "".join(map(str, idx)), parameters, number_map))
+    compiled = {}
+    if nprocs > 0:
+        # Only compile what is not already cached, at either level.
+        missing = []
+        for task in tasks:
+            if not (TSFCKernel._cache_contains(TSFCKernel._cache_key(*task[1:]))
+                    or TSFCOutput._cache_contains(TSFCOutput._cache_key(*task[1:4]))):
+                missing.append(task)
+        comm = form.ufl_domains()[0].comm
+        for task, (tree, kinfos) in zip(missing, _compile_in_parallel(missing, comm, nprocs)):
+            # Store the TSFC output, as the serial path does.
+            TSFCOutput(*task[1:4], kernels=tree)
+            compiled[id(task)] = kinfos
+    for task in tasks:
+        idx = task[0]
+        kinfos = TSFCKernel(*task[1:], kernels=compiled.get(id(task))).kernels
         for kinfo in kinfos:
             kernels.append(SplitKernel(idx, kinfo))
     kernels = tuple(kernels)
     form._cache["firedrake_kernels"] = (kernels, default_parameters["coffee"].copy(),
                                         name, parameters)
+    max_size = default_parameters["form_cache_size"]
+    if max_size > 0:
+        _form_cache[key] = kernels
+        while len(_form_cache) > max_size:
+            _form_cache.popitem(last=False)
     return kernels
 
 
+# LRU cache of compiled kernels keyed on the structure of the forms,
+# see compile_form and _form_structure.  Neither keys nor values refer
+# to the forms, so the cache keeps no data alive.
+_form_cache = collections.OrderedDict()
+
+
+def _form_structure(form):
+    """A structural key for a form, which is much cheaper to compute
+    than the form signature.
+
+    :arg form: the :class:`~ufl.classes.Form`.
+    :returns: a hashable description of the expression DAG of each
+         integral, with the domains, coefficients, arguments, free
+         indices and labels of the form renumbered as the signature
+         (and the coefficient maps of the kernels) number them.
+
+    Forms with equal keys have the same kernels, even if they are
+    built from different coefficients.  The key is an exact
+    description rather than a hash, so there are no collisions.  It
+    only refers to UFL elements, not to any data.  Nodes are
+    identified by ``id`` while traversing, so that the (possibly
+    uncached) UFL hashes are never computed, and the coefficients are
+    numbered here rather than by analysing the form.
+    """
+    domains = form.ufl_domains()
+    domain_numbers = dict((id(d), n) for n, d in enumerate(domains))
+
+    def domain_number(domain):
+        try:
+            return domain_numbers[id(domain)]
+        except KeyError:
+            return domains.index(domain)
+
+    positions = {}
+    nodes = []
+    # Positions of the coefficients, which are numbered by count.
+    coefficients = []
+    indices = {}
+    labels = {}
+
+    def index_number(count):
+        return indices.setdefault(count, len(indices))
+
+    integrals = []
+    for integral in form.integrals():
+        stack = [integral.integrand()]
+        while stack:
+            node = stack[-1]
+            if id(node) in positions:
+                stack.pop()
+                continue
+            pending = [o for o in node.ufl_operands if id(o) not in positions]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            if isinstance(node, Coefficient):
+                coefficients.append(len(nodes))
+                desc = ("coefficient", node.count(), node.ufl_element())
+            elif isinstance(node, Argument):
+                desc = ("argument", node.number(), node.part(), node.ufl_element())
+            elif isinstance(node, MultiIndex):
+                desc = ("multiindex", ) + tuple(
+                    (int(i), ) if isinstance(i, FixedIndex) else index_number(i.count())
+                    for i in node.indices())
+            elif isinstance(node, Zero):
+                desc = ("zero", node.ufl_shape,
+                        tuple(map(index_number, node.ufl_free_indices)),
+                        node.ufl_index_dimensions)
+            elif isinstance(node, Label):
+                desc = ("label", labels.setdefault(node.count(), len(labels)))
+            elif isinstance(node, GeometricQuantity):
+                desc = (node._ufl_typecode_, domain_number(node.ufl_domain()))
+            elif node._ufl_is_terminal_:
+                desc = repr(node)
+            else:
+                desc = (node._ufl_typecode_, ) + tuple(positions[id(o)] for o in node.ufl_operands)
+            positions[id(node)] = len(nodes)
+            nodes.append(desc)
+        integrals.append((integral.integral_type(),
+                          domain_number(integral.ufl_domain()),
+                          integral.subdomain_id(),
+                          repr(sorted(integral.metadata().items())),
+                          positions[id(integral.integrand())]))
+    numbers = dict((count, n) for n, count in
+                   enumerate(sorted(set(nodes[i][1] for i in coefficients))))
+    for i in coefficients:
+        _, count, element = nodes[i]
+        nodes[i] = ("coefficient", numbers[count], element)
+    return (tuple(d.ufl_coordinate_element() for d in domains),
+            tuple(nodes), tuple(integrals))
+
+
+def clear_form_cache():
+    """Clear the process-wide cache of compiled forms."""
+    _form_cache.clear()
+
+
 def _real_mangle(form):
     """If the form contains arguments in the Real function space, replace these with literal 1 before passing to tsfc."""
 
@@ -1,4 +1,5 @@
 # Some generic python utilities not really specific to our work.
+import hashlib
 from decorator import decorator
 from pyop2.utils import cached_property  # noqa: F401
 
@@ -62,3 +63,15 @@ def known_pyop2_safe(f):
         finally:
             opts["type_check"] = check
     return decorator(wrapper, f)
+
+
+def dat_digest(dat):
+    """A digest of the data of a :class:`pyop2.Dat` owned by this
+    process.
+
+    PyOP2 does not count modifications of a Dat, so comparing digests
+    is how we tell whether its values have changed.  This reads all
+    the data, so only use it where that is cheap compared to the work
+    it saves."""
+    with dat.vec_ro as v:
+        return hashlib.md5(v.array_r.tobytes()).hexdigest()
@@ -80,6 +80,94 @@ def test_serial_checkpoint_parallel_load_fails(f, dumpfile):
             chk.load(f)
 
 
+def expression(f):
+    x = SpatialCoordinate(f.ufl_domain())
+    return x if f.ufl_shape else x[0]*x[1]
+
+
+@pytest.mark.parallel(nprocs=3)
+@pytest.mark.parametrize("family", [FunctionSpace, VectorFunctionSpace])
+def test_store_load_different_nprocs(family, dumpfile):
+    dumpfile = COMM_WORLD.bcast(dumpfile, root=0)
+    # Store on 3 processes
+    mesh = UnitSquareMesh(4, 4)
+    f = Function(family(mesh, "CG", 2), name="f")
+    f.interpolate(expression(f))
+    with DumbCheckpoint(dumpfile, mode=FILE_CREATE) as chk:
+        chk.store(f)
+
+    # Load on 1 and 2 processes
+    for nprocs in [1, 2]:
+        comm = COMM_WORLD.Split(color=int(COMM_WORLD.rank < nprocs))
+        if COMM_WORLD.rank < nprocs:
+            mesh = UnitSquareMesh(4, 4, comm=comm)
+            g = Function(family(mesh, "CG", 2), name="f")
+            with DumbCheckpoint(dumpfile, mode=FILE_READ, comm=comm) as chk:
+                chk.load(g)
+            expect = Function(g.function_space()).interpolate(expression(g))
+            assert np.allclose(g.dat.data_ro, expect.dat.data_ro)
+        comm.Free()
+
+
+@pytest.mark.parametrize("staging_dir", [False, True])
+def test_asynchronous_store(f, dumpfile, tmpdir, staging_dir):
+    staging_dir = str(tmpdir.mkdir("staging")) if staging_dir else None
+    g = Function(f)
+    with DumbCheckpoint(dumpfile, mode=FILE_CREATE, asynchronous=True,
+                        max_staging_bytes=f.dat.nbytes,
+                        staging_dir=staging_dir) as chk:
+        handles = []
+        for t in range(3):
+            chk.set_timestep(float(t))
+            g.assign(f + t)
+            handles.append(chk.store(g))
+        # Changing the function does not change the stored data
+        g.assign(0)
+        handles[-1].wait()
+        assert all(handle.done() for handle in handles)
+        steps, indices = chk.get_timesteps()
+        assert np.allclose(steps, [0, 1, 2])
+
+    with DumbCheckpoint(dumpfile, mode=FILE_READ) as chk:
+        for t in range(3):
+            chk.set_timestep(float(t), idx=t)
+            chk.load(g)
+            assert np.allclose(g.dat.data_ro, f.dat.data_ro + t)
+
+
+def run_store_load_mesh(dumpfile):
+    dumpfile = COMM_WORLD.bcast(dumpfile, root=0)
+    mesh = UnitSquareMesh(4, 4)
+    f = Function(FunctionSpace(mesh, "CG", 2), name="f")
+    f.interpolate(expression(f))
+    with DumbCheckpoint(dumpfile, mode=FILE_CREATE) as chk:
+        chk.store_mesh(mesh)
+        chk.store(f)
+
+    with DumbCheckpoint(dumpfile, mode=FILE_READ) as chk:
+        mesh2 = chk.load_mesh()
+        g = Function(FunctionSpace(mesh2, "CG", 2), name="f")
+        chk.load(g)
+
+    assert mesh2.name == mesh.name
+    assert np.allclose(mesh2.coordinates.dat.data_ro_with_halos,
+                       mesh.coordinates.dat.data_ro_with_halos)
+    assert np.allclose(g.dat.data_ro, f.dat.data_ro)
+    assert np.allclose(assemble(g*dx), assemble(f*dx))
+    # Boundary markers survive
+    assert np.allclose(assemble(g*ds(1)), assemble(f*ds(1)))
+    assert np.allclose(assemble(g('+')*dS), assemble(f('+')*dS))
+
+
+def test_store_load_mesh(dumpfile):
+    run_store_load_mesh(dumpfile)
+
+
+@pytest.mark.parallel(nprocs=3)
+def test_store_load_mesh_parallel(dumpfile):
+    run_store_load_mesh(dumpfile)
+
+
 def test_checkpoint_fails_for_non_function(dumpfile):
     with DumbCheckpoint(dumpfile, mode=FILE_CREATE) as chk:
         with pytest.raises(ValueError):
@@ -133,6 +221,24 @@ def test_multiple_timesteps(f, dumpfile):
         assert np.allclose(indices, [0, 1])
 
 
+def test_timesteps_appended(f, dumpfile):
+    with DumbCheckpoint(dumpfile, mode=FILE_CREATE) as chk:
+        for t in range(2000):
+            chk.set_timestep(0.5*t)
+        assert chk.h5file["stored_time_steps"].shape == (2000, )
+        assert not chk.has_attribute("/", "stored_time_steps")
+
+    with DumbCheckpoint(dumpfile, mode=FILE_UPDATE) as chk:
+        chk.set_timestep(1000.0, idx=2000)
+        steps, indices = chk.get_timesteps()
+
+    with DumbCheckpoint(dumpfile, mode=FILE_READ) as chk:
+        assert np.allclose(chk.get_timesteps()[0], steps)
+        assert np.allclose(chk.get_timesteps()[1], indices)
+    assert np.allclose(steps, 0.5*np.arange(2001))
+    assert np.allclose(indices, np.arange(2001))
+
+
 def test_new_file(f, dumpfile):
     custom_name = "%s_custom" % dumpfile
     with DumbCheckpoint(dumpfile, single_file=False, mode=FILE_CREATE) as chk:
@@ -153,6 +259,42 @@ def test_new_file(f, dumpfile):
         assert np.allclose(g.dat.data_ro, f.dat.data_ro)
 
 
+def test_incremental_store(dumpfile):
+    import h5py
+    mesh = UnitSquareMesh(2, 2)
+    V = FunctionSpace(mesh, "CG", 1)
+    static = Function(V, name="static").assign(1)
+    u = Function(V, name="u")
+    with DumbCheckpoint(dumpfile, single_file=False, mode=FILE_CREATE,
+                        incremental=True) as chk:
+        for t in range(3):
+            chk.set_timestep(t)
+            u.assign(t)
+            chk.store(u)
+            chk.store(static)
+        links = [chk.h5file.get("/fields/%d/static" % t, getlink=True) for t in range(3)]
+        assert isinstance(links[0], h5py.HardLink)
+        assert all(isinstance(link, h5py.SoftLink) for link in links[1:])
+        chk.new_file()
+        chk.store(static)
+        assert isinstance(chk.h5file.get("/fields/2/static", getlink=True), h5py.ExternalLink)
+
+    with DumbCheckpoint("%s_0" % dumpfile, mode=FILE_READ) as chk:
+        for t in range(3):
+            chk.set_timestep(t, idx=t)
+            chk.load(u)
+            assert np.allclose(u.dat.data_ro, t)
+            g = Function(V, name="static")
+            chk.load(g)
+            assert np.allclose(g.dat.data_ro, 1)
+
+    with DumbCheckpoint("%s_1" % dumpfile, mode=FILE_READ) as chk:
+        chk.set_timestep(2, idx=2)
+        g = Function(V, name="static")
+        chk.load(g)
+        assert np.allclose(g.dat.data_ro, 1)
+
+
 def test_new_file_valueerror(f, dumpfile):
     with DumbCheckpoint(dumpfile, single_file=True, mode=FILE_CREATE) as chk:
         chk.store(f)
@@ -87,6 +87,113 @@ def test_write_read_parallel(mesh, fs, degree, dumpfile):
     run_write_read(mesh, fs, degree, dumpfile)
 
 
+@pytest.mark.parallel(nprocs=3)
+def test_write_read_different_nprocs(dumpfile):
+    dumpfile = MPI.COMM_WORLD.bcast(dumpfile, root=0)
+    # Write on 1 process
+    if MPI.COMM_WORLD.rank == 0:
+        mesh = UnitSquareMesh(4, 4, comm=MPI.COMM_SELF)
+        f = Function(VectorFunctionSpace(mesh, "CG", 2), name="f")
+        f.interpolate(SpatialCoordinate(mesh))
+        with HDF5File(dumpfile, "w", comm=MPI.COMM_SELF) as h5:
+            h5.write(f, "/solution", timestamp=0.1)
+    MPI.COMM_WORLD.barrier()
+
+    # Read on 3 processes
+    mesh = UnitSquareMesh(4, 4)
+    V = VectorFunctionSpace(mesh, "CG", 2)
+    g = Function(V, name="f")
+    with HDF5File(dumpfile, "r") as h5:
+        h5.read(g, "/solution", timestamp=0.1)
+    expect = Function(V).interpolate(SpatialCoordinate(mesh))
+    assert np.allclose(g.dat.data_ro, expect.dat.data_ro)
+
+
+@pytest.mark.parallel(nprocs=2)
+def test_asynchronous_write(dumpfile):
+    dumpfile = MPI.COMM_WORLD.bcast(dumpfile, root=0)
+    mesh = UnitSquareMesh(4, 4)
+    f = Function(FunctionSpace(mesh, "CG", 2), name="f")
+    f.interpolate(SpatialCoordinate(mesh)[0])
+    g = Function(f)
+    with HDF5File(dumpfile, "w", asynchronous=True, max_staging_bytes=0) as h5:
+        handles = [h5.write(g.assign(f + t), "/solution", timestamp=t) for t in [0.1, 0.2]]
+        g.assign(0)
+        assert np.allclose(h5.get_timestamps(), [0.1, 0.2])
+        assert all(handle.done() for handle in handles)
+
+    with HDF5File(dumpfile, "r") as h5:
+        h5.read(g, "/solution", timestamp=0.2)
+    assert np.allclose(g.dat.data_ro, f.dat.data_ro + 0.2)
+
+
+@pytest.mark.parametrize("compression", [None, "gzip", "lzf"])
+def test_write_many(compression, dumpfile):
+    mesh = UnitSquareMesh(4, 4)
+    x = SpatialCoordinate(mesh)
+    f = Function(FunctionSpace(mesh, "CG", 2), name="f").interpolate(x[0])
+    g = Function(VectorFunctionSpace(mesh, "DG", 1), name="g").interpolate(x)
+    with HDF5File(dumpfile, "w", compression=compression, chunk_size=16) as h5:
+        h5.write_many({"/f": f, "/g": g}, timestamp=0.5)
+        assert np.allclose(h5.get_timestamps(), [0.5])
+        dset = h5._h5file["/f/%.15e" % 0.5]
+        assert dset.compression == compression
+        assert dset.chunks == (16, )
+
+    with HDF5File(dumpfile, "r") as h5:
+        for expect in [f, g]:
+            actual = Function(expect.function_space())
+            h5.read(actual, "/%s" % expect.name(), timestamp=0.5)
+            assert np.allclose(actual.dat.data_ro, expect.dat.data_ro)
+
+
+def test_asynchronous_write_many(dumpfile):
+    mesh = UnitSquareMesh(4, 4)
+    x = SpatialCoordinate(mesh)
+    f = Function(FunctionSpace(mesh, "CG", 2), name="f").interpolate(x[0])
+    g = Function(VectorFunctionSpace(mesh, "DG", 1), name="g").interpolate(x)
+    # The bound is smaller than a batch
+    with HDF5File(dumpfile, "w", asynchronous=True, max_staging_bytes=f.dat.nbytes) as h5:
+        handles = [h5.write_many({"/f": f, "/g": g}, timestamp=t) for t in [0.1, 0.2]]
+        for handle in handles:
+            assert handle.wait(timeout=60)
+
+    with HDF5File(dumpfile, "r") as h5:
+        for t in [0.1, 0.2]:
+            for expect in [f, g]:
+                actual = Function(expect.function_space())
+                h5.read(actual, "/%s" % expect.name(), timestamp=t)
+                assert np.allclose(actual.dat.data_ro, expect.dat.data_ro)
+
+
+def test_incremental_write(dumpfile):
+    import h5py
+    mesh = UnitSquareMesh(2, 2)
+    V = FunctionSpace(mesh, "CG", 1)
+    static = Function(V, name="static").assign(1)
+    u = Function(V, name="u")
+    with HDF5File(dumpfile, "w", incremental=True) as h5:
+        for t in [0.0, 1.0, 2.0]:
+            u.assign(t)
+            h5.write_many({"/u": u, "/static": static}, timestamp=t)
+        h5file = h5._h5file
+        assert isinstance(h5file.get("/u/%.15e" % 2.0, getlink=True), h5py.HardLink)
+        assert isinstance(h5file.get("/static/%.15e" % 2.0, getlink=True), h5py.SoftLink)
+
+    with HDF5File(dumpfile, "r") as h5:
+        for t in [0.0, 1.0, 2.0]:
+            h5.read(u, "/u", timestamp=t)
+            assert np.allclose(u.dat.data_ro, t)
+            g = Function(V)
+            h5.read(g, "/static", timestamp=t)
+            assert np.allclose(g.dat.data_ro, 1)
+
+
+def test_bad_compression(dumpfile):
+    with pytest.raises(ValueError):
+        HDF5File(dumpfile, "w", compression="bzip2")
+
+
 def test_checkpoint_read_not_exist_ioerror(dumpfile):
     with pytest.raises(IOError):
         with HDF5File(dumpfile, file_mode="r"):
@@ -4,7 +4,9 @@ from collections import Counter
 import pytest
 from functools import partial
 from firedrake import *
+import ufl
 import xml.etree.ElementTree as ET
+import numpy as np
 
 
 @pytest.fixture(params=["interval", "square[tri]", "square[quad]",
@@ -163,6 +165,171 @@ def test_restart_shorten(mesh, tmpdir):
         assert ds.attrib["file"] == "restart_%d.vtu" % i
 
 
+def test_asynchronous_write(mesh, tmpdir):
+    V = FunctionSpace(mesh, "CG", 1)
+    f = Function(V, name="f")
+
+    sync = File(str(tmpdir.join("sync.pvd")))
+    asynchronous = File(str(tmpdir.join("async.pvd")), asynchronous=True,
+                        max_pending=1)
+    for i in range(4):
+        f.assign(i)
+        sync.write(f)
+        asynchronous.write(f)
+    asynchronous.close()
+
+    for i in range(4):
+        with open(str(tmpdir.join("sync_%d.vtu" % i)), "rb") as a, \
+                open(str(tmpdir.join("async_%d.vtu" % i)), "rb") as b:
+            assert a.read() == b.read()
+    datasets = list(ET.parse(str(tmpdir.join("async.pvd"))).iter("DataSet"))
+    assert [ds.attrib["file"] for ds in datasets] == ["async_%d.vtu" % i for i in range(4)]
+
+    with pytest.raises(ValueError):
+        asynchronous.write(f)
+
+
+def test_static_mesh_output_reused(mesh, pvd):
+    V = FunctionSpace(mesh, "CG", 1)
+    f = Function(V, name="f")
+
+    pvd.write(f)
+    coordinates = pvd._coordinates[-1]
+    mesh_data = pvd._mesh_data
+    pvd.write(f)
+    assert pvd._coordinates[-1] is coordinates
+    assert pvd._mesh_data is mesh_data
+
+    # Moving the mesh is noticed
+    mesh.coordinates.dat.data[:] += 1
+    pvd.write(f)
+    assert pvd._coordinates[-1] is not coordinates
+    assert pvd._mesh_data is not mesh_data
+
+
+def read_vtu_arrays(filename):
+    """Read the appended arrays of a VTU file, as bytes."""
+    import zlib
+    with open(filename, "rb") as f:
+        contents = f.read()
+    head, data = contents.split(b'<AppendedData encoding="raw">\n_')
+    root = ET.fromstring(head + b"</VTKFile>")
+    assert root.attrib["header_type"] == "UInt64"
+    compressed = "compressor" in root.attrib
+    arrays = {}
+    for array in root.iter("DataArray"):
+        offset = int(array.attrib["offset"])
+        if compressed:
+            assert root.attrib["compressor"] == "vtkZLibDataCompressor"
+            nblocks = int(np.frombuffer(data, dtype=np.uint64, count=1, offset=offset)[0])
+            header = np.frombuffer(data, dtype=np.uint64, count=3 + nblocks, offset=offset)
+            start = offset + 8*(3 + nblocks)
+            blocks = []
+            for size in header[3:]:
+                blocks.append(zlib.decompress(data[start:start + int(size)]))
+                start += int(size)
+            arrays[array.attrib["Name"]] = b"".join(blocks)
+        else:
+            nbytes = int(np.frombuffer(data, dtype=np.uint64, count=1, offset=offset)[0])
+            arrays[array.attrib["Name"]] = data[offset + 8:offset + 8 + nbytes]
+    return arrays
+
+
+def test_compressed_output(mesh, tmpdir):
+    V = FunctionSpace(mesh, "CG", 1)
+    f = Function(V, name="f")
+    f.interpolate(SpatialCoordinate(mesh)[0])
+
+    File(str(tmpdir.join("raw.pvd"))).write(f)
+    File(str(tmpdir.join("zlib.pvd")), compression="zlib",
+         compression_threads=2).write(f)
+
+    raw = read_vtu_arrays(str(tmpdir.join("raw_0.vtu")))
+    compressed = read_vtu_arrays(str(tmpdir.join("zlib_0.vtu")))
+    assert set(raw) == {"coordinates", "connectivity", "offsets", "types", "f"}
+    assert raw == compressed
+
+
+def test_bad_compression(tmpdir):
+    with pytest.raises(ValueError):
+        File(str(tmpdir.join("foo.pvd")), compression="bzip")
+
+
+def run_high_order_output(mesh, tmpdir, degree):
+    V = FunctionSpace(mesh, "CG", degree)
+    f = Function(V, name="f")
+    f.interpolate(SpatialCoordinate(mesh)[0]**2)
+
+    File(str(tmpdir.join("foo.pvd")), high_order=True).write(f)
+
+    arrays = read_vtu_arrays(str(tmpdir.join("foo_0.vtu")))
+    types = np.frombuffer(arrays["types"], dtype=np.uint8)
+    assert len(types) == mesh.cell_set.size*(mesh.layers - 1 if mesh.layers else 1)
+    assert all(types >= 68)
+    # Nodes are written directly, without resampling
+    assert np.allclose(np.frombuffer(arrays["f"]), f.dat.data_ro_with_halos)
+    return arrays
+
+
+@pytest.mark.parametrize("degree", [2, 3])
+def test_high_order_output(mesh, tmpdir, degree):
+    run_high_order_output(mesh, tmpdir, degree)
+
+
+@pytest.mark.parametrize(("degree", "expected"),
+                         [(2, [(0, 0), (2, 0), (2, 2), (0, 2),
+                               (1, 0), (2, 1), (1, 2), (0, 1),
+                               (1, 1)]),
+                          (3, [(0, 0), (3, 0), (3, 3), (0, 3),
+                               (1, 0), (2, 0), (3, 1), (3, 2),
+                               (1, 3), (2, 3), (0, 1), (0, 2),
+                               (1, 1), (2, 1), (1, 2), (2, 2)])])
+def test_vtk_lagrange_quadrilateral_points(degree, expected):
+    from firedrake.output import vtk_lagrange_points
+    # VTK_LAGRANGE_QUADRILATERAL: vertices, then the edges
+    # (0, 1), (1, 2), (3, 2), (0, 3), then the interior
+    assert vtk_lagrange_points(ufl.Cell("quadrilateral"), degree) == expected
+
+
+@pytest.mark.parametrize("degree", [2, 3])
+def test_high_order_output_hexahedron(tmpdir, degree):
+    from firedrake.output import vtk_lagrange_points
+    mesh = ExtrudedMesh(UnitSquareMesh(2, 2, quadrilateral=True), 2)
+    arrays = run_high_order_output(mesh, tmpdir, degree)
+
+    root = ET.parse(str(tmpdir.join("foo_0.vtu"))).getroot()
+    assert root.attrib["version"] == "2.2"
+    types = np.frombuffer(arrays["types"], dtype=np.uint8)
+    assert all(types == 72)
+
+    # Every node is at the position its VTK index says it is at: the
+    # trilinear map of the vertices (the first eight nodes) at the
+    # reference position of the node.
+    lattice = np.array(vtk_lagrange_points(mesh.ufl_cell(), degree), dtype=float)/degree
+    vertices = lattice[:8]
+    weights = np.prod(np.where(vertices[np.newaxis, :, :] > 0,
+                               lattice[:, np.newaxis, :],
+                               1 - lattice[:, np.newaxis, :]), axis=2)
+    nnodes = len(lattice)
+    itemsize = len(arrays["connectivity"]) // (len(types)*nnodes)
+    connectivity = np.frombuffer(arrays["connectivity"],
+                                 dtype="int%d" % (8*itemsize)).reshape(-1, nnodes)
+    coordinates = np.frombuffer(arrays["coordinates"]).reshape(-1, 3)
+    for nodes in connectivity:
+        points = coordinates[nodes]
+        assert np.allclose(points, weights.dot(points[:8]))
+
+
+def test_high_order_mixed_degrees_fall_back(mesh, tmpdir):
+    f = Function(FunctionSpace(mesh, "CG", 2), name="f")
+    g = Function(FunctionSpace(mesh, "CG", 3), name="g")
+
+    File(str(tmpdir.join("foo.pvd")), high_order=True).write(f, g)
+
+    arrays = read_vtu_arrays(str(tmpdir.join("foo_0.vtu")))
+    assert all(np.frombuffer(arrays["types"], dtype=np.uint8) < 68)
+
+
 if __name__ == "__main__":
     import os
     pytest.main(os.path.abspath(__file__))
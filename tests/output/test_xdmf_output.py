@@ -0,0 +1,62 @@
+import pytest
+import h5py
+import numpy as np
+from functools import partial
+from firedrake import *
+from xml.etree import ElementTree
+
+
+@pytest.fixture(params=["interval", "square[tri]", "square[quad]", "tet"])
+def mesh(request):
+    return {"interval": partial(UnitIntervalMesh, 10),
+            "square[tri]": partial(UnitSquareMesh, 4, 4),
+            "square[quad]": partial(UnitSquareMesh, 4, 1, quadrilateral=True),
+            "tet": partial(UnitCubeMesh, 2, 2, 2)}[request.param]()
+
+
+def check_output(mesh, tmpdir):
+    V = FunctionSpace(mesh, "CG", 1)
+    W = VectorFunctionSpace(mesh, "DG", 0)
+    f = Function(V, name="f")
+    g = Function(W, name="g")
+
+    filename = str(tmpdir.join("foo.xdmf"))
+    with XDMFFile(filename) as xdmf:
+        for t in [0.0, 0.5]:
+            f.interpolate(SpatialCoordinate(mesh)[0] + t)
+            xdmf.write(f, g, time=t)
+
+    grids = list(ElementTree.parse(filename).iter("Grid"))[1:]
+    assert len(grids) == 2
+    assert [grid.find("Time").attrib["Value"] for grid in grids] == ["0.0", "0.5"]
+    for grid in grids:
+        assert [a.attrib["Name"] for a in grid.iter("Attribute")] == ["f", "g"]
+
+    with h5py.File(str(tmpdir.join("foo.h5")), "r") as h5:
+        # Mesh written once, fields once per write
+        assert set(h5["Mesh"].keys()) == {"coordinates", "topology"}
+        assert set(h5["Function/f"].keys()) == {"0", "1"}
+        ncells = mesh.comm.allreduce(mesh.cell_set.size)
+        assert h5["Mesh/topology"].shape[0] == ncells
+        assert h5["Mesh/coordinates"].shape[1] == 3
+        assert h5["Function/g/1"].shape == (h5["Mesh/coordinates"].shape[0], 3)
+        assert np.allclose(h5["Function/f/1"][:] - h5["Function/f/0"][:], 0.5)
+
+
+def test_xdmf_output(mesh, tmpdir):
+    check_output(mesh, tmpdir)
+
+
+@pytest.mark.parallel(nprocs=3)
+def test_xdmf_output_parallel(tmpdir):
+    check_output(UnitSquareMesh(6, 6), tmpdir)
+
+
+def test_bad_file_name(tmpdir):
+    with pytest.raises(ValueError):
+        XDMFFile(str(tmpdir.join("foo.pvd")))
+
+
+if __name__ == "__main__":
+    import os
+    pytest.main(os.path.abspath(__file__))
@@ -0,0 +1,197 @@
+import pytest
+import numpy as np
+from firedrake import *
+
+
+@pytest.fixture(scope='module')
+def mesh():
+    return UnitSquareMesh(4, 4)
+
+
+@pytest.fixture(params=["scalar", "vector"])
+def V(request, mesh):
+    if request.param == "scalar":
+        return FunctionSpace(mesh, "CG", 2)
+    else:
+        return VectorFunctionSpace(mesh, "CG", 1)
+
+
+def residual_jacobian(V):
+    u = Function(V)
+    data = u.dat.data
+    data[:] = np.arange(data.size).reshape(data.shape) / data.size
+    v = TestFunction(V)
+    F = inner(grad(u), grad(v))*dx + inner(u, u)*inner(u, v)*dx + inner(u, v)*ds
+    J = derivative(F, u)
+    return F, J
+
+
+def test_assemble_many_residual_jacobian(V):
+    F, J = residual_jacobian(V)
+    bc = DirichletBC(V, 0, 1)
+    Fh, Jh = assemble_many([F, J], bcs=[None, bc], mat_type="aij")
+
+    assert np.allclose(Fh.dat.data_ro, assemble(F).dat.data_ro)
+    assert np.allclose(Jh.M.values, assemble(J, bcs=bc, mat_type="aij").M.values)
+
+
+def test_assemble_many_into_tensors(V):
+    F, J = residual_jacobian(V)
+    F_ = assemble(F)
+    J_ = assemble(J, mat_type="aij")
+    F_.assign(1)
+    Fh, Jh = assemble_many([F, J], tensors=[F_, J_], mat_type="aij")
+    assert Fh is F_
+    assert Jh is J_
+    assert np.allclose(Fh.dat.data_ro, assemble(F).dat.data_ro)
+    assert np.allclose(Jh.M.values, assemble(J, mat_type="aij").M.values)
+
+
+def test_assemble_many_interior_facets(mesh):
+    V = FunctionSpace(mesh, "DG", 1)
+    u = Function(V)
+    u.interpolate(SpatialCoordinate(mesh)[1])
+    v = TestFunction(V)
+    F = jump(u)*jump(v)*dS + u*v*dx
+    J = derivative(F, u)
+    M = u*u*dS
+    Fh, Jh, Mh = assemble_many([F, J, M], mat_type="aij")
+    assert np.allclose(Fh.dat.data_ro, assemble(F).dat.data_ro)
+    assert np.allclose(Jh.M.values, assemble(J, mat_type="aij").M.values)
+    assert np.allclose(Mh, assemble(M))
+
+
+def test_assemble_many_mixed(mesh):
+    V = FunctionSpace(mesh, "CG", 1)
+    W = V*V
+    w = Function(W)
+    w.sub(0).assign(1)
+    w.sub(1).assign(2)
+    u, p = split(w)
+    v, q = TestFunctions(W)
+    F = u*p*v*dx + p*q*dx
+    J = derivative(F, w)
+    Fh, Jh = assemble_many([F, J], mat_type="nest")
+    expect = assemble(J, mat_type="nest")
+    assert np.allclose(Fh.dat.data_ro[0], assemble(F).dat.data_ro[0])
+    assert np.allclose(Fh.dat.data_ro[1], assemble(F).dat.data_ro[1])
+    for i in range(2):
+        for j in range(2):
+            assert np.allclose(Jh.M[i, j].values, expect.M[i, j].values)
+
+
+def test_assemble_many_functionals(mesh):
+    x, y = SpatialCoordinate(mesh)
+    A, B = assemble_many([x*dx, y*y*dx])
+    assert np.allclose([A, B], [0.5, 1.0/3])
+
+
+def test_assemble_functionals(mesh):
+    x, y = SpatialCoordinate(mesh)
+    forms = [x*dx, y*y*dx, x*ds, Constant(1, domain=mesh)*dS]
+    values = assemble_functionals(forms)
+    assert isinstance(values, np.ndarray)
+    assert np.allclose(values, [assemble(f) for f in forms])
+
+
+@pytest.mark.parallel(nprocs=3)
+def test_assemble_functionals_parallel():
+    mesh = UnitSquareMesh(4, 4)
+    x, y = SpatialCoordinate(mesh)
+    forms = [x*dx, y*y*dx, x*ds, Constant(1, domain=mesh)*dS]
+    assert np.allclose(assemble_functionals(forms), [assemble(f) for f in forms])
+
+
+def test_assemble_functionals_unfusable():
+    mesh = ExtrudedMesh(UnitSquareMesh(2, 2), 2)
+    x, y, z = SpatialCoordinate(mesh)
+    forms = [x*dx, z*dx, Constant(1, domain=mesh)*ds_t, x*ds_v]
+    assert np.allclose(assemble_functionals(forms), [assemble(f) for f in forms])
+
+
+def test_fused_kernel_options(mesh, monkeypatch):
+    import sys
+    module = sys.modules["firedrake.assemble"]
+    fuse = module._fuse_kernels
+    fused = []
+
+    def record(entries):
+        kernel, args = fuse(entries)
+        fused.append((kernel, [e.kinfo.kernel for e in entries]))
+        return kernel, args
+
+    monkeypatch.setattr(module, "_fuse_kernels", record)
+    x, y = SpatialCoordinate(mesh)
+    assemble_functionals([x*dx, y*dx])
+    kernel, kernels = fused[0]
+    assert len(kernels) == 2
+    assert kernel._opts == kernels[0]._opts
+    assert kernel._cpp == kernels[0]._cpp
+
+
+def test_fused_kernel_cached(V, monkeypatch):
+    import sys
+    module = sys.modules["firedrake.assemble"]
+    F, J = residual_jacobian(V)
+    expect = assemble_many([F, J], mat_type="aij")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Fused kernel was generated again")
+
+    monkeypatch.setattr(module, "_fused_kernel", fail)
+    Fh, Jh = assemble_many([F, J], mat_type="aij")
+    assert np.allclose(Fh.dat.data_ro, expect[0].dat.data_ro)
+    assert np.allclose(Jh.M.values, expect[1].M.values)
+
+
+def test_norms(mesh):
+    V = FunctionSpace(mesh, "CG", 2)
+    fs = [Function(V).assign(i) for i in range(3)]
+    fs[2].interpolate(SpatialCoordinate(mesh)[0])
+    for norm_type in ["L2", "H1"]:
+        assert np.allclose(norms(fs, norm_type=norm_type),
+                           [norm(f, norm_type=norm_type) for f in fs])
+
+
+def test_assemble_multiple_coefficients(mesh):
+    V = FunctionSpace(mesh, "CG", 1)
+    v = TestFunction(V)
+    f = Function(V)
+    g = Function(V).assign(2)
+    L = f*g*v*dx
+    fs = [Function(V).assign(i) for i in range(4)]
+    bs = assemble(L, coefficients={f: fs})
+    assert len(bs) == 4
+    for fi, b in zip(fs, bs):
+        assert np.allclose(b.dat.data_ro, assemble(fi*g*v*dx).dat.data_ro)
+
+
+def test_assemble_multiple_coefficients_mismatch(mesh):
+    V = FunctionSpace(mesh, "CG", 1)
+    v = TestFunction(V)
+    f = Function(V)
+    g = Function(V)
+    with pytest.raises(ValueError):
+        assemble(f*g*v*dx, coefficients={f: [Function(V)],
+                                         g: [Function(V), Function(V)]})
+
+
+def test_solve_many(mesh):
+    V = FunctionSpace(mesh, "CG", 1)
+    u = TrialFunction(V)
+    v = TestFunction(V)
+    f = Function(V)
+    A = assemble(u*v*dx)
+    fs = [Function(V).assign(i) for i in range(1, 4)]
+    bs = assemble(f*v*dx, coefficients={f: fs})
+    xs = [Function(V) for _ in fs]
+    solver = LinearSolver(A, solver_parameters={"ksp_type": "preonly",
+                                                "pc_type": "lu"})
+    solver.solve_many(xs, bs)
+    for x, fi in zip(xs, fs):
+        assert np.allclose(x.dat.data_ro, fi.dat.data_ro)
+
+
+if __name__ == '__main__':
+    import os
+    pytest.main(os.path.abspath(__file__))
@@ -0,0 +1,68 @@
+import pytest
+import numpy as np
+from firedrake import *
+
+
+@pytest.fixture(scope='module')
+def V():
+    mesh = UnitSquareMesh(5, 5)
+    return FunctionSpace(mesh, "CG", 1)
+
+
+def test_plan_one_form(V):
+    v = TestFunction(V)
+    f = Function(V)
+    L = f*v*dx
+    plan = assembly_plan(L)
+    for val in [1, 2, 3]:
+        f.assign(val)
+        b = plan()
+        assert b is plan.tensor
+        assert np.allclose(b.dat.data_ro, assemble(L).dat.data_ro)
+
+
+def test_plan_one_form_bcs(V):
+    v = TestFunction(V)
+    f = Function(V)
+    L = f*v*dx
+    bc = DirichletBC(V, 5, (1, 2))
+    f.assign(1)
+    b = assembly_plan(L, bcs=bc)()
+    assert np.allclose(b.dat.data_ro, assemble(L, bcs=bc).dat.data_ro)
+
+
+def test_plan_zero_form(V):
+    f = Function(V)
+    M = f*dx
+    plan = assembly_plan(M)
+    for val in [1, 2, 3]:
+        f.assign(val)
+        assert np.allclose(plan(), val)
+
+
+@pytest.mark.parametrize("mat_type", ["aij", "nest"])
+def test_plan_two_form(V, mat_type):
+    u = TrialFunction(V)
+    v = TestFunction(V)
+    c = Function(V)
+    a = c*u*v*dx
+    bc = DirichletBC(V, 0, 1)
+    plan = assembly_plan(a, bcs=bc, mat_type=mat_type)
+    for val in [1, 2]:
+        c.assign(val)
+        A = plan()
+        expect = assemble(a, bcs=bc, mat_type=mat_type)
+        assert np.allclose(A.M.values, expect.M.values)
+
+
+def test_plan_cached(V):
+    v = TestFunction(V)
+    L = v*dx
+    b = Function(V)
+    assert assembly_plan(L, tensor=b) is assembly_plan(L, tensor=b)
+    assert assembly_plan(L, tensor=b) is not assembly_plan(L)
+
+
+if __name__ == '__main__':
+    import os
+    pytest.main(os.path.abspath(__file__))
@@ -1,6 +1,7 @@
 from firedrake import *
 from firedrake import matrix
 import pytest
+import numpy as np
 
 
 @pytest.fixture
@@ -131,6 +132,98 @@ def test_assemble_with_bcs_multiple_subdomains(a, V):
     assert not A._needs_reassembly
 
 
+@pytest.fixture
+def retain_unconstrained():
+    parameters["retain_unconstrained_matrices"] = True
+    yield
+    parameters["retain_unconstrained_matrices"] = False
+
+
+def test_adding_bcs_without_reassembly(a, V):
+    bc1 = DirichletBC(V, 0, 1)
+    bc2 = DirichletBC(V, 0, 2)
+    A = assemble(a, bcs=[bc1])
+    A.assemble()
+
+    bc2.apply(A)
+    assert A._needs_reassembly
+    A.assemble()
+    assert not A._needs_reassembly
+
+    expect = assemble(a, bcs=[bc1, bc2]).M.values
+    assert np.allclose(A.M.values, expect)
+
+
+def test_removing_bcs_without_reassembly(a, V, retain_unconstrained):
+    bc1 = DirichletBC(V, 0, 1)
+    bc2 = DirichletBC(V, 0, 2)
+    A = assemble(a, bcs=[bc1, bc2])
+    A.assemble()
+    assert A._unconstrained is not None
+
+    A.bcs = bc2
+    A.assemble()
+    assert not A._needs_reassembly
+    assert np.allclose(A.M.values, assemble(a, bcs=[bc2]).M.values)
+
+    A.bcs = None
+    A.assemble()
+    assert np.allclose(A.M.values, assemble(a).M.values)
+
+
+@pytest.fixture
+def W():
+    mesh = UnitSquareMesh(2, 2)
+    return VectorFunctionSpace(mesh, "CG", 1)
+
+
+@pytest.fixture
+def no_reassembly(monkeypatch):
+    import sys
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Matrix was reassembled")
+
+    def patch():
+        monkeypatch.setattr(sys.modules["firedrake.assemble"], "_assemble", fail)
+    yield patch
+    monkeypatch.undo()
+
+
+def test_adding_bcs_is_not_reassembly(a, V, no_reassembly):
+    bc1 = DirichletBC(V, 0, 1)
+    bc2 = DirichletBC(V, 0, 2)
+    expect = assemble(a, bcs=[bc1, bc2]).M.values
+    A = assemble(a, bcs=[bc1])
+    A.assemble()
+
+    no_reassembly()
+    A.bcs = [bc1, bc2]
+    A.assemble()
+    assert np.allclose(A.M.values, expect)
+
+
+def test_component_bcs(W, retain_unconstrained):
+    u = TrialFunction(W)
+    v = TestFunction(W)
+    a = inner(u, v)*dx
+    bc0 = DirichletBC(W.sub(0), 0, 1)
+    bc1 = DirichletBC(W.sub(1), 0, 1)
+    A = assemble(a, bcs=[bc0])
+    A.assemble()
+
+    # Same subdomain, different component
+    A.bcs = [bc0, bc1]
+    assert A._needs_reassembly
+    A.assemble()
+    assert np.allclose(A.M.values, assemble(a, bcs=[bc0, bc1]).M.values)
+
+    A.bcs = [bc1]
+    assert A._needs_reassembly
+    A.assemble()
+    assert np.allclose(A.M.values, assemble(a, bcs=[bc1]).M.values)
+
+
 if __name__ == '__main__':
     import os
     pytest.main(os.path.abspath(__file__))
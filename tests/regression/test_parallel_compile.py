@@ -0,0 +1,134 @@
+from firedrake import *
+from firedrake.tsfc_interface import TSFCKernel, TSFCOutput, compile_on_root, clear_form_cache
+from pyop2.mpi import COMM_WORLD
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def empty_cache(monkeypatch, tmpdir):
+    monkeypatch.setattr(TSFCKernel, "_cache", {})
+    monkeypatch.setattr(TSFCOutput, "_cache", {})
+    monkeypatch.setattr(TSFCKernel, "_cachedir", str(tmpdir.join("tsfc-cache")))
+    clear_form_cache()
+
+
+@pytest.fixture(params=[1, 2])
+def nprocs(request):
+    parameters["form_compiler_processes"] = request.param
+    yield request.param
+    parameters["form_compiler_processes"] = 0
+
+
+@pytest.fixture
+def W():
+    mesh = UnitSquareMesh(3, 3)
+    V = FunctionSpace(mesh, "CG", 2)
+    Q = FunctionSpace(mesh, "DG", 1)
+    return V*Q
+
+
+def mixed_form(W):
+    u, p = TrialFunctions(W)
+    v, q = TestFunctions(W)
+    return (inner(grad(u), grad(v))*dx + p*v*dx + u*q*dx
+            + u*v*ds + jump(p)*jump(q)*dS)
+
+
+def test_parallel_compile_matches_serial(W, empty_cache, nprocs):
+    expect = assemble(mixed_form(W), mat_type="aij").M.values
+    # Compile again from scratch, serially.
+    parameters["form_compiler_processes"] = 0
+    TSFCKernel._cache.clear()
+    TSFCOutput._cache.clear()
+    clear_form_cache()
+    A = assemble(mixed_form(W), mat_type="aij")
+    assert np.allclose(A.M.values, expect)
+
+
+def test_parallel_compile_caches_tsfc_output(W, empty_cache, nprocs, monkeypatch):
+    import sys
+    expect = assemble(mixed_form(W), mat_type="aij").M.values
+    assert len(TSFCOutput._cache) > 0
+
+    def fail(*args, **kwargs):
+        raise AssertionError("TSFC output was not cached")
+
+    # Only the COFFEE kernels are generated again.
+    monkeypatch.setattr(sys.modules["firedrake.tsfc_interface"], "_tsfc_output", fail)
+    TSFCKernel._cache.clear()
+    clear_form_cache()
+    A = assemble(mixed_form(W), mat_type="aij")
+    assert np.allclose(A.M.values, expect)
+
+
+def test_parallel_compile_cache_stats(W, empty_cache, nprocs):
+    from firedrake.tsfc_interface import cache_stats, reset_cache_stats
+    reset_cache_stats()
+    assemble(mixed_form(W), mat_type="aij")
+    cold = cache_stats()
+
+    clear_form_cache()
+    reset_cache_stats()
+    assemble(mixed_form(W), mat_type="aij")
+    warm = cache_stats()
+    # One TSFCOutput and one TSFCKernel miss for each block, then one
+    # memory hit.
+    assert cold["memory_hits"] == cold["disk_hits"] == 0
+    assert warm["misses"] == warm["disk_hits"] == 0
+    assert warm["memory_hits"] > 0
+    assert cold["misses"] == 2*warm["memory_hits"]
+
+
+def test_parallel_compile_with_threads(W, empty_cache, monkeypatch):
+    import multiprocessing
+    import threading
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Forked with other threads running")
+
+    monkeypatch.setattr(multiprocessing, "get_context", fail)
+    parameters["form_compiler_processes"] = 2
+    done = threading.Event()
+    thread = threading.Thread(target=done.wait)
+    thread.start()
+    try:
+        A = assemble(mixed_form(W), mat_type="aij").M.values
+    finally:
+        done.set()
+        thread.join()
+        parameters["form_compiler_processes"] = 0
+    B = assemble(mixed_form(W), mat_type="aij").M.values
+    assert np.allclose(A, B)
+
+
+@pytest.mark.parallel(nprocs=2)
+def test_parallel_compile_shares_work(W, empty_cache):
+    parameters["form_compiler_processes"] = 1
+    try:
+        A = assemble(mixed_form(W), mat_type="aij").M.values
+    finally:
+        parameters["form_compiler_processes"] = 0
+    B = assemble(mixed_form(W), mat_type="aij").M.values
+    assert np.allclose(A, B)
+
+
+@pytest.mark.parallel(nprocs=3)
+def test_compile_on_root_cold_cache(W, empty_cache):
+    A = assemble(mixed_form(W), mat_type="aij")
+    B = assemble(mixed_form(W), mat_type="aij")
+    assert np.allclose(A.M.values, B.M.values)
+
+
+@pytest.mark.parallel(nprocs=2)
+def test_compile_on_root_failure():
+    def compile():
+        raise ValueError("Cannot compile")
+
+    with pytest.raises((ValueError, RuntimeError)):
+        compile_on_root(COMM_WORLD, compile)
+
+
+if __name__ == '__main__':
+    import os
+    pytest.main(os.path.abspath(__file__))
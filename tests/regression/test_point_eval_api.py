@@ -139,6 +139,93 @@ def test_nascent_parallel_support():
     assert np.allclose([0.2176, 0.2822], f.at([0.12, 0.68], [0.63, 0.34]))
 
 
+def run_batch(shape):
+    mesh = UnitSquareMesh(8, 8)
+    V = TensorFunctionSpace(mesh, "CG", 2, shape=shape) if shape else FunctionSpace(mesh, "CG", 2)
+    x, y = SpatialCoordinate(mesh)
+    expr = (x + 0.2)*y
+    f = Function(V).interpolate(as_tensor(np.full(shape, expr)) if shape else expr)
+
+    points = np.random.RandomState(0).uniform(-0.5, 1.5, size=(1000, 2))
+    points = mesh.comm.bcast(points, root=0)
+    inside = np.all((points >= 0) & (points <= 1), axis=1)
+    expect = (points[:, 0] + 0.2)*points[:, 1]
+
+    actual = f.at(points[inside])
+    assert isinstance(actual, np.ndarray)
+    assert actual.shape == (inside.sum(), ) + shape
+    assert np.allclose(actual, expect[inside].reshape((-1, ) + (1, )*len(shape)))
+
+    actual = f.at(points, dont_raise=True)
+    assert [a is None for a in actual] == list(~inside)
+    assert np.allclose([a for a in actual if a is not None],
+                       expect[inside].reshape((-1, ) + (1, )*len(shape)))
+
+    with pytest.raises(PointNotInDomainError):
+        f.at(points)
+
+
+@pytest.mark.parametrize("shape", [(), (2, ), (2, 2)])
+def test_batch(shape):
+    run_batch(shape)
+
+
+@pytest.mark.parallel(nprocs=3)
+def test_batch_parallel():
+    run_batch((2, ))
+
+
+@pytest.mark.parallel(nprocs=2)
+def test_batch_inconsistent_points():
+    mesh = UnitSquareMesh(8, 8)
+    f = Function(FunctionSpace(mesh, "CG", 1))
+    # Same points (and so the same count and sum) in a different order
+    points = [[0.1, 0.2], [0.3, 0.4], [0.5, 0.6]]
+    points = np.roll(points, mesh.comm.rank, axis=0)
+    with pytest.raises(ValueError):
+        f.at(points)
+
+
+def run_point_evaluator():
+    mesh = UnitSquareMesh(8, 8)
+    x, y = SpatialCoordinate(mesh)
+    f = Function(FunctionSpace(mesh, "CG", 2)).interpolate((x + 0.2)*y)
+    g = Function(VectorFunctionSpace(mesh, "DG", 1)).interpolate(as_vector((x, 2*y)))
+
+    points = [[0.12, 0.18], [0.98, 0.87], [0.63, 0.34]]
+    evaluator = PointEvaluator(mesh, points)
+    fs, gs = evaluator.evaluate(f, g)
+    assert np.allclose(fs, f.at(points))
+    assert np.allclose(gs, [[0.12, 0.36], [0.98, 1.74], [0.63, 0.68]])
+
+    f.assign(2*f)
+    assert np.allclose(evaluator.evaluate(f), 2*fs)
+
+    # Moving the mesh locates the points again, without checking the
+    # coordinates only after clearing the spatial index
+    unchecked = PointEvaluator(mesh, points, check_coordinates=False)
+    unchecked.evaluate(f)
+    mesh.coordinates.assign(2*mesh.coordinates)
+    assert np.allclose(evaluator.evaluate(f), f.at(points))
+    mesh.clear_spatial_index()
+    assert np.allclose(unchecked.evaluate(f), f.at(points))
+
+    evaluator = PointEvaluator(mesh, [[0.5, 0.5], [3.0, 3.0]])
+    with pytest.raises(PointNotInDomainError):
+        evaluator.evaluate(f)
+    values = evaluator.evaluate(f, dont_raise=True)
+    assert np.isnan(values[1]) and not np.isnan(values[0])
+
+
+def test_point_evaluator():
+    run_point_evaluator()
+
+
+@pytest.mark.parallel(nprocs=3)
+def test_point_evaluator_parallel():
+    run_point_evaluator()
+
+
 if __name__ == '__main__':
     import os
     pytest.main(os.path.abspath(__file__))
@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+import tarfile
+import pytest
+
+script = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      os.pardir, os.pardir, "scripts", "firedrake-precompile")
+
+
+@pytest.fixture
+def program(tmpdir):
+    program = tmpdir.join("program.py")
+    program.write("""
+from firedrake import *
+mesh = UnitSquareMesh(2, 2)
+V = FunctionSpace(mesh, "CG", 1)
+u = TrialFunction(V)
+v = TestFunction(V)
+assemble(u*v*dx)
+""")
+    return str(program)
+
+
+def cache_files(cache):
+    return set(os.path.relpath(os.path.join(dirpath, filename), cache)
+               for dirpath, _, filenames in os.walk(cache)
+               for filename in filenames)
+
+
+def test_precompile_record_unpack(program, tmpdir):
+    bundle = str(tmpdir.join("kernels.tar.gz"))
+    subprocess.check_call([sys.executable, script, "record", "-o", bundle, program])
+
+    with tarfile.open(bundle) as tar:
+        names = tar.getnames()
+    assert any(name.startswith("tsfc/") for name in names)
+    assert any(name.startswith("pyop2/") for name in names)
+
+    env = os.environ.copy()
+    env["FIREDRAKE_TSFC_KERNEL_CACHE_DIR"] = str(tmpdir.join("tsfc-cache"))
+    env["PYOP2_CACHE_DIR"] = str(tmpdir.join("pyop2-cache"))
+    subprocess.check_call([sys.executable, script, "unpack", bundle], env=env)
+
+    unpacked = (set(os.path.join("tsfc", name)
+                    for name in cache_files(env["FIREDRAKE_TSFC_KERNEL_CACHE_DIR"]))
+                | set(os.path.join("pyop2", name)
+                      for name in cache_files(env["PYOP2_CACHE_DIR"])))
+    assert unpacked == set(names)
+
+
+if __name__ == '__main__':
+    import os
+    pytest.main(os.path.abspath(__file__))
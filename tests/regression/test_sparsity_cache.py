@@ -0,0 +1,55 @@
+import pytest
+from firedrake import *
+from firedrake.functionspacedata import sparsity_cache_stats, clear_sparsity_cache
+
+
+@pytest.fixture
+def V():
+    mesh = UnitSquareMesh(3, 3)
+    return FunctionSpace(mesh, "CG", 1)
+
+
+def test_sparsity_shared_between_forms(V):
+    u = TrialFunction(V)
+    v = TestFunction(V)
+    mass = assemble(u*v*dx, mat_type="aij")
+    stiffness = assemble(inner(grad(u), grad(v))*dx, mat_type="aij")
+    assert mass._M.sparsity is stiffness._M.sparsity
+    stats = sparsity_cache_stats(V.mesh())
+    assert stats["size"] == 1
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_sparsity_different_integral_types(V):
+    u = TrialFunction(V)
+    v = TestFunction(V)
+    A = assemble(u*v*dx, mat_type="aij")
+    B = assemble(u*v*dx + u*v*ds, mat_type="aij")
+    assert A._M.sparsity is not B._M.sparsity
+    C = assemble(u*v*ds + u*v*dx, mat_type="aij")
+    assert B._M.sparsity is C._M.sparsity
+
+
+def test_sparsity_different_mat_types(V):
+    u = TrialFunction(V)
+    v = TestFunction(V)
+    A = assemble(u*v*dx, mat_type="aij")
+    B = assemble(u*v*dx, mat_type="baij")
+    assert A._M.sparsity is not B._M.sparsity
+
+
+def test_clear_sparsity_cache(V):
+    u = TrialFunction(V)
+    v = TestFunction(V)
+    A = assemble(u*v*dx, mat_type="aij")
+    assert clear_sparsity_cache(V.mesh()) == 1
+    assert sparsity_cache_stats(V.mesh()) == {"hits": 0, "misses": 0, "size": 0}
+    B = assemble(u*v*dx, mat_type="aij")
+    assert sparsity_cache_stats(V.mesh())["misses"] == 1
+    assert A.M.values.sum() == B.M.values.sum()
+
+
+if __name__ == '__main__':
+    import os
+    pytest.main(os.path.abspath(__file__))
@@ -80,7 +80,12 @@ with open("{file}", "w") as f:
     def test_tsfc_cache_persist_on_disk(self, cache_key):
         """TSFCKernel should be persisted on disk."""
         assert os.path.exists(
-            os.path.join(tsfc_interface.TSFCKernel._cachedir, cache_key))
+            tsfc_interface.TSFCKernel._cache_path(cache_key))
+
+    def test_tsfc_cache_sharded(self, cache_key):
+        """The disk cache should be sharded by key prefix."""
+        assert os.path.dirname(tsfc_interface.TSFCKernel._cache_path(cache_key)) == \
+            os.path.join(tsfc_interface.TSFCKernel._cachedir, cache_key[:2])
 
     def test_tsfc_cache_read_from_disk(self, cache_key):
         """Loading an TSFCKernel from disk should yield the right object."""
@@ -117,6 +122,122 @@ with open("{file}", "w") as f:
 
         assert k1[-1] is not k2[-1]
 
+    def test_tsfc_output_reused_for_new_coffee_parameters(self, laplace, tmpdir, monkeypatch):
+        """Changing the COFFEE parameters should not rerun TSFC."""
+        calls = []
+        tsfc_compile_form = tsfc_interface.tsfc_compile_form
+
+        def counting_compile_form(*args, **kwargs):
+            calls.append(args)
+            return tsfc_compile_form(*args, **kwargs)
+
+        monkeypatch.setattr(tsfc_interface, "tsfc_compile_form", counting_compile_form)
+        monkeypatch.setattr(tsfc_interface.TSFCKernel, "_cachedir", str(tmpdir))
+        monkeypatch.setattr(tsfc_interface.TSFCKernel, "_cache", {})
+        monkeypatch.setattr(tsfc_interface.TSFCOutput, "_cache", {})
+
+        k1, = tsfc_interface.compile_form(laplace, 'laplace')
+        optlevel = parameters["coffee"]["optlevel"]
+        try:
+            parameters["coffee"]["optlevel"] = "O0"
+            k2, = tsfc_interface.compile_form(laplace, 'laplace')
+        finally:
+            parameters["coffee"]["optlevel"] = optlevel
+
+        assert k1[-1] is not k2[-1]
+        assert len(calls) == 1
+
+    def test_tsfc_cache_stats(self, laplace, tmpdir, monkeypatch):
+        monkeypatch.setattr(tsfc_interface.TSFCKernel, "_cachedir", str(tmpdir))
+        monkeypatch.setattr(tsfc_interface.TSFCKernel, "_cache", {})
+        monkeypatch.setattr(tsfc_interface.TSFCOutput, "_cache", {})
+        tsfc_interface.reset_cache_stats()
+
+        kernel = tsfc_interface.TSFCKernel(laplace, 'stats', parameters["form_compiler"], {})
+        stats = tsfc_interface.cache_stats()
+        assert stats["misses"] == 2
+        assert stats["bytes_written"] > 0
+
+        tsfc_interface.TSFCKernel._cache.clear()
+        other = tsfc_interface.TSFCKernel(laplace, 'stats', parameters["form_compiler"], {})
+        tsfc_interface.TSFCKernel(laplace, 'stats', parameters["form_compiler"], {})
+        stats = tsfc_interface.cache_stats()
+        assert other is not kernel
+        assert other.cache_key == kernel.cache_key
+        assert stats["disk_hits"] == 1
+        assert stats["memory_hits"] == 1
+        assert stats["bytes_read"] > 0
+
+    def test_tsfc_cache_eviction(self, mass, laplace, tmpdir, monkeypatch):
+        monkeypatch.setattr(tsfc_interface.TSFCKernel, "_cachedir", str(tmpdir))
+        monkeypatch.setattr(tsfc_interface.TSFCKernel, "_cache", {})
+        monkeypatch.setattr(tsfc_interface.TSFCOutput, "_cache", {})
+        monkeypatch.setattr(tsfc_interface.TSFCKernel, "_cache_size", None)
+        monkeypatch.setattr(tsfc_interface.TSFCKernel, "_cache_max_size", 1)
+        tsfc_interface.reset_cache_stats()
+
+        tsfc_interface.TSFCKernel(mass, 'evict', parameters["form_compiler"], {})
+        tsfc_interface.TSFCKernel(laplace, 'evict', parameters["form_compiler"], {})
+
+        assert tsfc_interface.cache_stats()["evicted"] > 0
+        assert all(len(files) == 0 for _, _, files in os.walk(str(tmpdir)))
+
+    def test_prune_cache(self, tmpdir):
+        import time
+        now = time.time()
+        for name, age in [("old", 10), ("new", 0), ("partial.tmp", 10)]:
+            filepath = str(tmpdir.join(name))
+            with open(filepath, "wb") as f:
+                f.write(b"x"*100)
+            os.utime(filepath, (now - age*86400, now - age*86400))
+
+        assert tsfc_interface.prune_cache(str(tmpdir), max_age=5) == (1, 100)
+        # Files being written are never evicted
+        assert tsfc_interface.prune_cache(str(tmpdir), max_size=0) == (1, 0)
+        assert sorted(os.listdir(str(tmpdir))) == ["partial.tmp"]
+
+    def test_tsfc_fresh_form(self, fs, monkeypatch):
+        """Compiling a freshly built but identical form should not go
+        through TSFCKernel."""
+        f = Function(fs)
+        k1 = tsfc_interface.compile_form(f*TestFunction(fs)*dx, 'fresh')
+
+        def fail(*args, **kwargs):
+            raise AssertionError("Form was not found in the form cache")
+
+        monkeypatch.setattr(tsfc_interface, "TSFCKernel", fail)
+        k2 = tsfc_interface.compile_form(f*TestFunction(fs)*dx, 'fresh')
+        assert k1 is k2
+
+    def test_tsfc_fresh_form_different_coefficient(self, fs, monkeypatch):
+        """A form built from different coefficients should be found
+        without computing its signature."""
+        import ufl
+        f = Function(fs)
+        g = Function(fs)
+        i, = indices(1)
+        k1 = tsfc_interface.compile_form(grad(f)[i]*grad(TestFunction(fs))[i]*dx, 'fresh')
+        k3 = tsfc_interface.compile_form(f*g*TestFunction(fs)*dx, 'fresh')
+
+        def fail(*args, **kwargs):
+            raise AssertionError("Form signature was computed")
+
+        monkeypatch.setattr(ufl.Form, "signature", fail)
+        j, = indices(1)
+        k2 = tsfc_interface.compile_form(grad(g)[j]*grad(TestFunction(fs))[j]*dx, 'fresh')
+        assert k1 is k2
+        assert k1 is not k3
+
+    def test_tsfc_form_cache_keeps_no_data(self, fs):
+        import gc
+        import weakref
+        f = Function(fs)
+        tsfc_interface.compile_form(f*TestFunction(fs)*dx, 'fresh')
+        ref = weakref.ref(f)
+        del f
+        gc.collect()
+        assert ref() is None
+
     def test_tsfc_cell_kernel(self, mass):
         k = tsfc_interface.compile_form(mass, 'mass')
         assert len(k) == 1 and 'cell_integral' in k[0][1][0].code()